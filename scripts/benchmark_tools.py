@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+MCP工具压测脚本
+
+通过SSE传输用N个并发MCP客户端驱动服务，按配置的比例混合调用
+save_memory / search_memories / get_all_memories，以JSON输出吞吐和 p50/p95/p99 延迟。
+
+--offline 模式完全离线运行：以 LLM_PROVIDER=fake（确定性的事实抽取/更新决策 +
+基于哈希的嵌入，见 src/fake_providers.py）子进程方式启动 src/main.py。
+向量存储使用 DATABASE_URL 指向的本地 pgvector，或通过 --server-env VECTOR_STORE_PROVIDER=memory 使用进程内存储。
+
+用法:
+    # 压测已经运行的服务
+    python scripts/benchmark_tools.py --url http://localhost:8050/sse --clients 8 --requests 400
+
+    # 离线压测，并与基线比较（p95或吞吐退化超过20%时返回非0）
+    python scripts/benchmark_tools.py --offline --clients 16 --duration 60 \\
+        --mix save=1,search=4,get_all=1 --output bench.json --baseline baseline.json
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import socket
+import asyncio
+import argparse
+import subprocess
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+
+load_dotenv()
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+# 操作名 -> MCP工具名
+OPERATIONS = {
+    "save": "save_memory",
+    "search": "search_memories",
+    "search_batch": "search_memories_batch",
+    "get_all": "get_all_memories",
+}
+
+WORDS = (
+    "coffee tea hiking chess jazz python rust tokyo berlin lisbon cats dogs sushi pasta "
+    "running cycling piano guitar novels podcasts winter summer mountains beaches museums "
+    "gardening photography yoga climbing sailing painting baking cinema theater football"
+).split()
+
+def parse_args():
+    """
+    解析命令行参数
+    """
+    parser = argparse.ArgumentParser(description="MCP工具压测")
+    parser.add_argument("--url", default=None, help="服务的SSE地址（默认 http://localhost:$PORT/sse）")
+    parser.add_argument("--offline", action="store_true", help="以 LLM_PROVIDER=fake 启动MCP服务子进程")
+    parser.add_argument("--clients", type=int, default=8, help="并发MCP客户端数")
+    parser.add_argument("--requests", type=int, default=400, help="总请求数（未指定 --duration 时）")
+    parser.add_argument("--duration", type=float, default=None, help="压测时长（秒），优先于 --requests")
+    parser.add_argument("--warmup", type=int, default=2, help="每个客户端不计入统计的预热请求数")
+    parser.add_argument("--mix", default="save=1,search=4,get_all=1", help="操作比例，如 save=1,search=4,get_all=1（可选操作: save, search, search_batch, get_all）")
+    parser.add_argument("--users", type=int, default=4, help="请求分布的 user_id 数量")
+    parser.add_argument("--page-size", type=int, default=50, help="get_all_memories 的分页大小")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子，保证请求序列可复现")
+    parser.add_argument("--dims", type=int, default=None, help="离线模式的嵌入维度（默认沿用 EMBEDDING_DIMS）")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="离线模式替身LLM的人工延迟")
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0, help="离线模式替身嵌入的人工延迟")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="离线模式人工延迟的随机抖动上限")
+    parser.add_argument("--server-env", action="append", default=[], help="离线模式传给服务的额外环境变量 KEY=VALUE")
+    parser.add_argument("--output", help="结果JSON文件（默认输出到标准输出）")
+    parser.add_argument("--baseline", help="基线结果JSON，用于退化检查")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="允许的最大退化比例")
+    return parser.parse_args()
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """
+    解析操作比例
+    """
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"未知操作: {name}（可选: {', '.join(OPERATIONS)}）")
+        mix[name] = float(weight or 1)
+    return mix
+
+def free_port() -> int:
+    """
+    获取一个空闲端口
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_for_port(port: int, timeout: float, process: subprocess.Popen) -> None:
+    """
+    等待服务开始监听
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"服务进程已退出，退出码: {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.5)
+    raise TimeoutError(f"服务未在 {timeout}s 内启动")
+
+def start_offline_stack(args) -> tuple:
+    """
+    以离线替身提供商启动MCP服务子进程
+
+    Returns:
+        tuple: (SSE地址, 服务子进程)
+    """
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        "TRANSPORT": "sse",
+        "HOST": "127.0.0.1",
+        "PORT": str(port),
+        "LLM_PROVIDER": "fake",
+        "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        "FAKE_EMBEDDING_LATENCY_MS": str(args.embed_latency_ms),
+        "FAKE_LATENCY_JITTER_MS": str(args.jitter_ms),
+    })
+    if args.dims:
+        env["EMBEDDING_DIMS"] = str(args.dims)
+    for item in args.server_env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    if not env.get("DATABASE_URL") and env.get("VECTOR_STORE_PROVIDER") != "memory":
+        raise ValueError("离线模式需要 DATABASE_URL 指向本地 pgvector，或设置 VECTOR_STORE_PROVIDER=memory")
+
+    # 服务日志写到stderr，stdout只输出JSON报告
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, "src", "main.py")], env=env, stdout=sys.stderr)
+    try:
+        wait_for_port(port, timeout=120, process=process)
+    except Exception:
+        process.terminate()
+        raise
+    return f"http://127.0.0.1:{port}/sse", process
+
+# ---------------------------------------------------------------------------
+# 压测
+# ---------------------------------------------------------------------------
+
+class Budget:
+    """
+    按请求数或时长分配请求
+    """
+    def __init__(self, requests: int, duration: Optional[float]):
+        self.remaining = requests
+        self.deadline = None if duration is None else time.monotonic() + duration
+
+    def take(self) -> bool:
+        if self.deadline is not None:
+            return time.monotonic() < self.deadline
+        if self.remaining <= 0:
+            return False
+        self.remaining -= 1
+        return True
+
+def make_arguments(operation: str, rng: random.Random, user_id: str, page_size: int) -> Dict[str, Any]:
+    """
+    生成一次工具调用的参数
+    """
+    if operation == "save":
+        words = rng.sample(WORDS, 3)
+        return {"text": f"The user likes {words[0]} and {words[1]}. They often talk about {words[2]}.", "user_id": user_id}
+    if operation == "search":
+        return {"query": f"what does the user think about {rng.choice(WORDS)}", "limit": 5, "user_id": user_id}
+    if operation == "search_batch":
+        queries = [{"query": f"what does the user think about {word}", "limit": 5} for word in rng.sample(WORDS, 4)]
+        return {"queries": queries, "user_id": user_id}
+    return {"page_size": page_size, "user_id": user_id}
+
+async def run_client(index: int, url: str, args, mix: Dict[str, float], budget: Budget, samples: List[tuple]) -> None:
+    """
+    单个MCP客户端的请求循环
+    """
+    rng = random.Random(args.seed * 1000 + index)
+    names, weights = list(mix), list(mix.values())
+    async with sse_client(url) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            completed = 0
+            while completed < args.warmup or budget.take():
+                operation = rng.choices(names, weights)[0]
+                user_id = f"bench-user-{rng.randrange(args.users)}"
+                arguments = make_arguments(operation, rng, user_id, args.page_size)
+
+                start = time.perf_counter()
+                try:
+                    result = await session.call_tool(OPERATIONS[operation], arguments)
+                    text = result.content[0].text if result.content else ""
+                    ok = not result.isError and not text.startswith("Error")
+                except Exception:
+                    ok = False
+                elapsed = time.perf_counter() - start
+
+                if completed >= args.warmup:
+                    samples.append((operation, elapsed, ok, time.monotonic()))
+                completed += 1
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    最近秩百分位数
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+def summarize(samples: List[tuple], wall_time: float) -> Dict[str, Any]:
+    """
+    汇总一组样本
+    """
+    latencies = [sample[1] for sample in samples]
+    errors = sum(1 for sample in samples if not sample[2])
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "throughput_rps": round(len(samples) / wall_time, 2) if wall_time > 0 else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "max": round(max(latencies) * 1000, 2) if latencies else 0.0,
+        },
+    }
+
+async def run_benchmark(url: str, args) -> Dict[str, Any]:
+    """
+    运行压测并生成报告
+    """
+    mix = parse_mix(args.mix)
+    budget = Budget(args.requests, args.duration)
+    samples: List[tuple] = []
+
+    start = time.monotonic()
+    await asyncio.gather(*(run_client(index, url, args, mix, budget, samples) for index in range(args.clients)))
+    wall_time = time.monotonic() - start
+
+    return {
+        "config": {
+            "url": url,
+            "offline": args.offline,
+            "clients": args.clients,
+            "requests": args.requests if args.duration is None else None,
+            "duration": args.duration,
+            "mix": mix,
+            "users": args.users,
+            "seed": args.seed,
+        },
+        "wall_time_s": round(wall_time, 3),
+        "total": summarize(samples, wall_time),
+        "operations": {
+            OPERATIONS[operation]: summarize([sample for sample in samples if sample[0] == operation], wall_time)
+            for operation in mix
+        },
+    }
+
+def check_regression(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """
+    与基线比较吞吐和p95延迟
+
+    Returns:
+        List[str]: 超过阈值的退化项
+    """
+    failures = []
+    for name, current in [("total", report["total"])] + list(report["operations"].items()):
+        previous = baseline["total"] if name == "total" else baseline.get("operations", {}).get(name)
+        if not previous or not previous.get("requests"):
+            continue
+        old_p95, new_p95 = previous["latency_ms"]["p95"], current["latency_ms"]["p95"]
+        if old_p95 > 0 and new_p95 > old_p95 * (1 + max_regression):
+            failures.append(f"{name}: p95 {old_p95}ms -> {new_p95}ms")
+        old_rps, new_rps = previous["throughput_rps"], current["throughput_rps"]
+        if name == "total" and old_rps > 0 and new_rps < old_rps * (1 - max_regression):
+            failures.append(f"{name}: throughput {old_rps} -> {new_rps} rps")
+    return failures
+
+def main():
+    """
+    主函数
+    """
+    args = parse_args()
+    process = None
+    url = args.url or f"http://localhost:{os.getenv('PORT') or '8050'}/sse"
+
+    try:
+        if args.offline:
+            url, process = start_offline_stack(args)
+        report = asyncio.run(run_benchmark(url, args))
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            failures = check_regression(report, json.load(f), args.max_regression)
+        if failures:
+            print("性能退化超过阈值:", file=sys.stderr)
+            for failure in failures:
+                print(f"  {failure}", file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
@@ -16,6 +16,8 @@ from dotenv import load_dotenv
 
 # 添加项目根目录到 Python 路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+# src 内模块之间使用平铺导入（与 src/main.py 的运行方式一致）
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from src.utils import get_mem0_client
 
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+记忆批量导出脚本
+
+把一个用户（或整个集合）的记忆流式导出为 JSONL 或 Parquet 文件，用于备份和迁移。
+pgvector 存储使用服务端游标分批读取，导出数百万条记忆时内存占用也只有一个批次。
+导出的 JSONL 文件可以用 scripts/import_memories.py 重新导入。
+
+用法:
+    python scripts/export_memories.py alice.jsonl --user-id alice
+    python scripts/export_memories.py alice.parquet --user-id alice --include-vectors
+    python scripts/export_memories.py backup.jsonl --all
+"""
+
+import os
+import sys
+import json
+import argparse
+import logging
+from dotenv import load_dotenv
+
+# src 内模块之间使用平铺导入（与 src/main.py 的运行方式一致）
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bulk_export import FORMATS, export_memories
+from memory_store import STREAM_BATCH_SIZE
+from utils import get_mem0_client
+
+load_dotenv()
+
+def parse_args():
+    """
+    解析命令行参数
+    """
+    parser = argparse.ArgumentParser(description="导出 mem0_memories 集合中的记忆")
+    parser.add_argument("path", help="目标文件路径（.jsonl 或 .parquet）")
+    parser.add_argument("--format", choices=FORMATS, help="导出格式（默认按扩展名判断）")
+    parser.add_argument("--user-id", help="要导出的用户（默认 MEM0_DEFAULT_USER_ID）")
+    parser.add_argument("--agent-id", help="只导出该 agent 的记忆")
+    parser.add_argument("--run-id", help="只导出该 run 的记忆")
+    parser.add_argument("--all", action="store_true", help="导出整个集合（忽略 --user-id）")
+    parser.add_argument("--include-vectors", action="store_true", help="同时导出向量")
+    parser.add_argument("--batch-size", type=int, default=STREAM_BATCH_SIZE, help="每批读取的行数")
+    return parser.parse_args()
+
+def main():
+    """
+    主函数
+    """
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    filters = {"agent_id": args.agent_id, "run_id": args.run_id}
+    if not args.all:
+        filters["user_id"] = args.user_id or os.getenv("MEM0_DEFAULT_USER_ID", "user")
+    filters = {key: value for key, value in filters.items() if value}
+
+    print(f"导出范围: {filters or '整个集合'}")
+    report = export_memories(
+        get_mem0_client(),
+        args.path,
+        filters,
+        fmt=args.format,
+        include_vectors=args.include_vectors,
+        batch_size=max(1, args.batch_size),
+        progress=lambda report: print(f"已导出 {report['exported']} 条（{report['records_per_second']} 条/秒）", flush=True),
+    )
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+记忆批量导入脚本
+
+把 JSONL 或 CSV 文件流式导入到 mem0_memories 集合，用于大规模回填历史记录。
+默认不经过LLM，原文直接作为记忆，按批次嵌入并用 COPY 写入；--infer 时每条记录走完整的 mem0 add 流程。
+每个批次完成后保存检查点（默认 <源文件>.checkpoint），中断后重新运行同一命令即可继续。
+
+每行（JSONL）或每列（CSV）的字段：text（必填）、id、user_id、agent_id、run_id、created_at、metadata，
+其余字段并入元数据。
+
+用法:
+    python scripts/import_memories.py notes.jsonl --user-id alice
+    python scripts/import_memories.py notes.csv --batch-size 1000 --write-method insert
+    python scripts/import_memories.py notes.jsonl --infer --workers 8 --report report.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import logging
+from dotenv import load_dotenv
+
+# src 内模块之间使用平铺导入（与 src/main.py 的运行方式一致）
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bulk_import import DEFAULT_BATCH_SIZE, DEFAULT_WORKERS, FORMATS, WRITE_METHODS, BulkImporter
+from utils import get_mem0_client
+
+load_dotenv()
+
+def parse_args():
+    """
+    解析命令行参数
+    """
+    parser = argparse.ArgumentParser(description="批量导入记忆到 mem0_memories 集合")
+    parser.add_argument("path", help="源文件路径（JSONL 或 CSV）")
+    parser.add_argument("--format", choices=FORMATS, help="源文件格式（默认按扩展名判断）")
+    parser.add_argument("--infer", action="store_true", help="对每条记录执行完整的 mem0 add 流程（事实抽取、去重更新）")
+    parser.add_argument("--user-id", help="记录未提供 user_id 时使用的用户（默认 MEM0_DEFAULT_USER_ID）")
+    parser.add_argument("--agent-id", help="记录未提供 agent_id 时使用的 agent")
+    parser.add_argument("--run-id", help="记录未提供 run_id 时使用的 run")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="单个批次的记录数")
+    parser.add_argument("--write-method", choices=WRITE_METHODS, default="copy", help="写入 pgvector 的方式")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="--infer 时的并行线程数")
+    parser.add_argument("--checkpoint", help="检查点文件路径（默认 <源文件>.checkpoint）")
+    parser.add_argument("--no-resume", action="store_true", help="忽略已有检查点，从头导入")
+    parser.add_argument("--report", help="把吞吐报告写入JSON文件")
+    return parser.parse_args()
+
+def print_progress(report):
+    """
+    输出一个批次完成后的进度
+    """
+    print(
+        f"已处理 {report['skipped'] + report['read']} 条: 写入 {report['imported']}，重复 {report['duplicates']}，"
+        f"无效 {report['invalid']}，失败 {report['failed']}（{report['records_per_second']} 条/秒）",
+        flush=True,
+    )
+
+def main():
+    """
+    主函数
+    """
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if not os.path.isfile(args.path):
+        print(f"错误: 源文件不存在: {args.path}")
+        return 1
+
+    defaults = {
+        "user_id": args.user_id or os.getenv("MEM0_DEFAULT_USER_ID", "user"),
+        "agent_id": args.agent_id,
+        "run_id": args.run_id,
+    }
+    importer = BulkImporter(
+        get_mem0_client(),
+        batch_size=args.batch_size,
+        write_method=args.write_method,
+        infer=args.infer,
+        workers=args.workers,
+        defaults=defaults,
+        progress=print_progress,
+    )
+
+    checkpoint = args.checkpoint or f"{args.path}.checkpoint"
+    try:
+        report = importer.run(args.path, args.format, checkpoint, resume=not args.no_resume)
+    except KeyboardInterrupt:
+        print(f"已中断，重新运行同一命令将从检查点 {checkpoint} 继续")
+        return 130
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0 if report["failed"] == 0 else 2
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+向量索引管理脚本
+
+校验并创建 mem0_memories 集合上的 HNSW / IVFFlat 索引，构建期间输出进度。
+索引参数默认读取与服务相同的环境变量（VECTOR_INDEX_METHOD 等），可以用命令行参数覆盖。
+
+用法:
+    python scripts/manage_vector_index.py --check
+    python scripts/manage_vector_index.py --method hnsw --m 16 --ef-construction 64
+    python scripts/manage_vector_index.py --method ivfflat --lists 1000 --rebuild
+"""
+
+import os
+import sys
+import json
+import argparse
+from dotenv import load_dotenv
+
+# src 内模块之间使用平铺导入（与 src/main.py 的运行方式一致）
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from sqlalchemy import create_engine
+
+from utils import build_mem0_config
+from vector_index import IndexSpec, build_vector_index, check_vector_index
+
+load_dotenv()
+
+def parse_args():
+    """
+    解析命令行参数
+    """
+    parser = argparse.ArgumentParser(description="管理 mem0_memories 集合的向量索引")
+    parser.add_argument("--check", action="store_true", help="只校验索引，不做修改")
+    parser.add_argument("--rebuild", action="store_true", help="以临时名构建新索引，成功后替换不一致或无效的索引")
+    parser.add_argument("--method", choices=["hnsw", "ivfflat"], help="索引类型")
+    parser.add_argument("--measure", choices=["cosine", "l2", "ip"], help="距离度量（需与向量存储的查询度量一致）")
+    parser.add_argument("--m", type=int, help="HNSW 每个节点的最大连接数")
+    parser.add_argument("--ef-construction", type=int, help="HNSW 构建时的候选列表大小")
+    parser.add_argument("--lists", type=int, help="IVFFlat 聚类数（默认按行数计算）")
+    return parser.parse_args()
+
+def main():
+    """
+    主函数
+    """
+    args = parse_args()
+
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        print("错误: DATABASE_URL 环境变量未设置")
+        return 1
+
+    config = build_mem0_config()["vector_store"]["config"]
+    collection_name = config["collection_name"]
+    dims = config["embedding_model_dims"]
+
+    spec = IndexSpec.from_env()
+    if args.method:
+        spec.method = args.method
+    if args.measure:
+        spec.measure = args.measure
+    if args.m:
+        spec.m = args.m
+    if args.ef_construction:
+        spec.ef_construction = args.ef_construction
+    if args.lists:
+        spec.lists = args.lists
+
+    print(f"集合: {collection_name}，维度: {dims}，索引: {spec.method} ({spec.opclass})")
+
+    engine = create_engine(database_url)
+    try:
+        result = check_vector_index(engine, collection_name, dims, spec)
+        print(f"当前状态: {result['status']}")
+        for index in result["indexes"]:
+            print(f"  {index['name']}: {index['definition']} (valid={index['valid']})")
+
+        if args.check or result["status"] in ("ok", "unsupported"):
+            if result["status"] == "unsupported":
+                print(f"无法创建索引: {result['reason']}")
+            return 0 if result["status"] == "ok" else 1
+
+        if result["status"] in ("mismatch", "invalid") and not args.rebuild:
+            print("现有索引与配置不一致，使用 --rebuild 重建")
+            return 1
+
+        def report(progress):
+            print(f"  进度: {json.dumps(progress)}")
+
+        build_vector_index(engine, collection_name, spec, replace=args.rebuild, report=report, progress_interval=2.0)
+        result = check_vector_index(engine, collection_name, dims, spec)
+        print(f"构建完成，当前状态: {result['status']}")
+        return 0 if result["status"] == "ok" else 1
+    finally:
+        engine.dispose()
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
@@ -0,0 +1,85 @@
+"""批量搜索模块
+
+一次MCP调用执行多个查询，绕过 mem0 逐条 search 的开销：
+- 所有查询文本通过嵌入包装器的 embed_many 在一次请求中嵌入（命中嵌入缓存的不再请求）
+- 向量查找：supabase（pgvector）存储在一条SQL中完成（LATERAL 子查询，每个查询独立 top-k）；
+  进程内存储和热缓存命中时一次矩阵乘法完成；其它存储并行调用 search
+- 结果按查询分组，格式与 mem0 search 的结果一致
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import tracing
+from memory_store import format_memory, has_sql_store, search_vectors
+from vector_index import store_measure
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# 单次调用最多的查询数
+MAX_BATCH_QUERIES = 32
+
+# 单个查询最多的结果数
+MAX_BATCH_LIMIT = 100
+
+# 回退到逐条 search 时的最大并行数（每个查询占用一个连接池连接）
+MAX_PARALLEL_SEARCHES = 8
+
+
+def embed_queries(memory_client: Any, queries: List[str]) -> List[List[float]]:
+    """在一次请求中嵌入所有查询文本"""
+    embedder = memory_client.embedding_model
+    if hasattr(embedder, "embed_many"):
+        return embedder.embed_many(queries, "search")
+    return [embedder.embed(query, "search") for query in queries]
+
+
+def _format_hit(memory_id: str, score: float, payload: Dict[str, Any]) -> Dict[str, Any]:
+    memory = format_memory(memory_id, payload)
+    memory["score"] = score
+    return memory
+
+
+def search_batch(
+    memory_client: Any,
+    queries: List[str],
+    limits: List[int],
+    filters: Dict[str, Any],
+) -> List[List[Dict[str, Any]]]:
+    """执行一批语义搜索
+
+    Args:
+        memory_client: Memory 实例
+        queries: 查询文本
+        limits: 每个查询的结果数上限
+        filters: 所有查询共用的作用域过滤条件
+
+    Returns:
+        List[List[Dict[str, Any]]]: 与输入顺序一致的每个查询的记忆列表（按相关度排序）
+    """
+    if len(queries) != len(limits):
+        raise ValueError("queries and limits must have the same length")
+    if not queries:
+        return []
+
+    with tracing.span("mem0.search_batch", {"mem0.queries": len(queries)}):
+        vectors = embed_queries(memory_client, queries)
+        store = memory_client.vector_store
+
+        if hasattr(store, "search_many"):
+            # 进程内存储或热缓存
+            results = store.search_many(vectors, limits, filters)
+            return [[_format_hit(hit.id, hit.score, hit.payload or {}) for hit in hits] for hits in results]
+
+        if has_sql_store(memory_client):
+            results = search_vectors(memory_client, vectors, limits, filters, store_measure(memory_client))
+            return [[_format_hit(*hit) for hit in hits] for hits in results]
+
+        def search_one(index: int) -> List[Any]:
+            return store.search(query=queries[index], vectors=vectors[index], limit=limits[index], filters=filters)
+
+        with ThreadPoolExecutor(max_workers=min(len(queries), MAX_PARALLEL_SEARCHES)) as pool:
+            results = list(pool.map(search_one, range(len(queries))))
+        return [[_format_hit(hit.id, hit.score, hit.payload or {}) for hit in hits] for hits in results]
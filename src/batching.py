@@ -0,0 +1,278 @@
+"""写入微批处理模块
+
+把短时间窗口内到达的多次 save_memory 合并为一次 Memory.add 调用：
+同一批文本共用一次LLM事实抽取，结果再分发给各个调用方。
+
+mem0 对整批文本一起抽取事实，返回的事件不带来源。批次中有多条文本时，每个事件按与各来源文本的
+嵌入相似度（嵌入失败时按字符三元组相似度）分配给最相近的一条，调用方只拿到分配给自己的事件。
+合并写入失败时，只有确定还没有写入任何记忆（分阶段计时中没有向量写入和历史记录）的批次才逐条重试；
+否则重试会重复写入已经保存的记忆，所有调用方都收到这次失败的异常。
+"""
+
+import os
+import json
+import math
+import time
+import asyncio
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from metrics import get_registry
+from stage_timing import may_have_written
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+_registry = get_registry()
+BATCH_SIZE = _registry.histogram(
+    "mem0_add_batch_size",
+    "Number of texts coalesced into one Memory.add call",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+BATCH_WAIT_SECONDS = _registry.histogram(
+    "mem0_add_batch_wait_seconds",
+    "Time a text waited in the batching window before its batch was dispatched",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+
+@dataclass
+class _PendingBatch:
+    """等待发送的一批文本（同一组 add 参数）"""
+    params: Dict[str, Any]
+    texts: List[str] = field(default_factory=list)
+    futures: List[asyncio.Future] = field(default_factory=list)
+    enqueued_at: List[float] = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+class AddBatcher:
+    """Memory.add 的微批处理器
+
+    参数（user_id 等）相同的文本才会合并；窗口到期或达到批大小上限时立即发送。
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[str], Dict[str, Any]], Awaitable[Any]],
+        embed: Optional[Callable[[List[str]], Awaitable[List[List[float]]]]] = None,
+        window_ms: float = 50,
+        max_items: int = 16,
+    ):
+        """初始化批处理器
+
+        Args:
+            run_batch: 以 (文本列表, add参数) 执行一次合并写入的协程函数
+            embed: 批量嵌入文本的协程函数，用于把事件分配给来源文本；为None时只用字符相似度
+            window_ms: 合并窗口（毫秒）
+            max_items: 单批最大文本数
+        """
+        self.run_batch = run_batch
+        self.embed = embed
+        self.window = window_ms / 1000.0
+        self.max_items = max_items
+        self._pending: Dict[str, _PendingBatch] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+        logger.info(f"写入微批处理已启用，窗口: {window_ms}ms，批大小上限: {max_items}")
+
+    @classmethod
+    def from_env(
+        cls,
+        run_batch: Callable[[List[str], Dict[str, Any]], Awaitable[Any]],
+        embed: Optional[Callable[[List[str]], Awaitable[List[List[float]]]]] = None,
+    ) -> Optional["AddBatcher"]:
+        """根据环境变量创建批处理器，窗口为0时返回None"""
+        window_ms = float(os.getenv("MEM0_BATCH_WINDOW_MS", "0"))
+        if window_ms <= 0:
+            return None
+        return cls(run_batch, embed, window_ms=window_ms, max_items=int(os.getenv("MEM0_BATCH_MAX_ITEMS", "16")))
+
+    async def submit(self, text: str, params: Dict[str, Any]) -> Any:
+        """提交一条文本并等待所在批次的写入结果
+
+        Args:
+            text: 要保存的记忆文本
+            params: 传给 Memory.add 的关键字参数
+
+        Returns:
+            Any: 批次只有这一条文本时为 Memory.add 的返回值，否则为分配给这条文本的事件（见 caller_result）
+        """
+        loop = asyncio.get_running_loop()
+        key = json.dumps(params, sort_keys=True, default=str)
+
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = _PendingBatch(params=params)
+            batch.timer = loop.call_later(self.window, self._dispatch, key)
+
+        future = loop.create_future()
+        batch.texts.append(text)
+        batch.futures.append(future)
+        batch.enqueued_at.append(time.monotonic())
+
+        if len(batch.texts) >= self.max_items:
+            self._dispatch(key)
+
+        return await future
+
+    def _dispatch(self, key: str) -> None:
+        """把一个批次从等待表中取出并发送"""
+        batch = self._pending.pop(key, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        # 保留任务引用直到完成，避免被垃圾回收，关闭时也能等待
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def drain(self) -> None:
+        """立即发送所有等待中的批次，并等待所有批次写入完成（服务关闭时调用）"""
+        for key in list(self._pending):
+            self._dispatch(key)
+        if self._tasks:
+            logger.info(f"等待 {len(self._tasks)} 个合并写入批次完成")
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run(self, batch: _PendingBatch) -> None:
+        """执行合并写入并分发结果"""
+        now = time.monotonic()
+        # 调用方已取消的文本不再写入
+        live = [
+            (text, future, enqueued_at)
+            for text, future, enqueued_at in zip(batch.texts, batch.futures, batch.enqueued_at)
+            if not future.cancelled()
+        ]
+        if not live:
+            return
+
+        BATCH_SIZE.observe(len(live))
+        for _, _, enqueued_at in live:
+            BATCH_WAIT_SECONDS.observe(now - enqueued_at)
+        logger.debug(f"发送合并写入批次: {len(live)} 条文本")
+
+        texts = [text for text, _, _ in live]
+        try:
+            result = await self.run_batch(texts, batch.params)
+        except Exception as e:
+            if len(live) == 1 or may_have_written(e):
+                # 批次可能已经写入了部分记忆，逐条重试会重复写入
+                for _, future, _ in live:
+                    _resolve(future, error=e)
+                return
+            # 还没有写入任何记忆：逐条重试，一条文本出错不让整批调用方失败
+            logger.warning(f"合并写入在写入记忆之前失败，逐条重试 {len(live)} 条文本: {e}")
+            await asyncio.gather(*(self._run_single(text, future, batch.params) for text, future, _ in live))
+            return
+
+        if len(live) == 1:
+            _resolve(live[0][1], result=result)
+            return
+
+        events = result.get("results", []) if isinstance(result, dict) else result
+        owned = attribute_events(texts, events, await self._embed_for_attribution(texts, events))
+        for (_, future, _), own in zip(live, owned):
+            _resolve(future, result=caller_result(result, own, len(live)))
+
+    async def _embed_for_attribution(self, texts: List[str], events: List[Dict[str, Any]]) -> Optional[List[List[float]]]:
+        """嵌入来源文本和事件文本，失败时返回None（改用字符相似度）"""
+        if self.embed is None or not events:
+            return None
+        try:
+            return await self.embed(texts + [event_text(event) for event in events])
+        except Exception as e:
+            logger.warning(f"嵌入合并写入的事件失败，按字符相似度分配: {e}")
+            return None
+
+    async def _run_single(self, text: str, future: asyncio.Future, params: Dict[str, Any]) -> None:
+        """单独写入一条文本"""
+        if future.cancelled():
+            return
+        try:
+            result = await self.run_batch([text], params)
+        except Exception as e:
+            _resolve(future, error=e)
+        else:
+            _resolve(future, result=result)
+
+
+def event_text(event: Dict[str, Any]) -> str:
+    """事件对应的记忆文本（DELETE 事件为被删除的旧记忆）"""
+    return event.get("memory") or event.get("previous_memory") or ""
+
+
+def attribute_events(
+    texts: List[str],
+    events: List[Dict[str, Any]],
+    vectors: Optional[List[List[float]]] = None,
+) -> List[List[Dict[str, Any]]]:
+    """把合并写入返回的事件分配给最相近的来源文本
+
+    Args:
+        texts: 批次中的来源文本
+        events: Memory.add 返回的事件
+        vectors: 来源文本和各事件文本的嵌入（顺序为 texts 之后依次是每个事件），
+            为None时使用字符三元组的余弦相似度
+
+    Returns:
+        List[List[Dict[str, Any]]]: 与 texts 顺序一致，每条文本分到的事件
+    """
+    owned: List[List[Dict[str, Any]]] = [[] for _ in texts]
+    if len(texts) == 1:
+        owned[0] = list(events)
+        return owned
+    if vectors is None:
+        vectors = [_trigrams(text) for text in texts] + [_trigrams(event_text(event)) for event in events]
+    sources = vectors[:len(texts)]
+    for event, target in zip(events, vectors[len(texts):]):
+        scores = [_cosine(source, target) for source in sources]
+        owned[scores.index(max(scores))].append(event)
+    return owned
+
+
+def caller_result(result: Any, events: List[Dict[str, Any]], size: int) -> Dict[str, Any]:
+    """构造分发给批次中一个调用方的结果
+
+    Args:
+        result: 合并写入的 Memory.add 返回值
+        events: 分配给该调用方的事件
+        size: 批次中的文本数
+
+    Returns:
+        Dict[str, Any]: 该调用方的 results、batch_size 和整批的 stage_timings
+    """
+    own: Dict[str, Any] = {"results": events, "batch_size": size}
+    if isinstance(result, dict) and "stage_timings" in result:
+        own["stage_timings"] = result["stage_timings"]
+    return own
+
+
+def _trigrams(text: str) -> Counter:
+    """规范化文本的字符三元组计数（对中文等不以空格分词的文本同样适用）"""
+    normalized = f" {' '.join(text.lower().split())} "
+    return Counter(normalized[index:index + 3] for index in range(max(1, len(normalized) - 2)))
+
+
+def _cosine(first: Any, second: Any) -> float:
+    """两个向量（稠密列表或稀疏计数）的余弦相似度"""
+    if isinstance(first, Counter):
+        dot = sum(count * second.get(key, 0) for key, count in first.items())
+        norms = math.sqrt(sum(c * c for c in first.values())) * math.sqrt(sum(c * c for c in second.values()))
+    else:
+        dot = sum(a * b for a, b in zip(first, second))
+        norms = math.sqrt(sum(a * a for a in first)) * math.sqrt(sum(b * b for b in second))
+    return dot / norms if norms else 0.0
+
+
+def _resolve(future: asyncio.Future, result: Any = None, error: Optional[BaseException] = None) -> None:
+    """设置调用方的结果或异常（调用方已取消时忽略）"""
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
@@ -0,0 +1,168 @@
+"""批量导出模块
+
+把作用域内（或整个集合）的记忆流式导出到文件，用于备份和迁移大租户：
+- 通过 memory_store.stream_memories 分批读取（pgvector 使用服务端游标），内存中只保留一个批次
+- 导出全部字段：id、记忆文本、hash、created_at、updated_at、user_id/agent_id/run_id、元数据，可选向量
+- jsonl：每行一个记忆，字段与 get_all_memories 返回的一致（可选 vector）；导出文件可以直接用 bulk_import 导入（保留ID和时间戳，向量重新计算）
+- parquet：每个批次写为一个 row group，metadata 为JSON字符串列，vector 为 float32 列表列（需要安装 pyarrow）
+- 先写入临时文件，完成后原子替换目标文件
+"""
+
+import os
+import json
+import time
+import logging
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, List, Optional
+
+import tracing
+from memory_store import STREAM_BATCH_SIZE, format_memory, stream_memories
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+FORMATS = ("jsonl", "parquet")
+
+# parquet 的固定列，元数据以JSON字符串保存
+PARQUET_COLUMNS = ("id", "memory", "hash", "created_at", "updated_at", "user_id", "agent_id", "run_id", "metadata")
+
+
+@dataclass
+class ExportStats:
+    """导出统计"""
+    path: str
+    format: str
+    exported: int = 0
+    batches: int = 0
+    bytes: int = 0
+    elapsed_seconds: float = 0.0
+
+    def report(self) -> Dict[str, Any]:
+        """吞吐报告
+
+        Returns:
+            Dict[str, Any]: 导出条数、文件大小、耗时和每秒导出的记录数
+        """
+        report = asdict(self)
+        report["elapsed_seconds"] = round(self.elapsed_seconds, 3)
+        report["records_per_second"] = round(self.exported / self.elapsed_seconds, 1) if self.elapsed_seconds else 0.0
+        return report
+
+
+def detect_format(path: str) -> str:
+    """按扩展名判断导出格式，默认 jsonl"""
+    return "parquet" if path.lower().endswith(".parquet") else "jsonl"
+
+
+def export_record(memory_id: str, vector: Optional[List[float]], payload: Dict[str, Any]) -> Dict[str, Any]:
+    """把一行转换为导出记录"""
+    record = format_memory(memory_id, payload)
+    if vector is not None:
+        record["vector"] = vector
+    return record
+
+
+class JsonlWriter:
+    """每行一个JSON记录"""
+
+    def __init__(self, path: str, include_vectors: bool):
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        self._file.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetWriter:
+    """每个批次写为一个 row group"""
+
+    def __init__(self, path: str, include_vectors: bool):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ValueError("Parquet export requires pyarrow (pip install pyarrow)") from e
+
+        fields = [pa.field(column, pa.string()) for column in PARQUET_COLUMNS]
+        if include_vectors:
+            fields.append(pa.field("vector", pa.list_(pa.float32())))
+        self._pa = pa
+        self._schema = pa.schema(fields)
+        self._writer = pq.ParquetWriter(path, self._schema, compression="zstd")
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        columns = {column: [] for column in self._schema.names}
+        for record in records:
+            for column in PARQUET_COLUMNS:
+                value = record.get(column)
+                if column == "metadata" and value is not None:
+                    value = json.dumps(value, ensure_ascii=False)
+                columns[column].append(None if value is None else str(value))
+            if "vector" in columns:
+                columns["vector"].append(record.get("vector"))
+        self._writer.write_table(self._pa.table(columns, schema=self._schema))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+WRITERS = {"jsonl": JsonlWriter, "parquet": ParquetWriter}
+
+
+def export_memories(
+    memory_client: Any,
+    path: str,
+    filters: Dict[str, Any],
+    fmt: Optional[str] = None,
+    include_vectors: bool = False,
+    batch_size: int = STREAM_BATCH_SIZE,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """把记忆流式导出到文件
+
+    Args:
+        memory_client: Memory 实例
+        path: 目标文件路径（已存在时覆盖）
+        filters: 作用域过滤条件（为空时导出整个集合）
+        fmt: 导出格式，默认按扩展名判断
+        include_vectors: 是否导出向量
+        batch_size: 每批读取和写入的行数
+        progress: 每个批次写入后以吞吐报告调用
+
+    Returns:
+        Dict[str, Any]: 吞吐报告
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in WRITERS:
+        raise ValueError(f"Unsupported export format: {fmt!r} (expected jsonl or parquet)")
+    path = os.path.abspath(path)
+    tmp_path = f"{path}.tmp"
+    stats = ExportStats(path=path, format=fmt)
+
+    started = time.monotonic()
+    writer = WRITERS[fmt](tmp_path, include_vectors)
+    try:
+        with tracing.span("mem0.export", {"mem0.format": fmt}):
+            for rows in stream_memories(memory_client, filters, include_vectors, batch_size):
+                writer.write([export_record(*row) for row in rows])
+                stats.exported += len(rows)
+                stats.batches += 1
+                stats.elapsed_seconds = time.monotonic() - started
+                if progress:
+                    progress(stats.report())
+        writer.close()
+    except BaseException:
+        writer.close()
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+
+    stats.bytes = os.path.getsize(path)
+    stats.elapsed_seconds = time.monotonic() - started
+    report = stats.report()
+    logger.info(
+        f"导出完成 {path}: {stats.exported} 条记忆，{stats.bytes} 字节，{report['records_per_second']} 条/秒"
+    )
+    return report
@@ -0,0 +1,363 @@
+"""批量导入模块
+
+把历史记录（JSONL 或 CSV）流式导入为记忆，用于大规模回填：
+- 逐行读取源文件，按批处理，内存中只保留一个批次
+- 默认不经过LLM：原文直接作为记忆，一个批次的文本在一次嵌入请求中完成（受 EMBEDDING_BATCH_SIZE 切分），
+  supabase（pgvector）存储用 COPY 或多行 INSERT 写入，payload 格式与 mem0 写入的一致
+- infer=True 时每条记录走完整的 mem0 add 流程（事实抽取、去重更新），多线程并行
+- 每个批次写入后保存检查点（源文件路径和已处理的记录数），中断后从检查点继续
+- 记忆ID由源文件名（不含目录）、行号和内容确定性生成，重复导入同一文件时已写入的记录跳过（计为 duplicates），
+  文件移动到其它目录后重新导入也不会产生重复记忆
+
+每条记录的字段：
+- text（必填）：记忆文本；bulk_export 导出的 memory 字段同样可用
+- id、user_id、agent_id、run_id、created_at、updated_at（可选）：未提供作用域时使用调用方的默认值
+- metadata（可选）：对象或JSON字符串；其余字段也并入元数据
+
+直接写入不经过 mem0，不会写入 mem0 的历史记录。
+"""
+
+import os
+import csv
+import json
+import time
+import uuid
+import logging
+import itertools
+from dataclasses import dataclass, asdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import tracing
+from hot_cache import get_hot_cache
+from memory_store import build_payload, has_sql_store, insert_memories
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+FORMATS = ("jsonl", "csv")
+
+WRITE_METHODS = ("copy", "insert")
+
+# 单个批次的默认记录数
+DEFAULT_BATCH_SIZE = 500
+
+# infer 模式下并行执行 mem0 add 的默认线程数
+DEFAULT_WORKERS = 4
+
+SCOPE_KEYS = ("user_id", "agent_id", "run_id")
+
+# 记录中有特殊含义的字段，其余字段并入元数据
+RESERVED_FIELDS = ("text", "memory", "id", "hash", "created_at", "updated_at", "metadata", "vector") + SCOPE_KEYS
+
+
+@dataclass
+class ImportStats:
+    """导入统计"""
+    source: str
+    format: str
+    mode: str
+    skipped: int = 0
+    read: int = 0
+    imported: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    failed: int = 0
+    batches: int = 0
+    embed_seconds: float = 0.0
+    write_seconds: float = 0.0
+    elapsed_seconds: float = 0.0
+
+    def report(self) -> Dict[str, Any]:
+        """吞吐报告
+
+        Returns:
+            Dict[str, Any]: 各项计数、耗时和每秒处理的记录数
+        """
+        report = asdict(self)
+        for key in ("embed_seconds", "write_seconds", "elapsed_seconds"):
+            report[key] = round(report[key], 3)
+        report["records_per_second"] = round(self.read / self.elapsed_seconds, 1) if self.elapsed_seconds else 0.0
+        return report
+
+
+def detect_format(path: str) -> str:
+    """按扩展名判断源文件格式，默认 jsonl"""
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def iter_records(path: str, fmt: str) -> Iterator[Optional[Dict[str, Any]]]:
+    """逐条读取源文件中的记录
+
+    Args:
+        path: 源文件路径
+        fmt: 文件格式（jsonl / csv）
+
+    Yields:
+        Optional[Dict[str, Any]]: 记录；无法解析的 JSONL 行为None
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt!r} (expected jsonl or csv)")
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+            return
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield record if isinstance(record, dict) else None
+
+
+def load_checkpoint(path: str, source: str) -> int:
+    """读取检查点中已处理的记录数，检查点不存在或属于其它源文件时返回0"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        return 0
+    if checkpoint.get("source") != source:
+        logger.warning(f"检查点 {path} 属于其它源文件 {checkpoint.get('source')}，从头开始导入")
+        return 0
+    return int(checkpoint.get("offset") or 0)
+
+
+def save_checkpoint(path: str, source: str, offset: int, stats: ImportStats) -> None:
+    """原子地保存检查点"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"source": source, "offset": offset, "stats": stats.report()}, f)
+    os.replace(tmp_path, path)
+
+
+def build_memory(
+    record: Dict[str, Any],
+    index: int,
+    source: str,
+    defaults: Dict[str, Any],
+) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+    """把一条记录转换为 (记忆ID, 文本, payload)，记录无效时返回None
+
+    未提供 id 时以源文件名、行号和内容哈希生成确定的 uuid5，与源文件所在目录无关。
+    """
+    text = str(record.get("text") or record.get("memory") or "").strip()
+    if not text:
+        return None
+
+    metadata = record.get("metadata") or {}
+    if isinstance(metadata, str):
+        try:
+            metadata = json.loads(metadata)
+        except ValueError:
+            return None
+    if not isinstance(metadata, dict):
+        return None
+
+    scope = {key: record.get(key) or defaults.get(key) for key in SCOPE_KEYS}
+    if not any(scope.values()):
+        return None
+
+    extra = {key: value for key, value in record.items() if key and key not in RESERVED_FIELDS and value not in (None, "")}
+    payload = build_payload(text, scope, {**extra, **metadata}, record.get("created_at"))
+    if record.get("updated_at"):
+        payload["updated_at"] = record["updated_at"]
+    seed = f"{os.path.basename(source)}:{index}:{payload['hash']}"
+    memory_id = str(record.get("id") or uuid.uuid5(uuid.NAMESPACE_URL, seed))
+    return memory_id, text, payload
+
+
+def embed_texts(memory_client: Any, texts: List[str]) -> List[List[float]]:
+    """嵌入一个批次的文本（通过嵌入包装器按 EMBEDDING_BATCH_SIZE 合并请求）"""
+    embedder = memory_client.embedding_model
+    if hasattr(embedder, "embed_many"):
+        return embedder.embed_many(texts, "add")
+    return [embedder.embed(text, "add") for text in texts]
+
+
+class BulkImporter:
+    """把源文件流式导入到 mem0 客户端的向量存储"""
+
+    def __init__(
+        self,
+        memory_client: Any,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        write_method: str = "copy",
+        infer: bool = False,
+        workers: int = DEFAULT_WORKERS,
+        defaults: Optional[Dict[str, Any]] = None,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        on_write: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        """
+        Args:
+            memory_client: Memory 实例
+            batch_size: 单个批次的记录数
+            write_method: 直接写入 pgvector 的方式（copy / insert）
+            infer: 是否对每条记录执行完整的 mem0 add 流程
+            workers: infer 模式下的并行线程数
+            defaults: 记录未提供时使用的 user_id/agent_id/run_id
+            progress: 每个批次完成后以吞吐报告调用
+            on_write: 每个批次完成后对每个被写入的作用域调用（用于使搜索缓存失效）
+        """
+        if write_method not in WRITE_METHODS:
+            raise ValueError(f"Unsupported write method: {write_method!r} (expected copy or insert)")
+        self.memory_client = memory_client
+        self.batch_size = max(1, batch_size)
+        self.write_method = write_method
+        self.infer = infer
+        self.workers = max(1, workers)
+        self.defaults = defaults or {}
+        self.progress = progress
+        self.on_write = on_write
+
+    def run(
+        self,
+        path: str,
+        fmt: Optional[str] = None,
+        checkpoint_path: Optional[str] = None,
+        resume: bool = True,
+    ) -> Dict[str, Any]:
+        """导入一个源文件
+
+        Args:
+            path: 源文件路径
+            fmt: 文件格式，默认按扩展名判断
+            checkpoint_path: 检查点文件路径（可选）
+            resume: 从检查点继续；为False时从头导入并覆盖检查点
+
+        Returns:
+            Dict[str, Any]: 吞吐报告
+        """
+        source = os.path.abspath(path)
+        fmt = fmt or detect_format(path)
+        offset = load_checkpoint(checkpoint_path, source) if checkpoint_path and resume else 0
+        stats = ImportStats(source=source, format=fmt, mode="infer" if self.infer else "raw", skipped=offset)
+        if offset:
+            logger.info(f"从检查点继续导入 {source}：跳过前 {offset} 条记录")
+
+        started = time.monotonic()
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="mem0-import") if self.infer else None
+        try:
+            records = itertools.islice(enumerate(iter_records(path, fmt)), offset, None)
+            while True:
+                batch = list(itertools.islice(records, self.batch_size))
+                if not batch:
+                    break
+                with tracing.span("mem0.import_batch", {"mem0.records": len(batch)}):
+                    self._import_batch(batch, source, stats, pool)
+                offset = batch[-1][0] + 1
+                stats.elapsed_seconds = time.monotonic() - started
+                if checkpoint_path:
+                    save_checkpoint(checkpoint_path, source, offset, stats)
+                if self.progress:
+                    self.progress(stats.report())
+        finally:
+            if pool:
+                pool.shutdown(wait=True)
+            stats.elapsed_seconds = time.monotonic() - started
+
+        report = stats.report()
+        logger.info(
+            f"导入完成 {source}: 读取 {stats.read} 条，写入 {stats.imported} 条，重复 {stats.duplicates} 条，"
+            f"无效 {stats.invalid} 条，失败 {stats.failed} 条，{report['records_per_second']} 条/秒"
+        )
+        return report
+
+    def _import_batch(
+        self,
+        batch: List[Tuple[int, Optional[Dict[str, Any]]]],
+        source: str,
+        stats: ImportStats,
+        pool: Optional[ThreadPoolExecutor],
+    ) -> None:
+        """转换并写入一个批次"""
+        memories = []
+        for index, record in batch:
+            memory = build_memory(record, index, source, self.defaults) if record is not None else None
+            if memory is None:
+                stats.invalid += 1
+                logger.debug(f"跳过无效记录: 第 {index + 1} 条")
+                continue
+            memories.append(memory)
+        stats.read += len(batch)
+        stats.batches += 1
+        if not memories:
+            return
+
+        if pool:
+            self._add_with_inference(memories, stats, pool)
+        else:
+            self._write_raw(memories, stats)
+
+        scopes = {tuple((key, payload.get(key)) for key in SCOPE_KEYS) for _, _, payload in memories}
+        if self.on_write:
+            for scope in scopes:
+                self.on_write(dict(scope))
+
+    def _add_with_inference(self, memories: List[Tuple[str, str, Dict[str, Any]]], stats: ImportStats, pool: ThreadPoolExecutor) -> None:
+        """对每条记录执行完整的 mem0 add 流程"""
+        def add(memory: Tuple[str, str, Dict[str, Any]]) -> bool:
+            _, text, payload = memory
+            scope = {key: payload[key] for key in SCOPE_KEYS if key in payload}
+            metadata = {key: value for key, value in payload.items() if key not in SCOPE_KEYS + ("data", "hash", "created_at", "updated_at")}
+            try:
+                self.memory_client.add([{"role": "user", "content": text}], metadata=metadata or None, **scope)
+                return True
+            except Exception as e:
+                logger.warning(f"导入记录失败: {e}")
+                return False
+
+        started = time.monotonic()
+        results = list(pool.map(add, memories))
+        stats.write_seconds += time.monotonic() - started
+        stats.imported += sum(results)
+        stats.failed += len(results) - sum(results)
+
+    def _write_raw(self, memories: List[Tuple[str, str, Dict[str, Any]]], stats: ImportStats) -> None:
+        """一次嵌入整个批次，直接写入向量存储"""
+        sql_store = has_sql_store(self.memory_client)
+        if not sql_store:
+            # 其它存储的 insert 会覆盖ID相同的记忆，先跳过已存在的记录（也不再为其请求嵌入）
+            fresh = self._skip_existing(memories)
+            stats.duplicates += len(memories) - len(fresh)
+            memories = fresh
+            if not memories:
+                return
+
+        ids = [memory_id for memory_id, _, _ in memories]
+        payloads = [payload for _, _, payload in memories]
+
+        started = time.monotonic()
+        vectors = embed_texts(self.memory_client, [text for _, text, _ in memories])
+        stats.embed_seconds += time.monotonic() - started
+
+        started = time.monotonic()
+        if sql_store:
+            written = insert_memories(self.memory_client, list(zip(ids, vectors, payloads)), self.write_method)
+            stats.imported += written
+            stats.duplicates += len(memories) - written
+            cache = get_hot_cache()
+            if cache:
+                collection_name = self.memory_client.vector_store.collection_name
+                for user_id in {payload.get("user_id") for payload in payloads} - {None}:
+                    cache.invalidate((collection_name, str(user_id)))
+        else:
+            self.memory_client.vector_store.insert(vectors=vectors, payloads=payloads, ids=ids)
+            stats.imported += len(memories)
+        stats.write_seconds += time.monotonic() - started
+
+    def _skip_existing(self, memories: List[Tuple[str, str, Dict[str, Any]]]) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """过滤掉向量存储中已存在或在批次中重复的记忆ID"""
+        store = self.memory_client.vector_store
+        seen = set()
+        fresh = []
+        for memory in memories:
+            memory_id = memory[0]
+            if memory_id in seen or store.get(memory_id) is not None:
+                continue
+            seen.add(memory_id)
+            fresh.append(memory)
+        return fresh
@@ -7,27 +7,49 @@ import os
 import gc
 import time
 import threading
-import psycopg2
-from typing import Optional, Dict, Any
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Optional, Dict, Any, List, Tuple
+from sqlalchemy import text
 from contextlib import contextmanager
 from mem0 import Memory
 import logging
 
+from db_pool import DatabasePool
+from metrics import get_registry
+
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+CLIENT_EVICTIONS = get_registry().counter(
+    "mem0_client_evictions_total",
+    "Cached mem0 clients closed by ConnectionManager by reason (lru, idle, lifetime, shutdown)",
+    ["reason"],
+)
+CACHED_CLIENTS = get_registry().gauge(
+    "mem0_cached_clients",
+    "mem0 clients cached by ConnectionManager by state (in_use, idle)",
+    ["state"],
+)
+
+
+class ClientPoolExhausted(RuntimeError):
+    """客户端缓存已满且所有客户端都在使用中，等待超时"""
+
 class ConnectionManager:
     """简化的mem0ai客户端连接管理器
     
     功能：
     - 自动创建和复用客户端连接
+    - 客户端数量有硬上限，已满时按LRU淘汰空闲客户端，使用中的客户端不会被关闭
     - 定期清理空闲连接
+    - 所有客户端共享一个有界的数据库连接池
     - 线程安全操作
     """
     
-    def __init__(self, max_pool_size: int = 10, cleanup_interval: int = 300, idle_timeout: int = 600, max_lifetime: int = 3600):
+    def __init__(self, max_pool_size: int = 10, cleanup_interval: int = 300, idle_timeout: int = 600, max_lifetime: int = 3600, db_pool: Optional[DatabasePool] = None, acquire_timeout: float = 30, check_db_connections: Optional[bool] = None):
         """初始化连接管理器
         
         Args:
@@ -35,17 +57,28 @@ class ConnectionManager:
             cleanup_interval: 清理间隔（秒）
             idle_timeout: 空闲超时时间（秒）
             max_lifetime: 连接最大生存时间（秒）
+            db_pool: 共享数据库连接池，为None时根据环境变量创建
+            acquire_timeout: 缓存已满且没有可淘汰的空闲客户端时，等待空位的最长时间（秒）
+            check_db_connections: 定期统计时是否额外查询 pg_stat_activity，为None时读取 DB_CONNECTION_CHECK
         """
         self.max_pool_size = max_pool_size
         self.cleanup_interval = cleanup_interval
         self.idle_timeout = idle_timeout
         self.max_lifetime = max_lifetime
+        self.acquire_timeout = acquire_timeout
+        self.db_pool = db_pool or DatabasePool.from_env()
+        if check_db_connections is None:
+            check_db_connections = os.getenv("DB_CONNECTION_CHECK", "false").lower() == "true"
+        self.check_db_connections = check_db_connections
         
-        self._clients: Dict[str, Memory] = {}
+        # 按最近使用顺序排列，最久未使用的在前
+        self._clients: "OrderedDict[str, Memory]" = OrderedDict()
         self._connection_counts: Dict[str, int] = {}
         self._last_used: Dict[str, float] = {}
         self.client_created_time: Dict[str, float] = {}
+        self._pending: Dict[str, Future] = {}
         self._lock = threading.Lock()
+        self._slot_released = threading.Condition(self._lock)
         self._cleanup_thread: Optional[threading.Thread] = None
         self._stop_cleanup = threading.Event()
         
@@ -54,33 +87,94 @@ class ConnectionManager:
     def get_client(self, client_id: str = "default") -> Memory:
         """获取或创建mem0客户端
         
+        创建客户端（导入mem0、连接数据库、创建集合）耗时较长，在锁外进行：
+        同一个client_id的并发请求共享同一次创建，其它已存在的客户端不受影响。
+        缓存已满时淘汰最久未使用的空闲客户端；全部在使用中时等待，超时抛出 ClientPoolExhausted。
+        
         Args:
             client_id: 客户端标识符
             
         Returns:
             Memory: mem0客户端实例
         """
-        with self._lock:
-            current_time = time.time()
-            
-            if client_id not in self._clients:
-                # 检查连接池大小限制
-                if len(self._clients) >= self.max_pool_size:
-                    logger.warning(f"连接池已满 ({len(self._clients)}/{self.max_pool_size})，尝试清理空闲连接")
-                    self._force_cleanup_idle_connections()
-                
-                logger.info(f"创建新的mem0客户端: {client_id}")
-                
-                self._clients[client_id] = self._create_client()
-                self._connection_counts[client_id] = 0
-                self.client_created_time[client_id] = current_time
+        deadline = None
+        while True:
+            evicted: List[Tuple[str, Memory]] = []
+            with self._lock:
+                if client_id in self._clients:
+                    self._connection_counts[client_id] += 1
+                    self._last_used[client_id] = time.time()
+                    self._clients.move_to_end(client_id)
+                    logger.debug(f"获取客户端 {client_id}，使用次数: {self._connection_counts[client_id]}")
+                    return self._clients[client_id]
                 
-            self._connection_counts[client_id] += 1
-            self._last_used[client_id] = current_time
+                future = self._pending.get(client_id)
+                is_creator = future is None
+                if is_creator:
+                    while len(self._clients) + len(self._pending) >= self.max_pool_size:
+                        victim = self._least_recently_used_idle()
+                        if victim is None:
+                            break
+                        evicted.append((victim, self._detach_client(victim)))
+                    
+                    if len(self._clients) + len(self._pending) >= self.max_pool_size:
+                        # 所有客户端都在使用中，等待释放
+                        if deadline is None:
+                            deadline = time.monotonic() + self.acquire_timeout
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise ClientPoolExhausted(
+                                f"All {self.max_pool_size} mem0 clients are in use; "
+                                f"timed out after {self.acquire_timeout}s waiting for {client_id}"
+                            )
+                        logger.warning(f"连接池已满 ({len(self._clients)}/{self.max_pool_size})，等待客户端释放")
+                        self._slot_released.wait(remaining)
+                        continue
+                    
+                    future = Future()
+                    self._pending[client_id] = future
+            
+            self._close_clients(evicted, "lru")
             
-            logger.debug(f"获取客户端 {client_id}，使用次数: {self._connection_counts[client_id]}")
+            if not is_creator:
+                # 等待正在进行的创建，创建失败时抛出同样的异常
+                future.result()
+                continue
             
-            return self._clients[client_id]
+            return self._build_client(client_id, future)
+    
+    def _build_client(self, client_id: str, future: Future) -> Memory:
+        """在锁外创建客户端，并把结果通知给等待同一client_id的调用方
+        
+        Args:
+            client_id: 客户端标识符
+            future: 本次创建对应的future
+            
+        Returns:
+            Memory: 新的mem0客户端实例（已计入一次引用）
+        """
+        try:
+            logger.info(f"创建新的mem0客户端: {client_id}")
+            client = self._create_client()
+        except BaseException as e:
+            with self._lock:
+                self._pending.pop(client_id, None)
+                self._slot_released.notify_all()
+            future.set_exception(e)
+            raise
+        
+        with self._lock:
+            current_time = time.time()
+            self._clients[client_id] = client
+            self._connection_counts[client_id] = 1
+            self._last_used[client_id] = current_time
+            self.client_created_time[client_id] = current_time
+            self._pending.pop(client_id, None)
+            self._update_gauges()
+        future.set_result(client)
+        
+        logger.debug(f"获取客户端 {client_id}，使用次数: 1")
+        return client
     
     def _create_client(self) -> Memory:
         """创建新的mem0客户端
@@ -89,101 +183,198 @@ class ConnectionManager:
             Memory: 新的mem0客户端实例
         """
         from utils import get_mem0_client
-        return get_mem0_client()
+        client = get_mem0_client()
+        self.attach_pool(client)
+        return client
+    
+    def attach_pool(self, client: Any) -> None:
+        """把共享连接池注入mem0客户端
+        
+        Args:
+            client: Memory 实例
+        """
+        if self.db_pool:
+            self.db_pool.attach(client)
     
     def release_client(self, client_id: str = "default") -> None:
         """释放客户端引用
         
+        引用计数归零的客户端保留在缓存中供复用，由LRU淘汰或定期清理关闭。
+        
         Args:
             client_id: 客户端标识符
         """
         with self._lock:
             if client_id in self._connection_counts:
-                self._connection_counts[client_id] -= 1
+                self._connection_counts[client_id] = max(0, self._connection_counts[client_id] - 1)
+                self._last_used[client_id] = time.time()
                 
-                # 如果引用计数为0，清理客户端
-                if self._connection_counts[client_id] <= 0:
-                    self._cleanup_client(client_id)
+                if self._connection_counts[client_id] == 0:
+                    self._update_gauges()
+                    self._slot_released.notify_all()
+    
+    def _least_recently_used_idle(self) -> Optional[str]:
+        """返回最久未使用的空闲客户端（调用方需持有锁）"""
+        for client_id in self._clients:
+            if self._connection_counts.get(client_id, 0) <= 0:
+                return client_id
+        return None
+    
+    def _detach_client(self, client_id: str) -> Memory:
+        """从缓存中移除客户端（调用方需持有锁），关闭操作由调用方在锁外进行
+        
+        Args:
+            client_id: 客户端标识符
+            
+        Returns:
+            Memory: 被移除的客户端
+        """
+        client = self._clients.pop(client_id)
+        self._connection_counts.pop(client_id, None)
+        self._last_used.pop(client_id, None)
+        self.client_created_time.pop(client_id, None)
+        self._update_gauges()
+        self._slot_released.notify_all()
+        return client
+    
+    def _update_gauges(self) -> None:
+        """更新缓存客户端数量指标（调用方需持有锁）"""
+        in_use = sum(1 for count in self._connection_counts.values() if count > 0)
+        CACHED_CLIENTS.set(in_use, state="in_use")
+        CACHED_CLIENTS.set(len(self._clients) - in_use, state="idle")
+    
+    def _close_clients(self, clients: List[Tuple[str, Memory]], reason: str) -> None:
+        """在锁外关闭已移除的客户端
+        
+        Args:
+            clients: (client_id, client) 列表
+            reason: 淘汰原因，用于日志和指标
+        """
+        for client_id, client in clients:
+            CLIENT_EVICTIONS.inc(reason=reason)
+            logger.info(f"淘汰客户端 {client_id}，原因: {reason}")
+            self._cleanup_client(client_id, client)
     
-    def _cleanup_client(self, client_id: str) -> None:
-        """清理指定的客户端
+    def _cleanup_client(self, client_id: str, client: Memory) -> None:
+        """关闭客户端持有的资源
         
         Args:
             client_id: 客户端标识符
+            client: 已从缓存中移除的客户端
         """
-        if client_id in self._clients:
-            logger.info(f"Cleaning up mem0 client: {client_id}")
-            client = self._clients[client_id]
+        logger.info(f"Cleaning up mem0 client: {client_id}")
+        
+        try:
+            # 尝试清理向量存储连接
+            if hasattr(client, 'vector_store'):
+                vector_store = client.vector_store
+                if hasattr(vector_store, 'client'):
+                    vector_client = vector_store.client
+                    if hasattr(vector_client, 'close'):
+                        logger.info("Closing vector store connection...")
+                        vector_client.close()
+                    elif hasattr(vector_client, '_client') and hasattr(vector_client._client, 'close'):
+                        logger.info("Closing underlying vector store connection...")
+                        vector_client._client.close()
             
-            try:
-                # 尝试清理向量存储连接
-                if hasattr(client, 'vector_store'):
-                    vector_store = client.vector_store
-                    if hasattr(vector_store, 'client'):
-                        vector_client = vector_store.client
-                        if hasattr(vector_client, 'close'):
-                            logger.info("Closing vector store connection...")
-                            vector_client.close()
-                        elif hasattr(vector_client, '_client') and hasattr(vector_client._client, 'close'):
-                            logger.info("Closing underlying vector store connection...")
-                            vector_client._client.close()
-                
-                # 尝试清理数据库连接
-                if hasattr(client, 'db'):
-                    db = client.db
-                    if hasattr(db, 'connection') and db.connection:
-                        logger.info("Closing database connection...")
-                        db.connection.close()
-                    elif hasattr(db, 'engine') and db.engine:
-                        logger.info("Disposing database engine...")
-                        db.engine.dispose()
-                
-                # 删除客户端引用
-                del self._clients[client_id]
-                del self._connection_counts[client_id]
-                
-                logger.info(f"Client {client_id} cleanup completed")
-                
-            except Exception as e:
-                logger.error(f"Error cleaning up client {client_id}: {e}")
+            # 尝试清理数据库连接
+            if hasattr(client, 'db'):
+                db = client.db
+                if hasattr(db, 'connection') and db.connection:
+                    logger.info("Closing database connection...")
+                    db.connection.close()
+                elif hasattr(db, 'engine') and db.engine:
+                    logger.info("Disposing database engine...")
+                    db.engine.dispose()
+            
+            # 向量存储使用共享连接池，连接归还池中即可，不能随单个客户端关闭；
+            # 取消登记后，所有客户端都关闭时共享连接池才能在进程关闭时关闭
+            if self.db_pool:
+                self.db_pool.detach(client)
+            
+            logger.info(f"Client {client_id} cleanup completed")
+            
+        except Exception as e:
+            logger.error(f"Error cleaning up client {client_id}: {e}")
     
     def cleanup_all(self) -> None:
-        """清理所有客户端"""
+        """进程关闭时清理所有空闲客户端并关闭共享连接池
+        
+        仍在使用中的客户端不会被关闭，保留在缓存中，共享连接池也随之保留。
+        """
         with self._lock:
-            client_ids = list(self._clients.keys())
-            for client_id in client_ids:
-                self._cleanup_client(client_id)
+            in_use = [client_id for client_id in self._clients if self._connection_counts.get(client_id, 0) > 0]
+            clients = [
+                (client_id, self._detach_client(client_id))
+                for client_id in list(self._clients) if client_id not in in_use
+            ]
+        if in_use:
+            logger.warning(f"客户端仍在使用中，暂不关闭: {in_use}")
+        self._close_clients(clients, "shutdown")
+        
+        # 关闭共享连接池（仍有客户端使用时保留）
+        if self.db_pool:
+            self.db_pool.dispose()
         
         # 强制垃圾回收
         gc.collect()
         logger.info("All clients cleaned up")
     
+    def stats(self) -> Dict[str, int]:
+        """获取客户端缓存统计
+        
+        Returns:
+            Dict[str, int]: 缓存的、使用中的、创建中的客户端数量和容量
+        """
+        with self._lock:
+            in_use = sum(1 for count in self._connection_counts.values() if count > 0)
+            return {
+                "cached": len(self._clients),
+                "in_use": in_use,
+                "idle": len(self._clients) - in_use,
+                "pending": len(self._pending),
+                "capacity": self.max_pool_size,
+            }
+    
     def get_connection_count(self) -> int:
-        """获取当前数据库连接数
+        """获取本进程持有的数据库连接数（来自共享连接池的统计，不访问数据库）
+        
+        Returns:
+            int: 借出和空闲的连接数之和
+        """
+        stats = self.get_pool_stats()
+        return stats.get("checked_out", 0) + stats.get("idle", 0)
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """获取共享连接池统计
+        
+        Returns:
+            Dict[str, Any]: 借出、空闲、等待中的连接数以及累计创建次数等；未配置连接池时为空
+        """
+        if not self.db_pool:
+            return {}
+        return self.db_pool.stats()
+    
+    def get_db_connection_count(self) -> int:
+        """从数据库侧统计本服务的连接数
+        
+        复用连接池中的连接，只统计当前数据库中 application_name 与连接池一致的会话。
         
         Returns:
-            int: 当前连接数
+            int: 数据库中本服务的连接数，查询失败时返回-1
         """
+        if not self.db_pool:
+            return 0
+        
         try:
-            database_url = os.getenv('DATABASE_URL')
-            if not database_url:
-                return 0
-                
-            conn = psycopg2.connect(database_url)
-            cursor = conn.cursor()
-            
-            # 查询当前连接数
-            cursor.execute("""
-                SELECT count(*) 
-                FROM pg_stat_activity 
-                WHERE state = 'active' OR state = 'idle'
-            """)
-            
-            count = cursor.fetchone()[0]
-            cursor.close()
-            conn.close()
-            
-            return count
+            with self.db_pool.engine.connect() as conn:
+                return conn.execute(
+                    text(
+                        "SELECT count(*) FROM pg_stat_activity "
+                        "WHERE datname = current_database() AND application_name = :application_name"
+                    ),
+                    {"application_name": self.db_pool.application_name},
+                ).scalar()
             
         except Exception as e:
             logger.error(f"Error getting connection count: {e}")
@@ -220,6 +411,8 @@ class ConnectionManager:
     def _periodic_cleanup(self, interval: int) -> None:
         """定期清理工作线程
         
+        只清理引用计数为0的客户端，使用中的客户端即使超过生存时间也会等到释放后再清理。
+        
         Args:
             interval: 清理间隔（秒）
         """
@@ -229,25 +422,25 @@ class ConnectionManager:
         while not self._stop_cleanup.wait(interval):
             try:
                 current_time = time.time()
-                clients_to_remove = []
+                expired: Dict[str, List[Tuple[str, Memory]]] = {"idle": [], "lifetime": []}
                 
                 with self._lock:
-                    for client_id, last_used in self._last_used.items():
-                        created_time = self.client_created_time.get(client_id, current_time)
+                    for client_id in list(self._clients):
+                        if self._connection_counts.get(client_id, 0) > 0:
+                            continue
                         
                         # 检查空闲超时
-                        idle_time = current_time - last_used
+                        idle_time = current_time - self._last_used.get(client_id, current_time)
                         # 检查最大生存时间
-                        lifetime = current_time - created_time
+                        lifetime = current_time - self.client_created_time.get(client_id, current_time)
                         
-                        if idle_time > idle_timeout or lifetime > max_lifetime:
-                            clients_to_remove.append(client_id)
-                            reason = "idle timeout" if idle_time > idle_timeout else "max lifetime"
-                            logger.debug(f"标记客户端 {client_id} 清理，原因: {reason}")
+                        if idle_time > idle_timeout:
+                            expired["idle"].append((client_id, self._detach_client(client_id)))
+                        elif lifetime > max_lifetime:
+                            expired["lifetime"].append((client_id, self._detach_client(client_id)))
                 
-                for client_id in clients_to_remove:
-                    self._cleanup_client(client_id)
-                    logger.info(f"已清理客户端: {client_id}")
+                for reason, clients in expired.items():
+                    self._close_clients(clients, reason)
                     
                 # 输出统计信息
                 if interval >= 60:
@@ -256,30 +449,6 @@ class ConnectionManager:
             except Exception as e:
                 logger.error(f"定期清理过程中发生错误: {e}")
     
-    def _force_cleanup_idle_connections(self) -> None:
-        """强制清理空闲连接"""
-        try:
-            current_time = time.time()
-            clients_to_remove = []
-            idle_timeout = self.idle_timeout // 2  # 使用一半的空闲超时时间
-            
-            with self._lock:
-                if not hasattr(self, '_last_used'):
-                    self._last_used = {}
-                    return
-                    
-                for client_id, last_used in self._last_used.items():
-                    # 清理空闲时间超过阈值的客户端
-                    if current_time - last_used > idle_timeout:
-                        clients_to_remove.append(client_id)
-            
-            for client_id in clients_to_remove:
-                self._cleanup_client(client_id)
-                logger.info(f"强制清理空闲客户端: {client_id}")
-                
-        except Exception as e:
-            logger.error(f"强制清理空闲连接时发生错误: {e}")
-    
     def _log_stats(self) -> None:
         """输出连接统计信息"""
         try:
@@ -287,9 +456,16 @@ class ConnectionManager:
                 active_clients = len(self._clients)
                 total_connections = sum(self._connection_counts.values())
                 
-            db_connections = self.get_connection_count()
+            pool_stats = self.get_pool_stats()
+            
+            logger.info(
+                f"连接统计 - 缓存客户端: {active_clients}/{self.max_pool_size}, 总引用数: {total_connections}, "
+                f"连接池 借出: {pool_stats.get('checked_out', 0)}, 空闲: {pool_stats.get('idle', 0)}, "
+                f"等待: {pool_stats.get('waiting', 0)}, 累计创建: {pool_stats.get('created_total', 0)}"
+            )
             
-            logger.info(f"连接统计 - 活跃客户端: {active_clients}, 总连接数: {total_connections}, 数据库连接: {db_connections}")
+            if self.check_db_connections:
+                logger.info(f"数据库侧连接数: {self.get_db_connection_count()}")
             
             with self._lock:
                 for client_id, count in self._connection_counts.items():
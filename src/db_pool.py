@@ -0,0 +1,221 @@
+"""共享数据库连接池模块
+
+mem0 的 supabase 向量存储通过 vecs 为每个 Memory 实例创建独立的 SQLAlchemy 引擎（各自一个连接池）。
+这里提供一个进程内共享的有界连接池，注入到连接管理器创建的每个 Memory 中，
+使数据库连接数固定可预期，而不是随客户端数量增长。
+共享引擎的生命周期与进程一致：只要还有客户端注入了该引擎就不会被丢弃，进程关闭时才关闭。
+"""
+
+import os
+import threading
+import logging
+from typing import Any, Dict, Optional, Set
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """记录等待借出连接的线程数的 QueuePool"""
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.waiting = 0
+        self._waiting_lock = threading.Lock()
+
+    def _do_get(self) -> Any:
+        with self._waiting_lock:
+            self.waiting += 1
+        try:
+            return super()._do_get()
+        finally:
+            with self._waiting_lock:
+                self.waiting -= 1
+
+
+class DatabasePool:
+    """共享的Postgres连接池
+
+    功能：
+    - 最小/最大连接数（最小连接数常驻，超出部分归还时关闭）
+    - 借出超时
+    - 借出前健康检查（pre-ping）
+    - 连接最大生存时间，到期后回收重建
+    """
+
+    def __init__(
+        self,
+        database_url: str,
+        min_size: int = 2,
+        max_size: int = 10,
+        timeout: float = 30,
+        recycle: int = 1800,
+        application_name: str = "mem0-mcp",
+    ):
+        """初始化连接池配置（引擎在首次使用时创建）
+
+        Args:
+            database_url: PostgreSQL连接字符串
+            min_size: 常驻连接数
+            max_size: 最大连接数
+            timeout: 借出连接的最长等待时间（秒）
+            recycle: 连接最大生存时间（秒）
+            application_name: 连接的 application_name，便于在 pg_stat_activity 中识别
+        """
+        if min_size > max_size:
+            raise ValueError(f"DB pool min_size ({min_size}) cannot exceed max_size ({max_size})")
+        self.database_url = database_url
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.application_name = application_name
+
+        self._engine = None
+        self._attached: Set[int] = set()
+        self._lock = threading.Lock()
+        self._counters = {"created_total": 0, "closed_total": 0, "checkouts_total": 0}
+
+    @classmethod
+    def from_env(cls) -> Optional["DatabasePool"]:
+        """根据环境变量创建连接池，未配置 DATABASE_URL 时返回None"""
+        database_url = os.getenv("DATABASE_URL")
+        if not database_url:
+            return None
+        return cls(
+            database_url,
+            min_size=int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+            max_size=int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+            timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+            recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+            application_name=os.getenv("DB_APPLICATION_NAME", "mem0-mcp"),
+        )
+
+    @property
+    def engine(self) -> Any:
+        """共享的 SQLAlchemy 引擎"""
+        with self._lock:
+            if self._engine is None:
+                self._engine = self._create_engine()
+            return self._engine
+
+    def _create_engine(self) -> Any:
+        """创建带连接池的引擎并注册计数事件"""
+        engine = create_engine(
+            self.database_url,
+            poolclass=InstrumentedQueuePool,
+            pool_size=self.min_size,
+            max_overflow=self.max_size - self.min_size,
+            pool_timeout=self.timeout,
+            pool_recycle=self.recycle,
+            pool_pre_ping=True,
+            connect_args={"application_name": self.application_name},
+        )
+
+        @event.listens_for(engine, "connect")
+        def on_connect(dbapi_connection: Any, connection_record: Any) -> None:
+            self._count("created_total")
+
+        @event.listens_for(engine, "close")
+        def on_close(dbapi_connection: Any, connection_record: Any) -> None:
+            self._count("closed_total")
+
+        @event.listens_for(engine, "checkout")
+        def on_checkout(dbapi_connection: Any, connection_record: Any, connection_proxy: Any) -> None:
+            self._count("checkouts_total")
+
+        logger.info(
+            f"共享连接池已创建，最小连接数: {self.min_size}，最大连接数: {self.max_size}，"
+            f"借出超时: {self.timeout}s，最大生存时间: {self.recycle}s"
+        )
+        return engine
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def warm_up(self) -> None:
+        """预先建立最小数量的常驻连接"""
+        connections = []
+        try:
+            for _ in range(self.min_size):
+                connections.append(self.engine.connect())
+        finally:
+            for connection in connections:
+                connection.close()
+
+    def attach(self, memory_client: Any) -> None:
+        """把共享引擎注入 mem0 客户端的 vecs 客户端，并释放其自带的引擎
+
+        Args:
+            memory_client: Memory 实例
+        """
+        vecs_client = getattr(getattr(memory_client, "vector_store", None), "db", None)
+        own_engine = getattr(vecs_client, "engine", None)
+        if own_engine is None:
+            logger.debug("向量存储不是 vecs 客户端，跳过共享连接池注入")
+            return
+
+        with self._lock:
+            self._attached.add(id(memory_client))
+        if own_engine is self.engine:
+            return
+
+        vecs_client.engine = self.engine
+        vecs_client.Session = sessionmaker(self.engine)
+        own_engine.dispose()
+        logger.debug("已注入共享连接池")
+
+    def detach(self, memory_client: Any) -> None:
+        """客户端关闭后取消登记，此后它不再使用共享引擎
+
+        Args:
+            memory_client: 之前通过 attach 注入的 Memory 实例
+        """
+        with self._lock:
+            self._attached.discard(id(memory_client))
+
+    def stats(self) -> Dict[str, Any]:
+        """获取连接池统计
+
+        Returns:
+            Dict[str, Any]: 借出、空闲、等待中的连接数以及累计创建/关闭/借出次数
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            engine = self._engine
+        if engine is None:
+            return dict(counters, checked_out=0, idle=0, waiting=0, min_size=self.min_size, max_size=self.max_size)
+
+        pool = engine.pool
+        return dict(
+            counters,
+            checked_out=pool.checkedout(),
+            idle=pool.checkedin(),
+            waiting=getattr(pool, "waiting", 0),
+            min_size=self.min_size,
+            max_size=self.max_size,
+        )
+
+    def dispose(self) -> bool:
+        """关闭所有连接并丢弃引擎（进程关闭时调用）
+
+        仍有客户端注入了共享引擎时不做任何事：这些客户端继续持有旧引擎，
+        丢弃后下一次 attach 会创建第二个引擎，连接数不再受上限约束。
+
+        Returns:
+            bool: 是否已关闭
+        """
+        with self._lock:
+            if self._attached:
+                logger.warning(f"仍有 {len(self._attached)} 个客户端使用共享连接池，暂不关闭")
+                return False
+            engine, self._engine = self._engine, None
+        if engine is not None:
+            engine.dispose()
+            logger.info("共享连接池已关闭")
+        return True
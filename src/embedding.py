@@ -0,0 +1,432 @@
+"""嵌入批处理与缓存模块
+
+包装 get_mem0_client 配置的嵌入模型：
+- embed_many: 按提供商的输入条数/token上限切分后批量请求
+- 事实预取: LLM 抽取出事实列表后一次性批量嵌入，mem0 随后逐条调用 embed 时直接命中
+- 内容寻址缓存: 以 (提供商, 模型, 维度, 规范化文本哈希) 为键，进程内LRU + 可选的SQLite磁盘层
+- 调用计时: 记录实际发往嵌入/LLM提供商的请求耗时
+"""
+
+import os
+import json
+import array
+import sqlite3
+import time
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+from mem0.memory.utils import get_fact_retrieval_messages, remove_code_blocks
+
+from metrics import get_registry
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# 预取结果最多保留的条数，防止未被消费的向量无限增长
+MAX_PREFETCHED = 4096
+
+EMBEDDING_CACHE_REQUESTS = get_registry().counter(
+    "mem0_embedding_cache_requests_total",
+    "Embedding cache lookups by result (memory_hit, disk_hit, miss)",
+    ["result"],
+)
+
+PROVIDER_CALL_SECONDS = get_registry().histogram(
+    "mem0_provider_call_seconds",
+    "Latency of requests sent to the embedding and LLM providers",
+    ["kind", "method"],
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的token数（约4个字符一个token）"""
+    return len(text) // 4 + 1
+
+
+class TimedProvider:
+    """记录嵌入模型/LLM方法调用耗时的包装器，其余属性透传"""
+
+    def __init__(self, target: Any, kind: str, methods: tuple):
+        """初始化包装器
+
+        Args:
+            target: mem0 创建的嵌入模型或LLM实例
+            kind: 指标中的提供商类型（embedding / llm）
+            methods: 需要计时的方法名
+        """
+        self.target = target
+        self.kind = kind
+        self.methods = methods
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.target, name)
+        if name not in self.methods or not callable(attr):
+            return attr
+
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                PROVIDER_CALL_SECONDS.observe(time.perf_counter() - start, kind=self.kind, method=name)
+
+        return timed
+
+
+class BatchingEmbedder:
+    """支持多输入请求的嵌入模型包装器
+
+    对 mem0 暴露与原嵌入模型相同的 embed 接口，其余属性透传给原嵌入模型。
+    """
+
+    def __init__(self, embedder: Any, provider: str, max_batch_size: int = 256, max_batch_tokens: int = 100000):
+        """初始化包装器
+
+        Args:
+            embedder: mem0 创建的嵌入模型实例
+            provider: 嵌入提供商（openai / ollama / fake）
+            max_batch_size: 单次请求的最大输入条数
+            max_batch_tokens: 单次请求的最大估算token数
+        """
+        self.embedder = embedder
+        self.provider = provider
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+
+        self._prefetched: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # mem0 的 Ollama 嵌入模型使用 /api/embeddings（向量未归一化），多输入请求只能用 /api/embed（归一化），
+        # 单条和批量都走 /api/embed，避免同一存储中混入两种尺度的向量
+        self.endpoint = "api/embed" if provider == "ollama" and hasattr(embedder.client, "embed") else ""
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.embedder, name)
+
+    def embed(self, text: str, memory_action: Optional[str] = None) -> List[float]:
+        """嵌入单条文本，优先使用预取结果
+
+        Args:
+            text: 文本
+            memory_action: mem0 传入的操作类型（add / search / update）
+
+        Returns:
+            List[float]: 向量
+        """
+        with self._lock:
+            vector = self._prefetched.pop(text, None)
+        if vector is not None:
+            return vector
+        if self.endpoint:
+            return self._embed_batch([text], memory_action)[0]
+        return self.embedder.embed(text, memory_action)
+
+    def embed_many(self, texts: List[str], memory_action: Optional[str] = None) -> List[List[float]]:
+        """批量嵌入多条文本
+
+        Args:
+            texts: 文本列表
+            memory_action: 操作类型，仅在回退到逐条嵌入时使用
+
+        Returns:
+            List[List[float]]: 与输入顺序一致的向量列表
+        """
+        vectors: List[List[float]] = []
+        for chunk in self._chunks(texts):
+            vectors.extend(self._embed_batch(chunk, memory_action))
+        return vectors
+
+    def prefetch(self, texts: List[str]) -> None:
+        """批量嵌入并缓存，供随后的 embed 调用直接取用
+
+        Args:
+            texts: 即将被逐条嵌入的文本
+        """
+        with self._lock:
+            missing = [text for text in dict.fromkeys(texts) if text not in self._prefetched]
+        if len(missing) < 2:
+            return
+
+        vectors = self.embed_many(missing, "add")
+        with self._lock:
+            for text, vector in zip(missing, vectors):
+                self._prefetched[text] = vector
+            while len(self._prefetched) > MAX_PREFETCHED:
+                self._prefetched.popitem(last=False)
+        logger.debug(f"预取 {len(missing)} 条事实的嵌入")
+
+    def _chunks(self, texts: List[str]):
+        """按条数和估算token数切分请求"""
+        chunk: List[str] = []
+        tokens = 0
+        for text in texts:
+            text_tokens = estimate_tokens(text)
+            if chunk and (len(chunk) >= self.max_batch_size or tokens + text_tokens > self.max_batch_tokens):
+                yield chunk
+                chunk, tokens = [], 0
+            chunk.append(text)
+            tokens += text_tokens
+        if chunk:
+            yield chunk
+
+    def _embed_batch(self, texts: List[str], memory_action: Optional[str]) -> List[List[float]]:
+        """发送一次多输入嵌入请求"""
+        config = self.embedder.config
+        start = time.perf_counter()
+        if self.endpoint:
+            response = self.embedder.client.embed(model=config.model, input=texts)
+            PROVIDER_CALL_SECONDS.observe(time.perf_counter() - start, kind="embedding", method="embed_batch")
+            return list(response["embeddings"])
+
+        if len(texts) == 1:
+            return [self.embedder.embed(texts[0], memory_action)]
+
+        if self.provider == "openai":
+            response = self.embedder.client.embeddings.create(
+                input=[text.replace("\n", " ") for text in texts],
+                model=config.model,
+                dimensions=config.embedding_dims,
+            )
+            PROVIDER_CALL_SECONDS.observe(time.perf_counter() - start, kind="embedding", method="embed_batch")
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+        if self.provider == "fake":
+            vectors = self.embedder.embed_batch(texts)
+            PROVIDER_CALL_SECONDS.observe(time.perf_counter() - start, kind="embedding", method="embed_batch")
+            return vectors
+
+        # 不支持多输入的提供商逐条嵌入
+        return [self.embedder.embed(text, memory_action) for text in texts]
+
+
+class FactPrefetchingLLM:
+    """LLM 包装器：识别事实抽取请求，并提前批量嵌入抽取出的事实"""
+
+    def __init__(self, llm: Any, embedder: Any, fact_prompts: Iterable[str]):
+        """初始化包装器
+
+        Args:
+            llm: mem0 创建的LLM实例
+            embedder: 提供 prefetch 的嵌入包装器（BatchingEmbedder 或 CachingEmbedder）
+            fact_prompts: 事实抽取请求使用的system提示词（mem0 默认提示词及自定义提示词）
+        """
+        self.llm = llm
+        self.embedder = embedder
+        self.fact_prompts = frozenset(fact_prompts)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.llm, name)
+
+    def generate_response(self, messages: List[Dict[str, Any]], *args: Any, **kwargs: Any) -> Any:
+        """生成响应，事实抽取请求的响应解析后预取事实嵌入"""
+        response = self.llm.generate_response(messages, *args, **kwargs)
+        if self.is_fact_extraction(messages):
+            facts = _extract_facts(response)
+            if facts:
+                try:
+                    self.embedder.prefetch(facts)
+                except Exception as e:
+                    # 预取失败不影响写入，mem0 会逐条嵌入
+                    logger.warning(f"批量预取事实嵌入失败: {e}")
+        return response
+
+    def is_fact_extraction(self, messages: List[Dict[str, Any]]) -> bool:
+        """按请求判断是否为事实抽取：第一条消息是事实抽取的system提示词"""
+        first = messages[0] if messages else None
+        return isinstance(first, dict) and first.get("role") == "system" and first.get("content") in self.fact_prompts
+
+
+def _extract_facts(response: Any) -> Optional[List[str]]:
+    """按 mem0 的方式解析事实抽取响应，解析失败时返回None"""
+    try:
+        facts = json.loads(remove_code_blocks(response))["facts"]
+    except Exception:
+        return None
+    if not isinstance(facts, list) or not all(isinstance(fact, str) for fact in facts):
+        return None
+    return facts
+
+
+class CachingEmbedder:
+    """内容寻址的嵌入缓存
+
+    两级缓存：进程内LRU，以及可选的SQLite磁盘层（进程重启后仍然有效）。
+    未命中的文本通过被包装嵌入模型的 embed_many 批量获取。
+    """
+
+    def __init__(self, embedder: Any, provider: str, max_entries: int = 10000, db_path: Optional[str] = None):
+        """初始化缓存
+
+        Args:
+            embedder: 被包装的嵌入模型（通常是 BatchingEmbedder）
+            provider: 嵌入提供商，参与缓存键计算
+            max_entries: 进程内LRU的最大条数
+            db_path: SQLite磁盘缓存路径，为None时只使用进程内缓存
+        """
+        self.embedder = embedder
+        self.provider = provider
+        self.max_entries = max_entries
+        self.db_path = db_path
+
+        config = getattr(embedder, "config", None)
+        self._namespace = f"{provider}|{getattr(config, 'model', '')}|{getattr(config, 'embedding_dims', '')}"
+        endpoint = getattr(embedder, "endpoint", "")
+        if isinstance(endpoint, str) and endpoint:
+            # 嵌入接口不同的向量尺度不同，不与旧缓存混用
+            self._namespace += f"|{endpoint}"
+
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._stats = {"memory_hit": 0, "disk_hit": 0, "miss": 0}
+        self._lock = threading.Lock()
+
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS embedding_cache (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.embedder, name)
+
+    def cache_key(self, text: str) -> str:
+        """计算缓存键：提供商/模型/维度 + 规范化文本的SHA-256"""
+        normalized = " ".join(text.split())
+        return hashlib.sha256(f"{self._namespace}|{normalized}".encode("utf-8")).hexdigest()
+
+    def embed(self, text: str, memory_action: Optional[str] = None) -> List[float]:
+        """嵌入单条文本，命中缓存时不请求提供商"""
+        return self.embed_many([text], memory_action)[0]
+
+    def embed_many(self, texts: List[str], memory_action: Optional[str] = None) -> List[List[float]]:
+        """批量嵌入，只为未命中缓存的文本请求提供商
+
+        Args:
+            texts: 文本列表
+            memory_action: 操作类型
+
+        Returns:
+            List[List[float]]: 与输入顺序一致的向量列表
+        """
+        keys = [self.cache_key(text) for text in texts]
+        found = self._lookup(keys)
+
+        missing: Dict[str, str] = {}
+        for text, key in zip(texts, keys):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        if missing:
+            if hasattr(self.embedder, "embed_many"):
+                vectors = self.embedder.embed_many(list(missing.values()), memory_action)
+            else:
+                vectors = [self.embedder.embed(text, memory_action) for text in missing.values()]
+            fetched = dict(zip(missing.keys(), vectors))
+            self._store(fetched)
+            found.update(fetched)
+
+        return [found[key] for key in keys]
+
+    def prefetch(self, texts: List[str]) -> None:
+        """批量嵌入并写入缓存，随后的 embed 调用直接命中"""
+        self.embed_many(texts, "add")
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        """依次查询内存层和磁盘层，并记录命中情况"""
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+        self._count("memory_hit", sum(1 for key in keys if key in found))
+
+        pending = [key for key in dict.fromkeys(keys) if key not in found]
+        if pending and self._db is not None:
+            placeholders = ",".join("?" * len(pending))
+            with self._lock:
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embedding_cache WHERE key IN ({placeholders})", pending
+                ).fetchall()
+            disk = {key: array.array("f", blob).tolist() for key, blob in rows}
+            self._remember(disk)
+            found.update(disk)
+            self._count("disk_hit", sum(1 for key in keys if key in disk))
+
+        self._count("miss", sum(1 for key in keys if key not in found))
+        return found
+
+    def _store(self, vectors: Dict[str, List[float]]) -> None:
+        """写入内存层和磁盘层"""
+        self._remember(vectors)
+        if self._db is not None and vectors:
+            rows = [(key, array.array("f", vector).tobytes()) for key, vector in vectors.items()]
+            with self._lock:
+                self._db.executemany("INSERT OR REPLACE INTO embedding_cache (key, vector) VALUES (?, ?)", rows)
+
+    def _remember(self, vectors: Dict[str, List[float]]) -> None:
+        """写入进程内LRU并淘汰最久未使用的条目"""
+        with self._lock:
+            for key, vector in vectors.items():
+                self._memory[key] = vector
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _count(self, result: str, amount: int) -> None:
+        """累加命中/未命中计数"""
+        if amount:
+            with self._lock:
+                self._stats[result] += amount
+            EMBEDDING_CACHE_REQUESTS.inc(amount, result=result)
+
+    def stats(self) -> Dict[str, int]:
+        """获取缓存统计
+
+        Returns:
+            Dict[str, int]: 内存命中、磁盘命中、未命中次数以及内存层条目数
+        """
+        with self._lock:
+            return dict(self._stats, entries=len(self._memory))
+
+
+def install_embedder_wrappers(memory_client: Any, provider: str) -> Any:
+    """为mem0客户端安装调用计时、批量嵌入和嵌入缓存包装器
+
+    Args:
+        memory_client: Memory 实例
+        provider: 嵌入提供商
+
+    Returns:
+        Any: 传入的客户端
+    """
+    # 计时包装在最内层，只统计实际发往提供商的请求（不含缓存命中）
+    memory_client.llm = TimedProvider(memory_client.llm, "llm", ("generate_response",))
+    embedder = TimedProvider(memory_client.embedding_model, "embedding", ("embed",))
+
+    max_batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+    if max_batch_size > 1:
+        embedder = BatchingEmbedder(
+            embedder,
+            provider,
+            max_batch_size=max_batch_size,
+            max_batch_tokens=int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "100000")),
+        )
+        logger.info(f"已启用批量嵌入，单次请求最多 {max_batch_size} 条")
+
+    cache_size = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+    cache_path = os.getenv("EMBEDDING_CACHE_PATH") or None
+    if cache_size > 0:
+        embedder = CachingEmbedder(embedder, provider, max_entries=cache_size, db_path=cache_path)
+        logger.info(f"已启用嵌入缓存，内存条目上限: {cache_size}，磁盘缓存: {cache_path or '未启用'}")
+
+    if not isinstance(embedder, TimedProvider):
+        default_prompt, _ = get_fact_retrieval_messages("")
+        custom_prompt = getattr(memory_client.config, "custom_fact_extraction_prompt", None)
+        fact_prompts = [prompt for prompt in (default_prompt, custom_prompt) if prompt]
+        memory_client.llm = FactPrefetchingLLM(memory_client.llm, embedder, fact_prompts)
+    memory_client.embedding_model = embedder
+    return memory_client
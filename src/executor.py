@@ -0,0 +1,267 @@
+"""工具执行器模块
+
+为MCP工具提供专用线程池，把同步的mem0调用移出事件循环，
+按工具限制并发、统计排队深度，并在客户端断开时取消尚未开始执行的调用。
+"""
+
+import os
+import asyncio
+import contextvars
+import threading
+import weakref
+import logging
+from collections.abc import AsyncIterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+
+from metrics import get_registry
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+EXECUTOR_CALLS = get_registry().gauge(
+    "mem0_executor_calls",
+    "Tool executor calls by state (waiting for a concurrency slot, queued for a thread, running)",
+    ["tool", "state"],
+)
+
+EXECUTOR_QUEUE_DEPTH = get_registry().gauge(
+    "mem0_executor_queue_depth", "Tool executor calls waiting for a concurrency slot or a thread"
+)
+
+# 在指标中导出的进行中状态
+LIVE_STATES = ("waiting", "queued", "running")
+
+# 存活的执行器，采集指标时汇总
+_executors: "weakref.WeakSet[ToolExecutor]" = weakref.WeakSet()
+
+
+def parse_tool_limits(spec: Optional[str]) -> Dict[str, int]:
+    """解析按工具配置的并发限制
+
+    Args:
+        spec: 形如 "save_memory=4,search_memories=16" 的字符串
+
+    Returns:
+        Dict[str, int]: 工具名到最大并发数的映射
+    """
+    limits: Dict[str, int] = {}
+    if not spec:
+        return limits
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, value = item.partition("=")
+        if not value:
+            raise ValueError(f"Invalid tool concurrency entry: {item!r}")
+        limits[name.strip()] = int(value)
+    return limits
+
+
+class ToolExecutor:
+    """MCP工具的阻塞调用执行器
+
+    功能：
+    - 固定大小的线程池，所有工具共享
+    - 按工具的并发上限（asyncio信号量）
+    - 等待/排队/执行中的深度统计
+    - 调用方被取消时撤销尚未开始的任务
+    """
+
+    def __init__(self, max_workers: int = 16, tool_limits: Optional[Dict[str, int]] = None):
+        """初始化执行器
+
+        Args:
+            max_workers: 线程池大小
+            tool_limits: 每个工具的最大并发数，未配置的工具只受线程池大小限制
+        """
+        self.max_workers = max_workers
+        self.tool_limits = dict(tool_limits or {})
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        _executors.add(self)
+
+        logger.info(f"工具执行器已初始化，线程数: {max_workers}，工具并发限制: {self.tool_limits or '无'}")
+
+    @classmethod
+    def from_env(cls) -> "ToolExecutor":
+        """根据环境变量创建执行器
+
+        Returns:
+            ToolExecutor: 执行器实例
+        """
+        return cls(
+            max_workers=int(os.getenv("MEM0_EXECUTOR_WORKERS", "16")),
+            tool_limits=parse_tool_limits(os.getenv("MEM0_TOOL_CONCURRENCY")),
+        )
+
+    def start(self) -> None:
+        """启动线程池"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="mem0-tool")
+
+    def shutdown(self, wait: bool = True) -> None:
+        """关闭线程池，撤销所有尚未开始的任务
+
+        Args:
+            wait: 是否等待执行中的任务结束
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+        logger.info("工具执行器已关闭")
+
+    async def run(self, tool_name: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """在线程池中执行阻塞调用
+
+        Args:
+            tool_name: 工具名，用于并发限制和统计
+            func: 要执行的同步函数
+            *args: 位置参数
+            **kwargs: 关键字参数
+
+        Returns:
+            Any: func 的返回值
+        """
+        if self._executor is None:
+            self.start()
+
+        async with self._slot(tool_name):
+            return await self._submit(tool_name, func, args, kwargs)
+
+    @asynccontextmanager
+    async def _slot(self, tool_name: str) -> AsyncIterator[None]:
+        """占用工具的并发槽位"""
+        semaphore = self._get_semaphore(tool_name)
+        if semaphore is None:
+            yield
+            return
+
+        self._update(tool_name, waiting=1)
+        try:
+            await semaphore.acquire()
+        except asyncio.CancelledError:
+            self._update(tool_name, cancelled=1)
+            raise
+        finally:
+            self._update(tool_name, waiting=-1)
+
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    async def _submit(self, tool_name: str, func: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        """提交到线程池并等待结果"""
+
+        def call() -> Any:
+            self._update(tool_name, queued=-1, running=1)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._update(tool_name, running=-1)
+
+        self._update(tool_name, queued=1)
+        self._warn_if_backlogged()
+        # 与 asyncio.to_thread 一样把调用方的上下文（如追踪span）带到工作线程
+        future = self._executor.submit(contextvars.copy_context().run, call)
+
+        try:
+            result = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # 客户端断开或请求被取消：尚未开始的任务直接撤销，已开始的只能丢弃结果
+            future.cancel()
+            if future.cancelled():
+                self._update(tool_name, queued=-1, cancelled=1)
+                logger.info(f"{tool_name} 调用已取消（尚未开始执行）")
+            else:
+                self._update(tool_name, cancelled=1)
+                logger.info(f"{tool_name} 调用已取消，执行中的任务结果将被丢弃")
+            raise
+        except Exception:
+            self._update(tool_name, failed=1)
+            raise
+
+        self._update(tool_name, completed=1)
+        return result
+
+    def _get_semaphore(self, tool_name: str) -> Optional[asyncio.Semaphore]:
+        """获取工具对应的信号量，未配置限制时返回None"""
+        limit = self.tool_limits.get(tool_name)
+        if not limit:
+            return None
+        semaphore = self._semaphores.get(tool_name)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(limit)
+            self._semaphores[tool_name] = semaphore
+        return semaphore
+
+    def _update(self, tool_name: str, **deltas: int) -> None:
+        """更新工具统计计数"""
+        with self._lock:
+            stats = self._stats.setdefault(tool_name, {
+                "waiting": 0,
+                "queued": 0,
+                "running": 0,
+                "completed": 0,
+                "failed": 0,
+                "cancelled": 0,
+            })
+            for key, delta in deltas.items():
+                stats[key] += delta
+
+    def queue_depth(self) -> int:
+        """获取当前积压深度（等待并发槽位 + 等待线程）
+
+        Returns:
+            int: 积压的调用数
+        """
+        with self._lock:
+            return sum(stats["waiting"] + stats["queued"] for stats in self._stats.values())
+
+    def _warn_if_backlogged(self) -> None:
+        """线程池积压超过线程数时输出警告"""
+        with self._lock:
+            queued = sum(stats["queued"] for stats in self._stats.values())
+        if queued > self.max_workers:
+            logger.warning(f"工具执行队列积压: {queued} 个调用等待线程 (线程数: {self.max_workers})")
+
+    def stats(self) -> Dict[str, Any]:
+        """获取执行器统计信息
+
+        Returns:
+            Dict[str, Any]: 线程池大小、总积压深度以及每个工具的计数
+        """
+        with self._lock:
+            tools = {
+                name: dict(stats, limit=self.tool_limits.get(name, 0))
+                for name, stats in self._stats.items()
+            }
+        return {
+            "max_workers": self.max_workers,
+            "queue_depth": sum(t["waiting"] + t["queued"] for t in tools.values()),
+            "tools": tools,
+        }
+
+
+def collect_executor_metrics() -> None:
+    """在每次采集前从执行器统计刷新排队深度和按工具的进行中调用数"""
+    depth = 0
+    calls: Dict[tuple, int] = {}
+    for executor in list(_executors):
+        stats = executor.stats()
+        depth += stats["queue_depth"]
+        for tool, counts in stats["tools"].items():
+            for state in LIVE_STATES:
+                calls[(tool, state)] = calls.get((tool, state), 0) + counts[state]
+    for (tool, state), value in calls.items():
+        EXECUTOR_CALLS.set(value, tool=tool, state=state)
+    EXECUTOR_QUEUE_DEPTH.set(depth)
+
+
+get_registry().add_collector(collect_executor_metrics)
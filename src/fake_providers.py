@@ -0,0 +1,183 @@
+"""离线替身LLM与嵌入模型
+
+LLM_PROVIDER=fake 时替换 mem0 客户端的 llm 和 embedding_model，不访问任何外部服务，
+用于压测和测试时衡量服务自身的开销：
+- FakeLLM: 确定性的事实抽取（按句切分）和更新决策（已有相同文本时为NONE，否则ADD）
+- FakeEmbedder: 基于词哈希的确定性嵌入，维度取自 EMBEDDING_DIMS，包含相同词的文本向量相近
+- FAKE_LLM_LATENCY_MS / FAKE_EMBEDDING_LATENCY_MS / FAKE_LATENCY_JITTER_MS 模拟提供商延迟
+"""
+
+import os
+import re
+import ast
+import json
+import math
+import time
+import random
+import hashlib
+import threading
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+FAKE_PROVIDER = "fake"
+
+# 单次事实抽取最多返回的事实数
+MAX_FACTS = 8
+
+
+def is_fake_provider() -> bool:
+    """是否配置了离线替身提供商"""
+    return os.getenv("LLM_PROVIDER") == FAKE_PROVIDER
+
+
+class SimulatedLatency:
+    """固定延迟加均匀分布抖动"""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0):
+        self.latency = max(latency_ms, 0.0) / 1000.0
+        self.jitter = max(jitter_ms, 0.0) / 1000.0
+        self._random = random.Random()
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        """按配置睡眠一次"""
+        delay = self.latency
+        if self.jitter:
+            with self._lock:
+                delay += self._random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+
+def hash_embedding(text: str, dims: int) -> List[float]:
+    """基于词哈希的确定性嵌入
+
+    Args:
+        text: 文本
+        dims: 向量维度
+
+    Returns:
+        List[float]: 单位向量（没有词时为零向量）
+    """
+    vector = [0.0] * dims
+    for token in re.findall(r"\w+", text.lower()):
+        digest = hashlib.sha256(token.encode("utf-8")).digest()
+        index = int.from_bytes(digest[:4], "little") % dims
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+def extract_facts(text: str) -> List[str]:
+    """确定性的事实抽取：去掉提示词和角色前缀后按句切分"""
+    text = text.split("Input:", 1)[-1]
+    text = re.sub(r"^\s*(user|assistant|system):\s*", "", text, flags=re.MULTILINE)
+    facts = [part.strip() for part in re.split(r"[.!?\n]", text) if len(part.strip()) > 3]
+    return facts[:MAX_FACTS]
+
+
+def decide_updates(prompt: str) -> List[Dict[str, str]]:
+    """确定性的更新决策：已有相同文本的记忆保持不变，其余事实新增
+
+    mem0 的更新提示词把已有记忆（字典列表）和新事实（字符串列表）放在反引号代码块中。
+    """
+    old_memories: List[Dict[str, Any]] = []
+    new_facts: List[str] = []
+    for block in re.findall(r"`{2,3}\s*(.*?)\s*`{2,3}", prompt, flags=re.DOTALL):
+        try:
+            value = ast.literal_eval(block)
+        except (ValueError, SyntaxError):
+            continue
+        if not isinstance(value, list):
+            continue
+        if value and all(isinstance(item, str) for item in value):
+            new_facts = value
+        elif all(isinstance(item, dict) for item in value) and not new_facts:
+            old_memories = value
+
+    existing = {memory.get("text") for memory in old_memories}
+    decisions = [
+        {"id": str(memory.get("id")), "text": memory.get("text"), "event": "NONE"}
+        for memory in old_memories
+    ]
+    for fact in new_facts:
+        if fact not in existing:
+            decisions.append({"id": str(len(decisions)), "text": str(fact), "event": "ADD"})
+    return decisions
+
+
+class FakeLLM:
+    """确定性的LLM替身，接口与 mem0 的 LLM 一致"""
+
+    def __init__(self, config: Any = None, latency: Optional[SimulatedLatency] = None):
+        self.config = config
+        self.latency = latency or SimulatedLatency()
+
+    def generate_response(
+        self,
+        messages: List[Dict[str, str]],
+        response_format: Any = None,
+        tools: Optional[List[Dict]] = None,
+        tool_choice: str = "auto",
+    ) -> Any:
+        """带system消息的请求视为事实抽取，否则视为更新决策
+
+        Returns:
+            Any: JSON字符串；传入 tools 时返回不含工具调用的字典
+        """
+        self.latency.wait()
+        last = messages[-1]["content"] if messages else ""
+        if any(message.get("role") == "system" for message in messages):
+            content = json.dumps({"facts": extract_facts(last)})
+        else:
+            content = json.dumps({"memory": decide_updates(last)})
+        if tools:
+            return {"content": content, "tool_calls": []}
+        return content
+
+
+class FakeEmbedder:
+    """基于词哈希的嵌入模型替身，接口与 mem0 的嵌入模型一致"""
+
+    def __init__(self, config: Any = None, dims: int = 1536, latency: Optional[SimulatedLatency] = None):
+        self.config = config
+        self.dims = dims
+        self.latency = latency or SimulatedLatency()
+
+    def embed(self, text: str, memory_action: Optional[str] = None) -> List[float]:
+        """嵌入单条文本"""
+        self.latency.wait()
+        return hash_embedding(text, self.dims)
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """一次请求嵌入多条文本，只模拟一次请求延迟"""
+        self.latency.wait()
+        return [hash_embedding(text, self.dims) for text in texts]
+
+
+def install_fake_providers(memory_client: Any) -> Any:
+    """把 mem0 客户端的 llm 和 embedding_model 替换为离线替身
+
+    Args:
+        memory_client: Memory 实例
+
+    Returns:
+        Any: 传入的客户端
+    """
+    jitter_ms = float(os.getenv("FAKE_LATENCY_JITTER_MS") or 0)
+    llm_latency = SimulatedLatency(float(os.getenv("FAKE_LLM_LATENCY_MS") or 0), jitter_ms)
+    embedding_latency = SimulatedLatency(float(os.getenv("FAKE_EMBEDDING_LATENCY_MS") or 0), jitter_ms)
+
+    embedder_config = getattr(memory_client.embedding_model, "config", None)
+    dims = getattr(embedder_config, "embedding_dims", None) or 1536
+
+    memory_client.llm = FakeLLM(getattr(memory_client.llm, "config", None), llm_latency)
+    memory_client.embedding_model = FakeEmbedder(embedder_config, dims, embedding_latency)
+    logger.info(
+        f"已启用离线替身提供商: 嵌入维度 {dims}, LLM延迟 {llm_latency.latency * 1000:.0f}ms, "
+        f"嵌入延迟 {embedding_latency.latency * 1000:.0f}ms, 抖动 {jitter_ms:.0f}ms"
+    )
+    return memory_client
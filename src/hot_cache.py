@@ -0,0 +1,332 @@
+"""按用户的热向量缓存
+
+HOT_CACHE_USERS > 0 时在 supabase（pgvector）向量存储前安装读穿缓存：
+- 某个 user_id 第一次搜索时，把该用户的全部向量和payload读入连续的 float32 矩阵（进程内 NumpyVectorStore）
+- 之后该用户的搜索在进程内用向量化点积计算精确余弦 top-k，agent_id/run_id 等其余过滤条件在内存中匹配
+- 通过 mem0 写入、更新、删除该用户的记忆后缓存失效，下次搜索时重新加载
+- 按用户数LRU淘汰；条目带TTL，限制其它服务进程写入带来的不一致
+- 记忆数超过 HOT_CACHE_MAX_ROWS 的用户不缓存，继续查询 pgvector
+
+缓存在进程内共享，连接管理器创建的所有客户端的写入都会使其失效。
+"""
+
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from metrics import get_registry
+from memory_store import has_sql_store, search_vectors, select_vectors
+from numpy_vector_store import NumpyVectorStore, OutputData
+from vector_index import store_measure
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+HOT_CACHE_REQUESTS = get_registry().counter(
+    "mem0_hot_cache_requests_total",
+    "Hot per-user vector cache lookups by result (hit, miss, bypass)",
+    ["result"],
+)
+
+HOT_CACHE_SIZE = get_registry().gauge(
+    "mem0_hot_cache_size",
+    "Contents of the hot per-user vector cache (users, vectors, bytes)",
+    ["unit"],
+)
+
+# 缓存的精确余弦结果只在集合使用余弦距离时与 pgvector 一致
+COSINE_MEASURES = (None, "cosine_distance")
+
+# (集合名, user_id)
+CacheKey = Tuple[str, str]
+
+
+class HotVectorCache:
+    """按 (集合, user_id) 缓存向量矩阵的读穿缓存
+
+    同一用户的并发首次搜索只加载一次。为避免“加载期间被写入”的结果被缓存，
+    加载完成时会检查加载开始后该用户是否被写入过，被写入时结果只用于本次搜索。
+    """
+
+    def __init__(self, max_users: int = 100, max_rows: int = 5000, ttl: float = 300):
+        """初始化缓存
+
+        Args:
+            max_users: 最多缓存的用户数
+            max_rows: 单个用户最多缓存的记忆数，超过时该用户不缓存
+            ttl: 条目存活时间（秒）
+        """
+        self.max_users = max_users
+        self.max_rows = max_rows
+        self.ttl = ttl
+
+        self._entries: "OrderedDict[CacheKey, Tuple[float, NumpyVectorStore]]" = OrderedDict()
+        self._oversized: Dict[CacheKey, float] = {}
+        self._invalidated_at: Dict[CacheKey, float] = {}
+        self._pending: Dict[CacheKey, Future] = {}
+        self._lock = threading.Lock()
+
+        logger.info(f"热向量缓存已启用，最多 {max_users} 个用户，每个用户最多 {max_rows} 条，TTL: {ttl}s")
+
+    @classmethod
+    def from_env(cls) -> Optional["HotVectorCache"]:
+        """根据环境变量创建缓存，HOT_CACHE_USERS 为0时返回None"""
+        max_users = int(os.getenv("HOT_CACHE_USERS") or 0)
+        if max_users <= 0:
+            return None
+        return cls(
+            max_users=max_users,
+            max_rows=int(os.getenv("HOT_CACHE_MAX_ROWS") or 5000),
+            ttl=float(os.getenv("HOT_CACHE_TTL") or 300),
+        )
+
+    def get_or_load(
+        self,
+        key: CacheKey,
+        loader: Callable[[int], List[Any]],
+        dims: int,
+    ) -> Optional[NumpyVectorStore]:
+        """获取用户的缓存矩阵，未命中时加载
+
+        Args:
+            key: (集合名, user_id)
+            loader: 按行数上限读取 (id, 向量, payload) 行的函数
+            dims: 向量维度
+
+        Returns:
+            Optional[NumpyVectorStore]: 用户的向量矩阵；用户记忆过多不缓存时返回None
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                HOT_CACHE_REQUESTS.inc(result="hit")
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            if self._oversized.get(key, 0) > now:
+                HOT_CACHE_REQUESTS.inc(result="bypass")
+                return None
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                future = self._pending[key] = Future()
+
+        if not owner:
+            # 其它线程正在加载同一用户
+            HOT_CACHE_REQUESTS.inc(result="hit")
+            return future.result()
+
+        HOT_CACHE_REQUESTS.inc(result="miss")
+        try:
+            store = self._load(key, loader, dims, token=now)
+        except BaseException as e:
+            with self._lock:
+                self._pending.pop(key, None)
+            future.set_exception(e)
+            raise
+        future.set_result(store)
+        return store
+
+    def _load(self, key: CacheKey, loader: Callable[[int], List[Any]], dims: int, token: float) -> Optional[NumpyVectorStore]:
+        """从 pgvector 读取用户的全部向量并构建矩阵"""
+        rows = loader(self.max_rows + 1)
+        if len(rows) > self.max_rows:
+            with self._lock:
+                self._pending.pop(key, None)
+                self._oversized[key] = time.monotonic() + self.ttl
+            logger.info(f"用户 {key[1]} 的记忆超过 {self.max_rows} 条，不使用热缓存")
+            return None
+
+        store = NumpyVectorStore(collection_name=f"{key[0]}:{key[1]}", embedding_model_dims=dims)
+        if rows:
+            store.insert(
+                vectors=[row[1] for row in rows],
+                payloads=[row[2] or {} for row in rows],
+                ids=[str(row[0]) for row in rows],
+            )
+
+        with self._lock:
+            self._pending.pop(key, None)
+            if self._invalidated_at.get(key, -1.0) >= token:
+                # 加载期间用户被写入，结果可能已过时，只用于本次搜索
+                return store
+            self._entries[key] = (time.monotonic() + self.ttl, store)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        logger.debug(f"已加载用户 {key[1]} 的 {len(rows)} 条向量到热缓存")
+        return store
+
+    def invalidate(self, key: CacheKey) -> None:
+        """用户的记忆发生变化后使其缓存失效"""
+        now = time.monotonic()
+        with self._lock:
+            self._entries.pop(key, None)
+            self._oversized.pop(key, None)
+            self._invalidated_at[key] = now
+            # 只需保留可能仍有加载在进行中的失效记录
+            expired = [written for written, at in self._invalidated_at.items() if now - at > self.ttl]
+            for written in expired:
+                del self._invalidated_at[written]
+
+    def invalidate_vector(self, collection_name: str, vector_id: str) -> None:
+        """使包含指定记忆的用户缓存失效（更新/删除时记忆上可能没有 user_id）
+
+        正在加载的用户无法判断是否包含该记忆，集合内所有进行中的加载都标记为失效。
+        """
+        with self._lock:
+            owners = [
+                key for key, (_, store) in self._entries.items()
+                if key[0] == collection_name and store.get(vector_id) is not None
+            ]
+            owners += [key for key in self._pending if key[0] == collection_name]
+        for key in owners:
+            self.invalidate(key)
+
+    def invalidate_collection(self, collection_name: str) -> None:
+        """使集合的全部缓存失效"""
+        with self._lock:
+            keys = [key for key in list(self._entries) + list(self._pending) if key[0] == collection_name]
+        for key in keys:
+            self.invalidate(key)
+
+    def stats(self) -> Dict[str, int]:
+        """获取缓存统计
+
+        Returns:
+            Dict[str, int]: 缓存的用户数、向量条数和矩阵占用字节数
+        """
+        with self._lock:
+            infos = [store.col_info() for _, store in self._entries.values()]
+        return {
+            "users": len(infos),
+            "vectors": sum(info["count"] for info in infos),
+            "bytes": sum(info["count"] * info["dimension"] * 4 for info in infos),
+        }
+
+
+class CachedVectorStore:
+    """向量存储包装器：带 user_id 的搜索走热缓存，写入后使对应用户失效，其余属性透传"""
+
+    def __init__(self, memory_client: Any, store: Any, cache: HotVectorCache):
+        """初始化包装器
+
+        Args:
+            memory_client: 所属的 Memory 实例（读取时通过它获取当前的数据库引擎）
+            store: mem0 创建的 supabase 向量存储
+            cache: 进程内共享的热缓存
+        """
+        self.memory_client = memory_client
+        self.store = store
+        self.cache = cache
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.store, name)
+
+    def _key(self, user_id: Any) -> CacheKey:
+        return (self.store.collection_name, str(user_id))
+
+    def _cached(self, filters: Optional[Dict]) -> Optional[NumpyVectorStore]:
+        """获取搜索作用域所属用户的缓存矩阵，不能使用缓存时返回None"""
+        user_id = (filters or {}).get("user_id")
+        if user_id is None:
+            HOT_CACHE_REQUESTS.inc(result="bypass")
+            return None
+        return self.cache.get_or_load(
+            self._key(user_id),
+            lambda limit: select_vectors(self.memory_client, {"user_id": user_id}, limit),
+            self.store.embedding_model_dims,
+        )
+
+    def search(self, query: Any, vectors: Optional[List[float]] = None, limit: int = 5, filters: Optional[Dict] = None) -> Any:
+        """按 user_id 作用域的搜索在进程内完成，其余搜索交给 pgvector"""
+        cached = self._cached(filters)
+        if cached is not None:
+            return cached.search(query, vectors, limit, filters)
+        if vectors is None:
+            return self.store.search(query=query, limit=limit, filters=filters)
+        return self.store.search(query=query, vectors=vectors, limit=limit, filters=filters)
+
+    def search_many(self, vectors: List[List[float]], limits: List[int], filters: Optional[Dict] = None) -> List[List[OutputData]]:
+        """批量搜索：命中缓存时一次矩阵乘法完成，否则在一条SQL中查询 pgvector"""
+        cached = self._cached(filters)
+        if cached is not None:
+            return cached.search_many(vectors, limits, filters)
+        results = search_vectors(self.memory_client, vectors, limits, filters or {}, store_measure(self.memory_client))
+        return [
+            [OutputData(id=memory_id, score=distance, payload=payload) for memory_id, distance, payload in hits]
+            for hits in results
+        ]
+
+    def insert(self, vectors: List[List[float]], payloads: Optional[List[Dict]] = None, ids: Optional[List[str]] = None) -> Any:
+        result = self.store.insert(vectors=vectors, payloads=payloads, ids=ids)
+        user_ids = {payload.get("user_id") for payload in payloads or [] if payload}
+        for user_id in user_ids - {None}:
+            self.cache.invalidate(self._key(user_id))
+        return result
+
+    def update(self, vector_id: str, vector: Optional[List[float]] = None, payload: Optional[Dict] = None) -> Any:
+        result = self.store.update(vector_id=vector_id, vector=vector, payload=payload)
+        self.cache.invalidate_vector(self.store.collection_name, str(vector_id))
+        if payload and payload.get("user_id") is not None:
+            self.cache.invalidate(self._key(payload["user_id"]))
+        return result
+
+    def delete(self, vector_id: str) -> Any:
+        result = self.store.delete(vector_id=vector_id)
+        self.cache.invalidate_vector(self.store.collection_name, str(vector_id))
+        return result
+
+    def delete_col(self) -> Any:
+        result = self.store.delete_col()
+        self.cache.invalidate_collection(self.store.collection_name)
+        return result
+
+
+_cache: Optional[HotVectorCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_hot_cache() -> Optional[HotVectorCache]:
+    """获取进程内共享的热缓存，未启用时返回None"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = HotVectorCache.from_env()
+        return _cache
+
+
+def collect_hot_cache_metrics() -> None:
+    """在每次采集前刷新热缓存大小指标"""
+    if _cache is not None:
+        for unit, value in _cache.stats().items():
+            HOT_CACHE_SIZE.set(value, unit=unit)
+
+
+get_registry().add_collector(collect_hot_cache_metrics)
+
+
+def install_hot_cache(memory_client: Any) -> Any:
+    """为使用 supabase 向量存储的客户端安装热向量缓存
+
+    Args:
+        memory_client: Memory 实例
+
+    Returns:
+        Any: 传入的客户端
+    """
+    cache = get_hot_cache()
+    if cache is None or not has_sql_store(memory_client):
+        return memory_client
+    measure = store_measure(memory_client)
+    if measure not in COSINE_MEASURES:
+        logger.warning(f"向量存储使用 {measure} 距离，热缓存只支持余弦距离，未启用")
+        return memory_client
+    memory_client.vector_store = CachedVectorStore(memory_client, memory_client.vector_store, cache)
+    return memory_client
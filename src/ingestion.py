@@ -0,0 +1,428 @@
+"""异步写入队列模块
+
+save_memory 的写后（write-behind）模式：文本先写入本地SQLite持久队列并立即返回票据ID，
+由后台工作协程调用mem0完成事实抽取和写入，失败时按指数退避重试。
+
+领取任务时记录领取者和租约到期时间，处理期间定期续约；只有租约过期（领取者已退出）的任务才会被重新领取，
+多个进程共用同一个队列文件时不会重复处理同一条任务。
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import threading
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# 任务状态
+STATUS_PENDING = "pending"
+STATUS_PROCESSING = "processing"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+@dataclass
+class IngestionJob:
+    """队列中的一条写入任务"""
+    ticket_id: str
+    text: str
+    params: Dict[str, Any]
+    attempts: int
+
+
+class IngestionQueue:
+    """基于SQLite的持久写入队列
+
+    功能：
+    - 入队后立即持久化，进程重启不丢失
+    - 按创建顺序领取任务，支持延迟重试
+    - 领取的任务带租约，领取者退出后租约过期的任务重新排队
+    - 线程安全操作
+    """
+
+    def __init__(self, db_path: str = "mem0_ingestion.db", lease_seconds: float = 60.0):
+        """初始化队列
+
+        Args:
+            db_path: SQLite数据库文件路径
+            lease_seconds: 领取任务的租约时长（秒），处理期间由工作协程续约
+        """
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        # 本队列实例（进程）的领取者标识
+        self.owner = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS ingestion_jobs (
+                    ticket_id TEXT PRIMARY KEY,
+                    text TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    result TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    next_attempt_at REAL NOT NULL,
+                    owner TEXT,
+                    lease_expires_at REAL
+                )
+            """)
+            # 旧版本创建的队列没有租约列
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(ingestion_jobs)")}
+            for column, column_type in (("owner", "TEXT"), ("lease_expires_at", "REAL")):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE ingestion_jobs ADD COLUMN {column} {column_type}")
+            self._conn.execute("""
+                CREATE INDEX IF NOT EXISTS ix_ingestion_jobs_pending
+                ON ingestion_jobs (status, next_attempt_at, created_at)
+            """)
+
+        logger.info(f"写入队列已初始化: {db_path}")
+
+    def enqueue(self, text: str, params: Dict[str, Any]) -> str:
+        """写入一条任务
+
+        Args:
+            text: 要保存的记忆文本
+            params: 传给 Memory.add 的关键字参数（如 user_id）
+
+        Returns:
+            str: 票据ID
+        """
+        ticket_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO ingestion_jobs (ticket_id, text, params, status, created_at, updated_at, next_attempt_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (ticket_id, text, json.dumps(params), STATUS_PENDING, now, now, now),
+            )
+        return ticket_id
+
+    def claim(self) -> Optional[IngestionJob]:
+        """领取最早的一条到期任务（或租约已过期的处理中任务），标记为处理中并取得租约
+
+        Returns:
+            Optional[IngestionJob]: 任务，没有可处理的任务时返回None
+        """
+        now = time.time()
+        with self._lock:
+            # 多个进程可能共用队列文件：BEGIN IMMEDIATE 使查询和领取成为一个原子操作
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT ticket_id, text, params, attempts FROM ingestion_jobs "
+                    "WHERE (status = ? AND next_attempt_at <= ?) "
+                    "OR (status = ? AND (lease_expires_at IS NULL OR lease_expires_at <= ?)) "
+                    "ORDER BY created_at LIMIT 1",
+                    (STATUS_PENDING, now, STATUS_PROCESSING, now),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE ingestion_jobs SET status = ?, attempts = attempts + 1, owner = ?, "
+                        "lease_expires_at = ?, updated_at = ? WHERE ticket_id = ?",
+                        (STATUS_PROCESSING, self.owner, now + self.lease_seconds, now, row["ticket_id"]),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return IngestionJob(
+            ticket_id=row["ticket_id"],
+            text=row["text"],
+            params=json.loads(row["params"]),
+            attempts=row["attempts"] + 1,
+        )
+
+    def renew(self, ticket_id: str) -> bool:
+        """延长本实例持有的任务租约
+
+        Args:
+            ticket_id: 票据ID
+
+        Returns:
+            bool: 是否仍持有该任务（租约过期后被其他领取者取走时为False）
+        """
+        now = time.time()
+        return self._update_owned(
+            ticket_id, "lease_expires_at = ?, updated_at = ?", (now + self.lease_seconds, now)
+        )
+
+    def complete(self, ticket_id: str, result: Any = None) -> bool:
+        """标记任务完成
+
+        Args:
+            ticket_id: 票据ID
+            result: mem0返回的结果，序列化后保存
+
+        Returns:
+            bool: 是否仍持有该任务，为False时不做修改
+        """
+        return self._update_owned(
+            ticket_id,
+            "status = ?, result = ?, last_error = NULL, owner = NULL, lease_expires_at = NULL, updated_at = ?",
+            (STATUS_DONE, json.dumps(result, default=str), time.time()),
+        )
+
+    def retry(self, ticket_id: str, error: str, delay: float) -> bool:
+        """任务失败，延迟后重新排队
+
+        Args:
+            ticket_id: 票据ID
+            error: 错误信息
+            delay: 重试前等待时间（秒）
+
+        Returns:
+            bool: 是否仍持有该任务，为False时不做修改
+        """
+        now = time.time()
+        return self._update_owned(
+            ticket_id,
+            "status = ?, last_error = ?, owner = NULL, lease_expires_at = NULL, updated_at = ?, next_attempt_at = ?",
+            (STATUS_PENDING, error, now, now + delay),
+        )
+
+    def fail(self, ticket_id: str, error: str) -> bool:
+        """任务最终失败，不再重试
+
+        Args:
+            ticket_id: 票据ID
+            error: 错误信息
+
+        Returns:
+            bool: 是否仍持有该任务，为False时不做修改
+        """
+        return self._update_owned(
+            ticket_id,
+            "status = ?, last_error = ?, owner = NULL, lease_expires_at = NULL, updated_at = ?",
+            (STATUS_FAILED, error, time.time()),
+        )
+
+    def _update_owned(self, ticket_id: str, assignments: str, values: tuple) -> bool:
+        """更新本实例持有的处理中任务"""
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE ingestion_jobs SET {assignments} WHERE ticket_id = ? AND status = ? AND owner = ?",
+                (*values, ticket_id, STATUS_PROCESSING, self.owner),
+            )
+        return cursor.rowcount > 0
+
+    def get(self, ticket_id: str) -> Optional[Dict[str, Any]]:
+        """查询任务状态
+
+        Args:
+            ticket_id: 票据ID
+
+        Returns:
+            Optional[Dict[str, Any]]: 任务信息，不存在时返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT ticket_id, status, attempts, last_error, result, created_at, updated_at "
+                "FROM ingestion_jobs WHERE ticket_id = ?",
+                (ticket_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def recover(self) -> int:
+        """把租约已过期的处理中任务（领取者已退出）重新排队
+
+        仍在租约期内的任务可能正由其他进程处理，保持不变。
+
+        Returns:
+            int: 重新排队的任务数
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE ingestion_jobs SET status = ?, owner = NULL, lease_expires_at = NULL, updated_at = ? "
+                "WHERE status = ? AND (lease_expires_at IS NULL OR lease_expires_at <= ?)",
+                (STATUS_PENDING, now, STATUS_PROCESSING, now),
+            )
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        """按状态统计任务数
+
+        Returns:
+            Dict[str, int]: 状态到任务数的映射
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, count(*) FROM ingestion_jobs GROUP BY status"
+            ).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+class IngestionWorkerPool:
+    """后台写入工作协程池
+
+    工作协程从队列领取任务并调用处理函数；处理函数抛出异常时按指数退避重试，
+    超过最大尝试次数后标记为失败。
+    """
+
+    def __init__(
+        self,
+        queue: IngestionQueue,
+        process: Callable[[IngestionJob], Awaitable[Any]],
+        run_blocking: Callable[..., Awaitable[Any]],
+        workers: int = 2,
+        max_attempts: int = 5,
+        retry_backoff: float = 2.0,
+        poll_interval: float = 1.0,
+    ):
+        """初始化工作协程池
+
+        Args:
+            queue: 持久写入队列
+            process: 处理单个任务的协程函数，返回值会保存为任务结果
+            run_blocking: 在线程池中执行阻塞函数的协程函数（用于队列的SQLite操作）
+            workers: 工作协程数
+            max_attempts: 最大尝试次数
+            retry_backoff: 首次重试的等待时间（秒），之后每次翻倍
+            poll_interval: 队列为空时的轮询间隔（秒）
+        """
+        self.queue = queue
+        self.process = process
+        self.run_blocking = run_blocking
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.poll_interval = poll_interval
+
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+
+    @classmethod
+    def from_env(
+        cls,
+        process: Callable[[IngestionJob], Awaitable[Any]],
+        run_blocking: Callable[..., Awaitable[Any]],
+    ) -> Optional["IngestionWorkerPool"]:
+        """根据环境变量创建工作协程池，未启用异步写入时返回None"""
+        if os.getenv("MEM0_INGESTION_MODE", "sync").lower() != "async":
+            return None
+        queue = IngestionQueue(
+            os.getenv("MEM0_INGESTION_DB_PATH", "mem0_ingestion.db"),
+            lease_seconds=float(os.getenv("MEM0_INGESTION_LEASE_SECONDS", "60")),
+        )
+        return cls(
+            queue,
+            process,
+            run_blocking,
+            workers=int(os.getenv("MEM0_INGESTION_WORKERS", "2")),
+            max_attempts=int(os.getenv("MEM0_INGESTION_MAX_ATTEMPTS", "5")),
+        )
+
+    def start(self) -> None:
+        """恢复租约已过期的任务并启动工作协程"""
+        recovered = self.queue.recover()
+        if recovered:
+            logger.info(f"重新排队 {recovered} 个中断的写入任务")
+        for index in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(), name=f"mem0-ingestion-{index}"))
+        logger.info(f"已启动 {self.workers} 个写入工作协程")
+
+    async def stop(self) -> None:
+        """停止工作协程，处理中的任务在租约过期后重新排队"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        self.queue.close()
+        logger.info("写入工作协程已停止")
+
+    async def submit(self, text: str, params: Dict[str, Any]) -> str:
+        """入队并唤醒工作协程
+
+        Args:
+            text: 要保存的记忆文本
+            params: 传给 Memory.add 的关键字参数
+
+        Returns:
+            str: 票据ID
+        """
+        ticket_id = await self.run_blocking(self.queue.enqueue, text, params)
+        self._wakeup.set()
+        return ticket_id
+
+    async def status(self, ticket_id: str) -> Optional[Dict[str, Any]]:
+        """查询任务状态
+
+        Args:
+            ticket_id: 票据ID
+
+        Returns:
+            Optional[Dict[str, Any]]: 任务信息，不存在时返回None
+        """
+        return await self.run_blocking(self.queue.get, ticket_id)
+
+    async def _worker(self) -> None:
+        """工作协程主循环"""
+        while True:
+            # 先清除唤醒标记再领取：领取期间入队的任务会重新置位，不会被错过
+            self._wakeup.clear()
+            job = await self.run_blocking(self.queue.claim)
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heartbeat = asyncio.create_task(self._renew_lease(job.ticket_id))
+            try:
+                result = await self.process(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                if job.attempts >= self.max_attempts:
+                    logger.error(f"写入任务 {job.ticket_id} 失败，已达最大尝试次数: {error}")
+                    await self.run_blocking(self.queue.fail, job.ticket_id, error)
+                else:
+                    delay = self.retry_backoff * (2 ** (job.attempts - 1))
+                    logger.warning(f"写入任务 {job.ticket_id} 第 {job.attempts} 次失败，{delay:.1f}s 后重试: {error}")
+                    await self.run_blocking(self.queue.retry, job.ticket_id, error, delay)
+                continue
+            finally:
+                heartbeat.cancel()
+
+            if not await self.run_blocking(self.queue.complete, job.ticket_id, result):
+                logger.warning(f"写入任务 {job.ticket_id} 的租约已过期并被重新领取，不记录本次结果")
+
+    async def _renew_lease(self, ticket_id: str) -> None:
+        """处理期间定期续约，避免长时间的写入被其他工作协程重复领取"""
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            try:
+                if not await self.run_blocking(self.queue.renew, ticket_id):
+                    logger.warning(f"写入任务 {ticket_id} 的租约已丢失")
+                    return
+            except Exception as e:
+                logger.warning(f"写入任务 {ticket_id} 续约失败: {e}")
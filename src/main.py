@@ -3,29 +3,104 @@ from contextlib import asynccontextmanager
 from collections.abc import AsyncIterator
 from dataclasses import dataclass
 from dotenv import load_dotenv
+from functools import partial, wraps
+from typing import Optional, Union
 from mem0 import Memory
+from pydantic import BaseModel
 import asyncio
 import json
+import time
 import os
 
 from utils import get_mem0_client
 from connection_manager import get_connection_manager, managed_mem0_client
+from executor import ToolExecutor
+from ingestion import IngestionWorkerPool
+from batching import AddBatcher
+from search_cache import SearchResultCache, get_search_cache, make_scope
+from batch_search import MAX_BATCH_LIMIT, MAX_BATCH_QUERIES, search_batch
+from bulk_import import DEFAULT_BATCH_SIZE, FORMATS, BulkImporter, embed_texts
+from bulk_export import FORMATS as EXPORT_FORMATS, export_memories as export_memories_to_file
+from raw_store import dedup_threshold_from_env, store_raw
+from memory_store import has_sql_store, list_memories_page
+from vector_index import IndexBuildThread, apply_search_settings, start_index_build
+from metrics import PROMETHEUS_CONTENT_TYPE, get_registry
+import tracing
 
 load_dotenv()
 
-# Default user ID for memory operations
-DEFAULT_USER_ID = "user"
+# Default user ID for memory operations when a tool call does not specify one
+DEFAULT_USER_ID = os.getenv("MEM0_DEFAULT_USER_ID", "user")
+
+# Memory fields that scope a memory to a tenant; writes invalidate cached searches in that scope
+SCOPE_KEYS = ("user_id", "agent_id", "run_id")
+
+# Run save_memory through LLM fact extraction by default; false stores texts verbatim unless a call passes infer=True
+DEFAULT_INFER = os.getenv("MEM0_DEFAULT_INFER", "true").lower() in ("1", "true", "yes")
+
+# Skip verbatim writes whose cosine similarity to an existing memory in the same scope reaches this value (0 = off)
+RAW_DEDUP_THRESHOLD = dedup_threshold_from_env()
+
+# Create the expression indexes used for filtering and pagination at startup
+MANAGE_INDEXES = os.getenv("MEM0_MANAGE_INDEXES", "true").lower() in ("1", "true", "yes")
+
+# Verify (and build if missing) the ANN index on the memories collection at startup
+VECTOR_INDEX_ON_STARTUP = os.getenv("VECTOR_INDEX_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+# Directory the import_memories tool may read source files from; the tool is disabled when unset
+IMPORT_DIR = os.getenv("MEM0_IMPORT_DIR")
+
+# Directory the export_memories tool writes files to; the tool is disabled when unset
+EXPORT_DIR = os.getenv("MEM0_EXPORT_DIR")
+
+# Serve Prometheus metrics next to the SSE transport on HOST/PORT
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+METRICS_PATH = os.getenv("METRICS_PATH") or "/metrics"
+
+TOOL_REQUESTS = get_registry().counter("mem0_tool_requests_total", "MCP tool calls", ["tool"])
+TOOL_ERRORS = get_registry().counter("mem0_tool_errors_total", "MCP tool calls that returned an error", ["tool"])
+TOOL_LATENCY = get_registry().histogram("mem0_tool_duration_seconds", "MCP tool call latency", ["tool"])
+TOOL_IN_FLIGHT = get_registry().gauge("mem0_tool_in_flight", "MCP tool calls currently running", ["tool"])
+DB_POOL_CONNECTIONS = get_registry().gauge(
+    "mem0_db_pool_connections", "Shared Postgres pool connections by state (checked_out, idle, waiting)", ["state"]
+)
+DB_POOL_CREATED = get_registry().gauge(
+    "mem0_db_pool_created_connections", "Connections opened by the shared Postgres pool since startup"
+)
+
+def collect_pool_metrics() -> None:
+    """Refresh the connection pool gauges from the ConnectionManager before each scrape."""
+    stats = get_connection_manager().get_pool_stats()
+    for state in ("checked_out", "idle", "waiting"):
+        DB_POOL_CONNECTIONS.set(stats.get(state, 0), state=state)
+    DB_POOL_CREATED.set(stats.get("created_total", 0))
+
+get_registry().add_collector(collect_pool_metrics)
 
 # Create a dataclass for our application context
 @dataclass
 class Mem0Context:
     """Context for the Mem0 MCP server."""
     mem0_client: Memory
+    executor: ToolExecutor
+    ingestion: Optional[IngestionWorkerPool] = None
+    batcher: Optional[AddBatcher] = None
+    search_cache: Optional[SearchResultCache] = None
+    index_build: Optional[IndexBuildThread] = None
+
+# Process-wide server context. FastMCP enters the lifespan once per client session (every SSE
+# connection), so the first session starts the client, executor, queues and caches and every
+# later session shares them; they are torn down once, by close_server_context at process shutdown.
+_server_context: Optional[Mem0Context] = None
+_server_context_lock = asyncio.Lock()
 
 @asynccontextmanager
 async def mem0_lifespan(server: FastMCP) -> AsyncIterator[Mem0Context]:
     """
-    Manages the Mem0 client lifecycle using connection manager.
+    Hands each MCP session the process-wide Mem0 context.
+
+    Ending a session does not close anything: other sessions may still be using the
+    client, the executor and the write queues.
     
     Args:
         server: The FastMCP server instance
@@ -33,50 +108,134 @@ async def mem0_lifespan(server: FastMCP) -> AsyncIterator[Mem0Context]:
     Yields:
         Mem0Context: The context containing the Mem0 client
     """
+    yield await get_server_context()
+
+async def get_server_context() -> Mem0Context:
+    """Return the process-wide Mem0 context, starting it on first use."""
+    global _server_context
+    async with _server_context_lock:
+        if _server_context is None:
+            _server_context = await start_server_context()
+        return _server_context
+
+async def start_server_context() -> Mem0Context:
+    """Create the Mem0 client and start the executor, write queues and background index builds."""
     print("Initializing Mem0 client with connection manager...")
     connection_manager = get_connection_manager()
+    executor = ToolExecutor.from_env()
+    context = None
     
     try:
         # 启动定期清理线程
         connection_manager.start_periodic_cleanup(interval=300)  # 每5分钟清理一次
         
-        # 获取管理的客户端
+        # 获取管理的客户端（整个进程共用一个）
         mem0_client = connection_manager.get_client("main_server")
         print("Mem0 client initialized successfully")
         
-        # 记录初始连接数
-        initial_connections = connection_manager.get_connection_count()
-        print(f"Initial database connections: {initial_connections}")
+        context = Mem0Context(
+            mem0_client=mem0_client,
+            executor=executor,
+            search_cache=get_search_cache(),
+        )
+        
+        # 记录初始连接池状态
+        print(f"Initial database pool: {connection_manager.get_pool_stats()}")
         
-        yield Mem0Context(mem0_client=mem0_client)
+        # 启动工具执行线程池
+        executor.start()
+        
+        # 索引和搜索参数只适用于 supabase（pgvector）向量存储
+        sql_store = has_sql_store(mem0_client)
+        
+        # 运行时搜索参数立即生效；过滤/分页索引和向量索引在专用后台线程中构建，不阻塞服务启动
+        try:
+            if sql_store:
+                apply_search_settings(mem0_client)
+        except Exception as settings_error:
+            print(f"Skipping vector search settings: {settings_error}")
+        if sql_store:
+            context.index_build = start_index_build(mem0_client, MANAGE_INDEXES, VECTOR_INDEX_ON_STARTUP)
+        
+        # 预先建立共享连接池的常驻连接
+        if connection_manager.db_pool:
+            try:
+                await executor.run("startup", connection_manager.db_pool.warm_up)
+            except Exception as warm_error:
+                print(f"Skipping connection pool warm-up: {warm_error}")
+        
+        # 写入微批处理（MEM0_BATCH_WINDOW_MS > 0 时）
+        context.batcher = AddBatcher.from_env(
+            lambda texts, params: add_memories(context, "save_memory_batch", texts, params),
+            embed=partial(executor.run, "save_memory_batch", embed_texts, mem0_client),
+        )
+        
+        # 启动异步写入队列（MEM0_INGESTION_MODE=async 时）
+        ingestion = IngestionWorkerPool.from_env(
+            process=lambda job: add_memory(context, "ingestion_worker", job.text, job.params),
+            run_blocking=partial(executor.run, "ingestion_queue"),
+        )
+        if ingestion:
+            ingestion.start()
+            context.ingestion = ingestion
+        
+        return context
         
     except Exception as e:
         print(f"Error initializing Mem0 client: {str(e)}")
         print(f"Error type: {type(e).__name__}")
         import traceback
         print(f"Traceback: {traceback.format_exc()}")
+        await shutdown_server_context(context, executor)
         raise
-    finally:
-        print("Cleaning up Mem0 client with connection manager...")
-        try:
-            # 释放主服务器客户端
-            connection_manager.release_client("main_server")
-            
-            # 停止定期清理线程
-            connection_manager.stop_periodic_cleanup()
-            
-            # 清理所有客户端
-            connection_manager.cleanup_all()
+
+async def close_server_context() -> None:
+    """Tear down the process-wide Mem0 context (called once, at process shutdown)."""
+    global _server_context
+    async with _server_context_lock:
+        context, _server_context = _server_context, None
+        if context is not None:
+            await shutdown_server_context(context, context.executor)
+
+async def shutdown_server_context(context: Optional[Mem0Context], executor: ToolExecutor) -> None:
+    """Stop everything start_server_context started, in reverse order."""
+    print("Cleaning up Mem0 client with connection manager...")
+    connection_manager = get_connection_manager()
+    try:
+        if context:
+            # 取消尚未完成的索引构建（中断留下的无效索引下次启动时删除重建）
+            if context.index_build:
+                await asyncio.to_thread(context.index_build.stop)
             
-            # 记录最终连接数
-            final_connections = connection_manager.get_connection_count()
-            print(f"Final database connections: {final_connections}")
+            # 停止异步写入工作协程
+            if context.ingestion:
+                await context.ingestion.stop()
             
-            print("Connection manager cleanup completed")
-        except Exception as cleanup_error:
-            print(f"Error during connection manager cleanup: {cleanup_error}")
+            # 发送并等待尚未完成的合并写入批次
+            if context.batcher:
+                await context.batcher.drain()
         
-        print("Mem0 client lifecycle management completed")
+        # 关闭工具执行线程池
+        print(f"Tool executor stats: {executor.stats()}")
+        executor.shutdown(wait=False)
+        
+        # 释放主服务器客户端
+        connection_manager.release_client("main_server")
+        
+        # 停止定期清理线程
+        connection_manager.stop_periodic_cleanup()
+        
+        # 清理所有客户端
+        connection_manager.cleanup_all()
+        
+        # 记录最终连接池状态
+        print(f"Final database pool: {connection_manager.get_pool_stats()}")
+        
+        print("Connection manager cleanup completed")
+    except Exception as cleanup_error:
+        print(f"Error during connection manager cleanup: {cleanup_error}")
+    
+    print("Mem0 client lifecycle management completed")
 
 # Initialize FastMCP server with the Mem0 client as context
 mcp = FastMCP(
@@ -87,8 +246,137 @@ mcp = FastMCP(
     port=int(os.getenv("PORT", "8050"))
 )        
 
+def request_trace_context(ctx: Optional[Context]):
+    """Extract the caller's trace context from the MCP request metadata, if any."""
+    try:
+        return tracing.extract_context(ctx.request_context.meta)
+    except (AttributeError, LookupError, ValueError):
+        return None
+
+def instrumented(tool):
+    """Record request count, latency, errors and in-flight calls for an MCP tool, and trace it.
+
+    Tools report failures as strings starting with "Error", so those count as errors too.
+    The tool span continues the caller's trace when the request _meta carries a traceparent.
+    """
+    name = tool.__name__
+
+    @wraps(tool)
+    async def wrapper(*args, **kwargs):
+        TOOL_REQUESTS.inc(tool=name)
+        TOOL_IN_FLIGHT.inc(tool=name)
+        start = time.perf_counter()
+        failed = True
+        try:
+            with tracing.span(f"mcp.tool {name}", {"mcp.tool": name}, parent=request_trace_context(kwargs.get("ctx"))) as span:
+                result = await tool(*args, **kwargs)
+                failed = isinstance(result, str) and result.startswith("Error")
+                if failed and span is not None:
+                    span.set_attribute("error", True)
+                return result
+        finally:
+            TOOL_IN_FLIGHT.dec(tool=name)
+            TOOL_LATENCY.observe(time.perf_counter() - start, tool=name)
+            if failed:
+                TOOL_ERRORS.inc(tool=name)
+
+    return wrapper
+
+async def call_mem0(context: Mem0Context, tool_name: str, method: str, *args, **kwargs):
+    """Invoke a Mem0 client method on the tool executor's thread pool, under the tool's concurrency limit."""
+    return await context.executor.run(tool_name, getattr(context.mem0_client, method), *args, **kwargs)
+
+async def add_memories(context: Mem0Context, tool_name: str, texts: list[str], params: dict):
+    """Run the full Mem0 add pipeline once for one or more texts."""
+    messages = [{"role": "user", "content": text} for text in texts]
+    try:
+        return await call_mem0(context, tool_name, "add", messages, **params)
+    finally:
+        # add may have created, updated or deleted memories in this scope even if it failed midway
+        invalidate_scope(context, params)
+
+async def add_memory(context: Mem0Context, tool_name: str, text: str, params: dict):
+    """Add a single text, coalescing it with concurrent writes when batching is enabled."""
+    if context.batcher:
+        return await context.batcher.submit(text, params)
+    return await add_memories(context, tool_name, [text], params)
+
+async def store_memory_raw(context: Mem0Context, tool_name: str, text: str, params: dict):
+    """Store a text verbatim with a single embedding, skipping LLM inference."""
+    try:
+        return await context.executor.run(tool_name, store_raw, context.mem0_client, text, params, None, RAW_DEDUP_THRESHOLD)
+    finally:
+        invalidate_scope(context, params)
+
+def resolve_scope(user_id: Optional[str] = None, agent_id: Optional[str] = None, run_id: Optional[str] = None) -> dict:
+    """Build the tenant filters for a tool call, falling back to the server's default user."""
+    scope = {"user_id": user_id or DEFAULT_USER_ID, "agent_id": agent_id, "run_id": run_id}
+    return {key: value for key, value in scope.items() if value}
+
+def invalidate_scope(context: Mem0Context, params: dict) -> None:
+    """Drop cached search results affected by a write to the memories in this scope."""
+    if context.search_cache:
+        context.search_cache.invalidate(make_scope({key: params.get(key) for key in SCOPE_KEYS}))
+
+async def search_memory(context: Mem0Context, tool_name: str, query: str, filters: dict, limit: int):
+    """Run a Mem0 search, serving repeated queries in the same scope from the result cache."""
+    cache = context.search_cache
+    if not cache:
+        return await call_mem0(context, tool_name, "search", query, limit=limit, **filters)
+
+    scope = make_scope(filters)
+    cached = cache.get(scope, query, limit)
+    if cached is not None:
+        return cached
+    token = cache.begin()
+    memories = await call_mem0(context, tool_name, "search", query, limit=limit, **filters)
+    cache.put(scope, query, limit, memories, token)
+    return memories
+
+async def search_memory_batch(context: Mem0Context, tool_name: str, queries: list[str], limits: list[int], filters: dict):
+    """Run several searches at once, serving cached queries and looking up the rest in a single batch.
+
+    Results are stored in the search cache in the same shape as Mem0 search results, so
+    search_memories and search_memories_batch share cache entries.
+    """
+    cache = context.search_cache
+    scope = make_scope(filters)
+    results = [cache.get(scope, query, limit) if cache else None for query, limit in zip(queries, limits)]
+    missing = [index for index, result in enumerate(results) if result is None]
+    if missing:
+        token = cache.begin() if cache else None
+        found = await context.executor.run(
+            tool_name, search_batch, context.mem0_client,
+            [queries[index] for index in missing], [limits[index] for index in missing], filters,
+        )
+        for index, memories in zip(missing, found):
+            results[index] = {"results": memories}
+            if cache:
+                cache.put(scope, queries[index], limits[index], results[index], token)
+    return results
+
+def flatten_memories(memories) -> list:
+    """Reduce a Mem0 search result to the list of memory texts returned by the search tools."""
+    if isinstance(memories, dict) and "results" in memories:
+        return [memory["memory"] for memory in memories["results"]]
+    return memories
+
+class BatchQuery(BaseModel):
+    """One search in a search_memories_batch call."""
+    query: str
+    limit: int = 3
+
 @mcp.tool()
-async def save_memory(ctx: Context, text: str) -> str:
+@instrumented
+async def save_memory(
+    ctx: Context,
+    text: str,
+    user_id: Optional[str] = None,
+    agent_id: Optional[str] = None,
+    run_id: Optional[str] = None,
+    infer: Optional[bool] = None,
+    debug: bool = False,
+) -> str:
     """Save information to your long-term memory.
 
     This tool is designed to store any type of information that might be useful in the future.
@@ -97,40 +385,110 @@ async def save_memory(ctx: Context, text: str) -> str:
     Args:
         ctx: The MCP server provided context which includes the Mem0 client
         text: The content to store in memory, including any relevant details and context
+        user_id: The user the memories belong to (default: the server's default user)
+        agent_id: Optional agent id to scope the memories to a single agent
+        run_id: Optional run id to scope the memories to a single session or run
+        infer: Extract facts from the text with the LLM and merge them with existing memories (true),
+            or store the text verbatim as a single memory with just an embedding (false), which is
+            much faster when the text is already exactly what should be remembered
+            (default: the server's MEM0_DEFAULT_INFER setting)
+        debug: Return a JSON object with the time spent in each stage of the write pipeline
+            (fact extraction, embedding, similarity search, update decision, vector writes), in milliseconds
     """
     try:
-        mem0_client = ctx.request_context.lifespan_context.mem0_client
-        messages = [{"role": "user", "content": text}]
-        mem0_client.add(messages, user_id=DEFAULT_USER_ID)
-        return f"Successfully saved memory: {text[:100]}..." if len(text) > 100 else f"Successfully saved memory: {text}"
+        context = ctx.request_context.lifespan_context
+        params = resolve_scope(user_id, agent_id, run_id)
+        if infer is None:
+            infer = DEFAULT_INFER
+        if not infer:
+            # 原文写入只需一次嵌入和一次向量写入，不经过异步队列和合并写入
+            result = await store_memory_raw(context, "save_memory", text, params)
+        elif context.ingestion:
+            # 异步写入模式：入队后立即返回票据
+            ticket_id = await context.ingestion.submit(text, params)
+            return f"Queued memory for ingestion (ticket: {ticket_id})"
+        else:
+            result = await add_memory(context, "save_memory", text, params)
+        message = f"Successfully saved memory: {text[:100]}..." if len(text) > 100 else f"Successfully saved memory: {text}"
+        if not infer and result["results"][0]["event"] == "NONE":
+            message = f"Memory already stored (id: {result['results'][0]['id']})"
+        batched = isinstance(result, dict) and "batch_size" in result
+        if batched:
+            message += f" (merged with {result['batch_size'] - 1} concurrent write(s) into one fact extraction)"
+        if debug:
+            # 合并写入时为整个批次的耗时，事件只包含分配给这条文本的部分
+            timings = result.get("stage_timings") if isinstance(result, dict) else None
+            output = {"message": message, "debug": {"stage_timings_ms": timings}}
+            if batched:
+                output["debug"].update(batch_size=result["batch_size"], results=result["results"])
+            return json.dumps(output, indent=2)
+        return message
     except Exception as e:
         return f"Error saving memory: {str(e)}"
 
 @mcp.tool()
-async def get_all_memories(ctx: Context) -> str:
-    """Get all stored memories for the user.
+@instrumented
+async def get_all_memories(
+    ctx: Context,
+    page_size: int = 50,
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    user_id: Optional[str] = None,
+    agent_id: Optional[str] = None,
+    run_id: Optional[str] = None,
+) -> str:
+    """Get stored memories for the user, one page at a time.
     
     Call this tool when you need complete context of all previously memories.
 
     Args:
         ctx: The MCP server provided context which includes the Mem0 client
+        page_size: Number of memories per page (default: 50, max: 500)
+        cursor: The next_cursor value returned by the previous call; omit it to get the first page
+        stream: Send every page to the client as a notification while reading, instead of returning a single page
+        user_id: The user the memories belong to (default: the server's default user)
+        agent_id: Optional agent id to scope the memories to a single agent
+        run_id: Optional run id to scope the memories to a single session or run
 
-    Returns a JSON formatted list of all stored memories, including when they were created
-    and their content. Results are paginated with a default of 50 items per page.
+    Returns a JSON object with a page of stored memories, including when they were created
+    and their content, and a next_cursor to pass back for the following page (null on the
+    last page). When streaming, pages are sent as log notifications and a summary is returned.
     """
     try:
-        mem0_client = ctx.request_context.lifespan_context.mem0_client
-        memories = mem0_client.get_all(user_id=DEFAULT_USER_ID)
-        if isinstance(memories, dict) and "results" in memories:
-            flattened_memories = [memory["memory"] for memory in memories["results"]]
-        else:
-            flattened_memories = memories
-        return json.dumps(flattened_memories, indent=2)
+        context = ctx.request_context.lifespan_context
+        filters = resolve_scope(user_id, agent_id, run_id)
+        if not stream:
+            memories, next_cursor = await context.executor.run(
+                "get_all_memories", list_memories_page, context.mem0_client, filters, page_size, cursor
+            )
+            return json.dumps({"results": memories, "next_cursor": next_cursor}, indent=2)
+
+        # 逐页读取并推送给客户端，服务端只持有一页数据
+        pages = total = 0
+        while True:
+            memories, cursor = await context.executor.run(
+                "get_all_memories", list_memories_page, context.mem0_client, filters, page_size, cursor
+            )
+            pages += 1
+            total += len(memories)
+            await ctx.info(json.dumps({"page": pages, "results": memories}))
+            await ctx.report_progress(total)
+            if not cursor:
+                break
+        return json.dumps({"pages": pages, "total": total}, indent=2)
     except Exception as e:
         return f"Error retrieving memories: {str(e)}"
 
 @mcp.tool()
-async def search_memories(ctx: Context, query: str, limit: int = 3) -> str:
+@instrumented
+async def search_memories(
+    ctx: Context,
+    query: str,
+    limit: int = 3,
+    user_id: Optional[str] = None,
+    agent_id: Optional[str] = None,
+    run_id: Optional[str] = None,
+) -> str:
     """Search memories using semantic search.
 
     This tool should be called to find relevant information from your memory. Results are ranked by relevance.
@@ -140,21 +498,264 @@ async def search_memories(ctx: Context, query: str, limit: int = 3) -> str:
         ctx: The MCP server provided context which includes the Mem0 client
         query: Search query string describing what you're looking for. Can be natural language.
         limit: Maximum number of results to return (default: 3)
+        user_id: The user the memories belong to (default: the server's default user)
+        agent_id: Optional agent id to scope the memories to a single agent
+        run_id: Optional run id to scope the memories to a single session or run
     """
     try:
-        mem0_client = ctx.request_context.lifespan_context.mem0_client
-        memories = mem0_client.search(query, user_id=DEFAULT_USER_ID, limit=limit)
-        if isinstance(memories, dict) and "results" in memories:
-            flattened_memories = [memory["memory"] for memory in memories["results"]]
-        else:
-            flattened_memories = memories
-        return json.dumps(flattened_memories, indent=2)
+        context = ctx.request_context.lifespan_context
+        memories = await search_memory(context, "search_memories", query, resolve_scope(user_id, agent_id, run_id), limit)
+        return json.dumps(flatten_memories(memories), indent=2)
     except Exception as e:
         return f"Error searching memories: {str(e)}"
 
+@mcp.tool()
+@instrumented
+async def search_memories_batch(
+    ctx: Context,
+    queries: list[Union[str, BatchQuery]],
+    user_id: Optional[str] = None,
+    agent_id: Optional[str] = None,
+    run_id: Optional[str] = None,
+) -> str:
+    """Search memories for several queries in one call.
+
+    Use this instead of calling search_memories repeatedly when you need to look up several
+    things at once: all queries are embedded in a single request and looked up together.
+
+    Args:
+        ctx: The MCP server provided context which includes the Mem0 client
+        queries: The searches to run (at most 32). Each item is either a query string or an object
+            with a "query" string and an optional "limit" (default: 3, max: 100)
+        user_id: The user the memories belong to (default: the server's default user)
+        agent_id: Optional agent id to scope the memories to a single agent
+        run_id: Optional run id to scope the memories to a single session or run
+
+    Returns a JSON list with one entry per query, in the same order, of the form
+    {"query": ..., "results": [...]}, where results are ranked by relevance like search_memories.
+    """
+    try:
+        if not queries:
+            return "Error: queries must not be empty"
+        if len(queries) > MAX_BATCH_QUERIES:
+            return f"Error: at most {MAX_BATCH_QUERIES} queries are allowed per call"
+        items = [BatchQuery(query=item) if isinstance(item, str) else item for item in queries]
+        texts = [item.query for item in items]
+        limits = [max(1, min(item.limit, MAX_BATCH_LIMIT)) for item in items]
+
+        context = ctx.request_context.lifespan_context
+        results = await search_memory_batch(
+            context, "search_memories_batch", texts, limits, resolve_scope(user_id, agent_id, run_id)
+        )
+        return json.dumps(
+            [{"query": text, "results": flatten_memories(memories)} for text, memories in zip(texts, results)],
+            indent=2,
+        )
+    except Exception as e:
+        return f"Error searching memories: {str(e)}"
+
+def resolve_data_path(directory: str, path: str) -> str:
+    """Resolve a path relative to a server data directory, refusing anything outside it."""
+    root = os.path.realpath(directory)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"path must be inside {directory}: {path}")
+    return resolved
+
+def resolve_import_path(path: str) -> str:
+    """Resolve an import source path, refusing anything outside MEM0_IMPORT_DIR."""
+    resolved = resolve_data_path(IMPORT_DIR, path)
+    if not os.path.isfile(resolved):
+        raise ValueError(f"no such file in the import directory: {path}")
+    return resolved
+
+@mcp.tool()
+@instrumented
+async def import_memories(
+    ctx: Context,
+    path: str,
+    format: Optional[str] = None,
+    infer: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    resume: bool = True,
+    user_id: Optional[str] = None,
+    agent_id: Optional[str] = None,
+    run_id: Optional[str] = None,
+) -> str:
+    """Import a large JSONL or CSV file of notes into memory.
+
+    Use this for backfills instead of calling save_memory once per note. The file is read
+    in batches; each batch is embedded in one request and written directly to the vector
+    store, and progress is checkpointed so an interrupted import can be resumed.
+
+    Args:
+        ctx: The MCP server provided context which includes the Mem0 client
+        path: File to import, relative to the server's import directory (MEM0_IMPORT_DIR).
+            Each record has a "text" field and optional "id", "user_id", "agent_id", "run_id",
+            "created_at" and "metadata" fields; any other fields are stored as metadata
+        format: "jsonl" or "csv" (default: detected from the file extension)
+        infer: Run every record through the full memory pipeline (fact extraction and
+            deduplication) instead of storing the text as-is; much slower
+        batch_size: Number of records per batch (default: 500)
+        resume: Continue from the last checkpoint of a previous import of this file
+        user_id: The user for records without a user_id (default: the server's default user)
+        agent_id: Optional agent id for records without an agent_id
+        run_id: Optional run id for records without a run_id
+
+    Returns a JSON report with the number of records read, imported, skipped as duplicates,
+    invalid and failed, and the time spent embedding and writing.
+    """
+    try:
+        if not IMPORT_DIR:
+            return "Error: importing is not enabled on this server (MEM0_IMPORT_DIR is not set)"
+        if format and format not in FORMATS:
+            return f"Error: format must be one of {', '.join(FORMATS)}"
+        context = ctx.request_context.lifespan_context
+        source = resolve_import_path(path)
+
+        loop = asyncio.get_running_loop()
+        importer = BulkImporter(
+            context.mem0_client,
+            batch_size=max(1, min(batch_size, 10000)),
+            infer=infer,
+            defaults=resolve_scope(user_id, agent_id, run_id),
+            progress=lambda report: asyncio.run_coroutine_threadsafe(
+                ctx.report_progress(report["skipped"] + report["read"]), loop
+            ),
+            on_write=partial(invalidate_scope, context),
+        )
+        report = await context.executor.run(
+            "import_memories", importer.run, source, format, f"{source}.checkpoint", resume
+        )
+        return json.dumps(report, indent=2)
+    except Exception as e:
+        return f"Error importing memories: {str(e)}"
+
+@mcp.tool()
+@instrumented
+async def export_memories(
+    ctx: Context,
+    path: str,
+    format: Optional[str] = None,
+    include_vectors: bool = False,
+    user_id: Optional[str] = None,
+    agent_id: Optional[str] = None,
+    run_id: Optional[str] = None,
+) -> str:
+    """Export all stored memories for the user to a file on the server.
+
+    Use this to back up or move a user's memories. Unlike get_all_memories, every field is
+    kept (id, text, hash, timestamps, scope ids and metadata) and memories are streamed to the
+    file in batches, so large users can be exported without loading them all at once.
+
+    Args:
+        ctx: The MCP server provided context which includes the Mem0 client
+        path: File to write, relative to the server's export directory (MEM0_EXPORT_DIR).
+            An existing file is replaced
+        format: "jsonl" or "parquet" (default: detected from the file extension)
+        include_vectors: Also export the embedding vector of every memory
+        user_id: The user the memories belong to (default: the server's default user)
+        agent_id: Optional agent id to export only the memories of a single agent
+        run_id: Optional run id to export only the memories of a single session or run
+
+    Returns a JSON report with the number of memories exported, the file size and the time taken.
+    JSONL exports can be imported again with import_memories.
+    """
+    try:
+        if not EXPORT_DIR:
+            return "Error: exporting is not enabled on this server (MEM0_EXPORT_DIR is not set)"
+        if format and format not in EXPORT_FORMATS:
+            return f"Error: format must be one of {', '.join(EXPORT_FORMATS)}"
+        target = resolve_data_path(EXPORT_DIR, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+
+        context = ctx.request_context.lifespan_context
+        loop = asyncio.get_running_loop()
+        report = await context.executor.run(
+            "export_memories", export_memories_to_file, context.mem0_client, target,
+            resolve_scope(user_id, agent_id, run_id), format, include_vectors,
+            progress=lambda report: asyncio.run_coroutine_threadsafe(ctx.report_progress(report["exported"]), loop),
+        )
+        return json.dumps(report, indent=2)
+    except Exception as e:
+        return f"Error exporting memories: {str(e)}"
+
+@mcp.tool()
+@instrumented
+async def get_ingestion_status(ctx: Context, ticket_id: str) -> str:
+    """Check the status of a memory queued by save_memory.
+
+    When the server runs in asynchronous ingestion mode, save_memory returns a ticket id
+    immediately and the memory is processed in the background. Use this tool to find out
+    whether it has been stored yet.
+
+    Args:
+        ctx: The MCP server provided context which includes the Mem0 client
+        ticket_id: The ticket id returned by save_memory
+
+    Returns a JSON object with the ticket status (pending, processing, done or failed),
+    the number of attempts and the last error, if any.
+    """
+    try:
+        ingestion = ctx.request_context.lifespan_context.ingestion
+        if not ingestion:
+            return "Error: asynchronous ingestion is not enabled on this server"
+        job = await ingestion.status(ticket_id)
+        if job is None:
+            return f"Error: unknown ticket id {ticket_id}"
+        return json.dumps(job, indent=2, default=str)
+    except Exception as e:
+        return f"Error retrieving ingestion status: {str(e)}"
+
+async def metrics_endpoint(request):
+    """Serve the process metrics in the Prometheus text format."""
+    from starlette.responses import Response
+    return Response(get_registry().render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+def build_sse_app():
+    """Build the Starlette app for the SSE transport with the metrics route mounted next to it."""
+    from starlette.routing import Route
+
+    if hasattr(mcp, "sse_app"):
+        app = mcp.sse_app()
+    else:
+        # Same routes FastMCP.run_sse_async serves
+        from mcp.server.sse import SseServerTransport
+        from starlette.applications import Starlette
+        from starlette.routing import Mount
+
+        sse = SseServerTransport("/messages/")
+
+        async def handle_sse(request):
+            async with sse.connect_sse(request.scope, request.receive, request._send) as streams:
+                await mcp._mcp_server.run(streams[0], streams[1], mcp._mcp_server.create_initialization_options())
+
+        app = Starlette(
+            debug=mcp.settings.debug,
+            routes=[Route("/sse", endpoint=handle_sse), Mount("/messages/", app=sse.handle_post_message)],
+        )
+
+    app.router.routes.append(Route(METRICS_PATH, endpoint=metrics_endpoint))
+    return app
+
+async def run_sse_with_metrics():
+    """Run the SSE transport and the metrics endpoint on the configured HOST/PORT."""
+    import uvicorn
+
+    config = uvicorn.Config(
+        build_sse_app(),
+        host=mcp.settings.host,
+        port=mcp.settings.port,
+        log_level=mcp.settings.log_level.lower(),
+    )
+    await uvicorn.Server(config).serve()
+
 async def main():
     try:
         print("Starting MCP-Mem0 server...")
+        # 追踪需在创建数据库引擎和HTTP客户端之前初始化
+        if tracing.init_tracing():
+            print(f"Tracing enabled: {os.getenv('TRACING_EXPORTER')}")
         transport = os.getenv("TRANSPORT", "sse")
         host = os.getenv("HOST", "0.0.0.0")
         port = os.getenv("PORT", "8050")
@@ -174,8 +775,13 @@ async def main():
         
         if transport == 'sse':
             print(f"Server will be available at: http://{host}:{port}")
-            # Run the MCP server with sse transport
-            await mcp.run_sse_async()
+            if METRICS_ENABLED:
+                # Run the MCP server with sse transport and the metrics endpoint
+                print(f"Metrics available at: http://{host}:{port}{METRICS_PATH}")
+                await run_sse_with_metrics()
+            else:
+                # Run the MCP server with sse transport
+                await mcp.run_sse_async()
         else:
             print("Running with stdio transport")
             # Run the MCP server with stdio transport
@@ -186,6 +792,10 @@ async def main():
         import traceback
         print(f"Traceback: {traceback.format_exc()}")
         raise
+    finally:
+        # 所有会话共享的客户端、执行器和写入队列只在进程退出时关闭
+        await close_server_context()
+        tracing.shutdown_tracing()
 
 if __name__ == "__main__":
     try:
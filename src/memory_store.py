@@ -0,0 +1,441 @@
+"""记忆存储直连模块
+
+绕过 mem0 的 get_all（一次性物化所有记忆），直接在 supabase 向量存储背后的
+vecs 表上执行查询：按 (created_at, id) 做键集分页，过滤条件下推到SQL。
+进程内向量存储（numpy_vector_store）提供同样顺序的 list_page，分页结果格式一致。
+"""
+
+import io
+import re
+import csv
+import json
+import base64
+import hashlib
+import logging
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# vecs 把集合存放在 vecs schema 下
+VECS_SCHEMA = "vecs"
+
+# 单页最大条数
+MAX_PAGE_SIZE = 500
+
+# 流式导出时每次从服务端游标读取的行数
+STREAM_BATCH_SIZE = 1000
+
+# mem0 写入 payload 的保留字段，其余字段视为用户元数据
+PAYLOAD_KEYS = ("data", "hash", "created_at", "updated_at", "user_id", "agent_id", "run_id")
+
+# vecs 距离度量（IndexMeasure 取值）对应的 pgvector 运算符
+DISTANCE_OPERATORS = {
+    "cosine_distance": "<=>",
+    "l2_distance": "<->",
+    "max_inner_product": "<#>",
+}
+
+# 与 mem0 写入 created_at 时使用的时区一致，保证分页排序正确
+MEM0_TIMEZONE = "US/Pacific"
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+def get_engine(memory_client: Any) -> Any:
+    """获取 mem0 客户端向量存储使用的 SQLAlchemy 引擎
+
+    Args:
+        memory_client: Memory 实例
+
+    Returns:
+        Engine: vecs 客户端的 SQLAlchemy 引擎
+    """
+    engine = getattr(getattr(memory_client.vector_store, "db", None), "engine", None)
+    if engine is None:
+        raise ValueError("Direct memory queries require the supabase (pgvector) vector store")
+    return engine
+
+
+def has_sql_store(memory_client: Any) -> bool:
+    """向量存储是否为可以直接执行SQL的 supabase（pgvector）存储"""
+    return getattr(getattr(memory_client.vector_store, "db", None), "engine", None) is not None
+
+
+def table_name(memory_client: Any) -> str:
+    """获取集合对应的带schema的表名（已加引号）"""
+    collection_name = memory_client.vector_store.collection_name
+    if not _IDENTIFIER.fullmatch(collection_name):
+        raise ValueError(f"Unsupported collection name: {collection_name!r}")
+    return f'{VECS_SCHEMA}."{collection_name}"'
+
+
+def filter_clause(filters: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """把等值过滤条件转换为SQL条件和绑定参数
+
+    使用 metadata->>'key' = :value 的形式，以便命中表达式索引。
+
+    Args:
+        filters: 过滤条件，如 {"user_id": "u1"}
+
+    Returns:
+        Tuple[str, Dict[str, Any]]: SQL条件（无条件时为 TRUE）和绑定参数
+    """
+    clauses, params = [], {}
+    for index, (key, value) in enumerate(sorted(filters.items())):
+        if value is None:
+            continue
+        if not _IDENTIFIER.fullmatch(key):
+            raise ValueError(f"Unsupported filter key: {key!r}")
+        clauses.append(f"metadata->>'{key}' = :filter_{index}")
+        params[f"filter_{index}"] = str(value)
+    return (" AND ".join(clauses) or "TRUE"), params
+
+
+def vector_literal(vector: List[float]) -> str:
+    """把向量格式化为 pgvector 的文本表示"""
+    return "[" + ",".join(str(float(value)) for value in vector) + "]"
+
+
+def encode_cursor(created_at: str, memory_id: str) -> str:
+    """把分页位置编码为不透明游标"""
+    raw = json.dumps([created_at, memory_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """解码不透明游标
+
+    Args:
+        cursor: encode_cursor 生成的游标
+
+    Returns:
+        Tuple[str, str]: (created_at, id)
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, memory_id = json.loads(raw)
+        return str(created_at), str(memory_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def format_memory(memory_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """把 vecs 行转换为与 mem0 get_all 一致的记忆结构"""
+    memory = {
+        "id": str(memory_id),
+        "memory": payload.get("data"),
+        "hash": payload.get("hash"),
+        "created_at": payload.get("created_at"),
+        "updated_at": payload.get("updated_at"),
+    }
+    for key in ("user_id", "agent_id", "run_id"):
+        if payload.get(key) is not None:
+            memory[key] = payload[key]
+    extra = {key: value for key, value in payload.items() if key not in PAYLOAD_KEYS}
+    if extra:
+        memory["metadata"] = extra
+    return memory
+
+
+def build_payload(
+    text: str,
+    scope: Dict[str, Any],
+    metadata: Optional[Dict[str, Any]] = None,
+    created_at: Optional[str] = None,
+) -> Dict[str, Any]:
+    """构建与 mem0 写入格式一致的 payload（format_memory 的逆过程）
+
+    Args:
+        text: 记忆文本
+        scope: user_id/agent_id/run_id
+        metadata: 用户元数据
+        created_at: 创建时间，默认为当前时间
+
+    Returns:
+        Dict[str, Any]: payload
+    """
+    payload = dict(metadata or {})
+    payload.update({key: str(value) for key, value in scope.items() if value})
+    payload["data"] = text
+    payload["hash"] = hashlib.md5(text.encode()).hexdigest()
+    payload["created_at"] = created_at or datetime.now(ZoneInfo(MEM0_TIMEZONE)).isoformat()
+    return payload
+
+
+def list_memories_page(
+    memory_client: Any,
+    filters: Dict[str, Any],
+    page_size: int = 50,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """按 (created_at, id) 键集分页读取记忆
+
+    created_at 按 mem0 写入的ISO字符串排序，保证稳定且不重复的全序。
+
+    Args:
+        memory_client: Memory 实例
+        filters: 作用域过滤条件
+        page_size: 每页条数（最大 MAX_PAGE_SIZE）
+        cursor: 上一页返回的游标，为None时从头开始
+
+    Returns:
+        Tuple[List[Dict[str, Any]], Optional[str]]: 本页记忆和下一页游标（没有下一页时为None）
+    """
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+    after = decode_cursor(cursor) if cursor else None
+    list_page = getattr(memory_client.vector_store, "list_page", None)
+    if list_page is not None:
+        rows = list_page(filters, page_size + 1, after)
+    else:
+        rows = _select_page(memory_client, filters, page_size + 1, after)
+
+    memories = [format_memory(row[0], row[1] or {}) for row in rows[:page_size]]
+    next_cursor = None
+    if len(rows) > page_size:
+        last = rows[page_size - 1]
+        next_cursor = encode_cursor((last[1] or {}).get("created_at") or "", str(last[0]))
+    return memories, next_cursor
+
+
+def _select_page(
+    memory_client: Any,
+    filters: Dict[str, Any],
+    limit: int,
+    after: Optional[Tuple[str, str]],
+) -> List[Any]:
+    """在 vecs 表上执行键集分页查询，返回 (id, metadata) 行"""
+    where, params = filter_clause(filters)
+    if after:
+        where += " AND (coalesce(metadata->>'created_at', ''), id) > (:cursor_created_at, :cursor_id)"
+        params.update(cursor_created_at=after[0], cursor_id=after[1])
+    params["limit"] = limit
+
+    sql = text(
+        f"SELECT id, metadata FROM {table_name(memory_client)} WHERE {where} "
+        f"ORDER BY coalesce(metadata->>'created_at', ''), id LIMIT :limit"
+    )
+    with get_engine(memory_client).connect() as conn:
+        return conn.execute(sql, params).fetchall()
+
+
+def select_vectors(memory_client: Any, filters: Dict[str, Any], limit: int) -> List[Any]:
+    """读取作用域内记忆的向量和payload
+
+    Args:
+        memory_client: Memory 实例
+        filters: 作用域过滤条件
+        limit: 最多读取的行数
+
+    Returns:
+        List[Any]: (id, 向量(list[float]), metadata) 行
+    """
+    where, params = filter_clause(filters)
+    params["limit"] = limit
+    sql = text(f"SELECT id, vec::real[], metadata FROM {table_name(memory_client)} WHERE {where} LIMIT :limit")
+    with get_engine(memory_client).connect() as conn:
+        return conn.execute(sql, params).fetchall()
+
+
+def stream_memories(
+    memory_client: Any,
+    filters: Dict[str, Any],
+    include_vectors: bool = False,
+    batch_size: int = STREAM_BATCH_SIZE,
+) -> Iterator[List[Tuple[str, Optional[List[float]], Dict[str, Any]]]]:
+    """按 (created_at, id) 顺序分批读取作用域内的全部记忆
+
+    pgvector 存储使用服务端游标（stream_results），客户端最多缓冲一个批次；
+    进程内存储按键集分页读取。
+
+    Args:
+        memory_client: Memory 实例
+        filters: 作用域过滤条件（为空时读取整个集合）
+        include_vectors: 是否读取向量
+        batch_size: 每批行数
+
+    Yields:
+        List[Tuple[str, Optional[List[float]], Dict[str, Any]]]: (id, 向量或None, metadata) 行
+    """
+    store = memory_client.vector_store
+    if getattr(store, "list_page", None) is not None:
+        after = None
+        while True:
+            rows = store.list_page(filters, batch_size, after)
+            if not rows:
+                return
+            vectors = store.get_vectors([row[0] for row in rows]) if include_vectors else [None] * len(rows)
+            yield [(memory_id, vector, payload) for (memory_id, payload), vector in zip(rows, vectors)]
+            after = (rows[-1][1].get("created_at") or "", rows[-1][0])
+
+    where, params = filter_clause(filters)
+    columns = "id, vec::real[], metadata" if include_vectors else "id, NULL, metadata"
+    sql = text(
+        f"SELECT {columns} FROM {table_name(memory_client)} WHERE {where} "
+        f"ORDER BY coalesce(metadata->>'created_at', ''), id"
+    )
+    with get_engine(memory_client).connect() as conn:
+        result = conn.execution_options(stream_results=True, max_row_buffer=batch_size).execute(sql, params)
+        for rows in result.partitions(batch_size):
+            yield [
+                (str(memory_id), None if vector is None else list(vector), metadata or {})
+                for memory_id, vector, metadata in rows
+            ]
+
+
+def search_vectors(
+    memory_client: Any,
+    vectors: List[List[float]],
+    limits: List[int],
+    filters: Dict[str, Any],
+    measure: Optional[str] = None,
+) -> List[List[Tuple[str, float, Dict[str, Any]]]]:
+    """在一条SQL中执行多个向量的 top-k 查询
+
+    每个查询向量通过 LATERAL 子查询独立排序和截断，仍可使用 HNSW/IVFFlat 索引。
+
+    Args:
+        memory_client: Memory 实例
+        vectors: 查询向量
+        limits: 每个查询的结果数上限
+        filters: 作用域过滤条件
+        measure: 集合的距离度量，默认余弦距离
+
+    Returns:
+        List[List[Tuple[str, float, Dict[str, Any]]]]: 与输入顺序一致的 (id, 距离, metadata) 列表
+    """
+    operator = DISTANCE_OPERATORS.get(measure or "cosine_distance")
+    if operator is None:
+        raise ValueError(f"Unsupported index measure: {measure!r}")
+    where, params = filter_clause(filters)
+    params.update(
+        query_idx=list(range(len(vectors))),
+        query_vecs=[vector_literal(vector) for vector in vectors],
+        query_limits=[int(limit) for limit in limits],
+    )
+
+    sql = text(
+        "WITH queries AS ("
+        " SELECT * FROM unnest(CAST(:query_idx AS int[]), CAST(:query_vecs AS text[]), CAST(:query_limits AS int[]))"
+        " AS q(idx, vec, lim)"
+        ") "
+        "SELECT queries.idx, hits.id, hits.distance, hits.metadata FROM queries CROSS JOIN LATERAL ("
+        f" SELECT id, metadata, vec {operator} CAST(queries.vec AS vector) AS distance"
+        f" FROM {table_name(memory_client)} WHERE {where}"
+        f" ORDER BY vec {operator} CAST(queries.vec AS vector) LIMIT queries.lim"
+        ") AS hits ORDER BY queries.idx, hits.distance"
+    )
+    with get_engine(memory_client).connect() as conn:
+        rows = conn.execute(sql, params).fetchall()
+
+    results: List[List[Tuple[str, float, Dict[str, Any]]]] = [[] for _ in vectors]
+    for idx, memory_id, distance, metadata in rows:
+        results[idx].append((str(memory_id), float(distance), metadata or {}))
+    return results
+
+
+def insert_memories(memory_client: Any, rows: List[Tuple[str, List[float], Dict[str, Any]]], method: str = "copy") -> int:
+    """批量写入记忆，ID已存在的行跳过
+
+    - copy: COPY 到会话临时表，再 INSERT ... SELECT ... ON CONFLICT DO NOTHING
+    - insert: 单条多行 INSERT ... VALUES ... ON CONFLICT DO NOTHING
+
+    Args:
+        memory_client: Memory 实例
+        rows: (id, 向量, payload) 列表
+        method: 写入方式（copy / insert）
+
+    Returns:
+        int: 实际写入的行数
+    """
+    if not rows:
+        return 0
+    table = table_name(memory_client)
+    columns = "(id, vec, metadata)"
+    with get_engine(memory_client).begin() as conn:
+        if method == "copy":
+            stage = f'"{memory_client.vector_store.collection_name}_import_stage"'
+            conn.execute(text(f"CREATE TEMP TABLE IF NOT EXISTS {stage} (LIKE {table}) ON COMMIT DELETE ROWS"))
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for memory_id, vector, payload in rows:
+                writer.writerow([memory_id, vector_literal(vector), json.dumps(payload)])
+            buffer.seek(0)
+            cursor = conn.connection.cursor()
+            try:
+                cursor.copy_expert(f"COPY {stage} {columns} FROM STDIN WITH (FORMAT csv)", buffer)
+            finally:
+                cursor.close()
+            sql = text(f"INSERT INTO {table} {columns} SELECT id, vec, metadata FROM {stage} ON CONFLICT (id) DO NOTHING")
+            return conn.execute(sql).rowcount
+
+        if method == "insert":
+            values, params = [], {}
+            for index, (memory_id, vector, payload) in enumerate(rows):
+                values.append(f"(:id_{index}, CAST(:vec_{index} AS vector), CAST(:metadata_{index} AS jsonb))")
+                params[f"id_{index}"] = memory_id
+                params[f"vec_{index}"] = vector_literal(vector)
+                params[f"metadata_{index}"] = json.dumps(payload)
+            sql = text(f"INSERT INTO {table} {columns} VALUES {', '.join(values)} ON CONFLICT (id) DO NOTHING")
+            return conn.execute(sql, params).rowcount
+
+    raise ValueError(f"Unsupported write method: {method!r} (expected copy or insert)")
+
+
+def ensure_filter_indexes(memory_client: Any) -> List[str]:
+    """并发创建租户过滤和分页使用的索引（CREATE INDEX CONCURRENTLY，不阻塞读写）
+
+    - GIN (metadata jsonb_path_ops): 服务 vecs 在向量搜索中生成的 metadata @> 过滤条件
+    - (user_id|agent_id|run_id, created_at, id) 表达式索引: 服务按作用域的键集分页
+
+    并发构建失败或被中断会留下 INVALID 索引，IF NOT EXISTS 会把它当作已存在而跳过，
+    因此构建前先删除同名的无效索引，构建失败时也立即删除。
+
+    Args:
+        memory_client: Memory 实例
+
+    Returns:
+        List[str]: 已就绪的索引名
+    """
+    collection_name = memory_client.vector_store.collection_name
+    table = table_name(memory_client)
+    definitions = {f"ix_{collection_name}_metadata": "USING gin (metadata jsonb_path_ops)"}
+    for key in ("user_id", "agent_id", "run_id"):
+        definitions[f"ix_{collection_name}_{key}_created"] = (
+            f"((metadata->>'{key}'), (coalesce(metadata->>'created_at', '')), id)"
+        )
+
+    engine = get_engine(memory_client)
+    invalid = set(invalid_indexes(engine, collection_name))
+    ready = []
+    with engine.execution_options(isolation_level="AUTOCOMMIT").connect() as conn:
+        for name, definition in definitions.items():
+            if name in invalid:
+                logger.warning(f"删除上次构建失败的无效索引: {name}")
+                conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {VECS_SCHEMA}."{name}"'))
+            try:
+                conn.execute(text(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON {table} {definition}'))
+            except Exception as e:
+                logger.error(f"创建索引失败: {name}: {e}")
+                conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {VECS_SCHEMA}."{name}"'))
+                continue
+            ready.append(name)
+    logger.info(f"过滤和分页索引已就绪: {collection_name} ({len(ready)}/{len(definitions)})")
+    return ready
+
+
+def invalid_indexes(engine: Any, collection_name: str) -> List[str]:
+    """列出集合表上构建失败（indisvalid = false）的索引名"""
+    sql = text("""
+        SELECT i.relname
+        FROM pg_index ix
+        JOIN pg_class i ON i.oid = ix.indexrelid
+        JOIN pg_class t ON t.oid = ix.indrelid
+        JOIN pg_namespace n ON n.oid = t.relnamespace
+        WHERE n.nspname = :schema AND t.relname = :table AND NOT ix.indisvalid
+    """)
+    with engine.connect() as conn:
+        return [row[0] for row in conn.execute(sql, {"schema": VECS_SCHEMA, "table": collection_name}).fetchall()]
@@ -0,0 +1,438 @@
+"""进程内向量存储
+
+VECTOR_STORE_PROVIDER=memory 时替代 supabase（pgvector）向量存储，适合小规模部署和CI：
+- 向量按行存放在 float32 矩阵中（写入时归一化），搜索为精确的余弦 top-k，不经过网络
+- 设置 VECTOR_STORE_PATH 时矩阵以 numpy.memmap 映射到磁盘，进程重启后仍然有效；未设置时只保存在内存中。
+  记忆ID和payload保存为JSON快照加追加日志：每次写入只向日志追加被修改的行，
+  日志条数超过记忆条数（至少 COMPACT_MIN_ENTRIES）时压缩为新快照，写入的均摊开销与集合大小无关
+- 过滤条件为payload字段的等值匹配，与 supabase 存储的 metadata @> 语义一致
+- score 与 vecs 一致，为余弦距离（越小越相似）
+
+同一进程内只应有一个实例写同一个 VECTOR_STORE_PATH 下的集合。
+"""
+
+import os
+import json
+import threading
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+from mem0.configs.base import MemoryConfig
+from mem0.utils.factory import VectorStoreFactory
+from mem0.vector_stores.base import VectorStoreBase
+from mem0.vector_stores.configs import VectorStoreConfig
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+MEMORY_PROVIDER = "memory"
+
+# 新建矩阵的初始行数，之后按倍数扩容
+INITIAL_CAPACITY = 64
+
+# 追加日志至少积累这么多条才压缩为快照
+COMPACT_MIN_ENTRIES = 1024
+
+
+class OutputData(BaseModel):
+    id: Optional[str]
+    score: Optional[float]
+    payload: Optional[Dict]
+
+
+class NumpyVectorStoreConfig(BaseModel):
+    collection_name: str = "mem0_memories"
+    embedding_model_dims: int = 1536
+    path: Optional[str] = None
+
+
+class NumpyVectorStore(VectorStoreBase):
+    """基于 NumPy 矩阵的精确余弦向量存储，实现 mem0 的 VectorStoreBase 接口"""
+
+    def __init__(self, collection_name: str = "mem0_memories", embedding_model_dims: int = 1536, path: Optional[str] = None):
+        """初始化存储
+
+        Args:
+            collection_name: 集合名，也是磁盘文件名
+            embedding_model_dims: 向量维度
+            path: memmap 文件目录，为None时只保存在内存中
+        """
+        self.collection_name = collection_name
+        self.embedding_model_dims = embedding_model_dims
+        self.path = path
+
+        self._lock = threading.RLock()
+        self._ids: List[str] = []
+        self._payloads: List[Dict[str, Any]] = []
+        self._rows: Dict[str, int] = {}
+        self._matrix: Any = None
+        self._log: Any = None
+        self._log_entries = 0
+        self.create_col(collection_name, embedding_model_dims)
+
+    # -- 存储文件 --
+
+    def _file(self, suffix: str) -> str:
+        return os.path.join(self.path, f"{self.collection_name}.{suffix}")
+
+    def _open_matrix(self, capacity: int) -> Any:
+        """按容量打开（或扩容）memmap 文件"""
+        vectors_file = self._file("vectors")
+        with open(vectors_file, "r+b" if os.path.exists(vectors_file) else "w+b") as f:
+            f.truncate(capacity * self.embedding_model_dims * 4)
+        return np.memmap(vectors_file, dtype=np.float32, mode="r+", shape=(capacity, self.embedding_model_dims))
+
+    def _load(self) -> None:
+        """从磁盘加载已有集合：读取快照并重放追加日志，然后压缩"""
+        with open(self._file("json"), encoding="utf-8") as f:
+            state = json.load(f)
+        if state["dims"] != self.embedding_model_dims:
+            raise ValueError(
+                f"Collection {self.collection_name!r} has {state['dims']} dims, "
+                f"but the embedder produces {self.embedding_model_dims}"
+            )
+        self._ids = state["ids"]
+        self._payloads = state["payloads"]
+        replayed = self._replay()
+        self._rows = {memory_id: row for row, memory_id in enumerate(self._ids)}
+        rows = os.path.getsize(self._file("vectors")) // (self.embedding_model_dims * 4)
+        self._matrix = self._open_matrix(max(rows, len(self._ids), INITIAL_CAPACITY))
+        if replayed:
+            logger.info(f"重放 {replayed} 条追加日志: {self.collection_name}")
+        self._compact()
+
+    def _replay(self) -> int:
+        """把追加日志应用到快照上，返回重放的条数
+
+        每条记录带有写入后的总行数 count，有 row 时把该行设为给定的ID和payload。
+        记录都是绝对赋值，压缩时快照已替换但日志尚未清空的情况下重放也得到相同结果。
+        """
+        if not os.path.exists(self._file("log")):
+            return 0
+        replayed = 0
+        with open(self._file("log"), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 进程在写日志时退出，最后一条记录不完整
+                    logger.warning(f"忽略不完整的追加日志记录: {self.collection_name}")
+                    break
+                count = entry["count"]
+                del self._ids[count:], self._payloads[count:]
+                while len(self._ids) < count:
+                    self._ids.append("")
+                    self._payloads.append({})
+                if "row" in entry:
+                    self._ids[entry["row"]] = entry["id"]
+                    self._payloads[entry["row"]] = entry["payload"]
+                replayed += 1
+        return replayed
+
+    def _compact(self) -> None:
+        """把矩阵刷到磁盘，原子地写入ID和payload快照并清空追加日志"""
+        if not self.path:
+            return
+        self._matrix.flush()
+        state = {"dims": self.embedding_model_dims, "ids": self._ids, "payloads": self._payloads}
+        tmp_file = self._file("json.tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_file, self._file("json"))
+        if self._log is not None:
+            self._log.close()
+        self._log = open(self._file("log"), "w", encoding="utf-8")
+        self._log_entries = 0
+
+    def _persist(self, rows: List[int]) -> None:
+        """把矩阵刷到磁盘，并把被修改的行（及写入后的总行数）追加到日志"""
+        if not self.path:
+            return
+        if self._log is None:
+            # close() 之后继续写入
+            self._log = open(self._file("log"), "a", encoding="utf-8")
+        self._matrix.flush()
+        count = len(self._ids)
+        entries = [{"row": row, "id": self._ids[row], "payload": self._payloads[row], "count": count} for row in rows]
+        self._log.write("".join(json.dumps(entry) + "\n" for entry in entries or [{"count": count}]))
+        self._log.flush()
+        self._log_entries += max(len(entries), 1)
+        if self._log_entries > max(COMPACT_MIN_ENTRIES, count):
+            self._compact()
+
+    def close(self) -> None:
+        """压缩追加日志并关闭日志文件"""
+        with self._lock:
+            if self._log is None:
+                return
+            self._compact()
+            self._log.close()
+            self._log = None
+
+    def _reserve(self, count: int) -> None:
+        """确保矩阵至少还能容纳 count 行"""
+        needed = len(self._ids) + count
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2)
+        if self.path:
+            self._matrix.flush()
+            self._matrix = self._open_matrix(capacity)
+        else:
+            matrix = np.zeros((capacity, self.embedding_model_dims), dtype=np.float32)
+            matrix[:len(self._ids)] = self._matrix[:len(self._ids)]
+            self._matrix = matrix
+
+    # -- 查询辅助 --
+
+    def _normalize(self, vector: Any) -> Any:
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if vector.shape[0] != self.embedding_model_dims:
+            raise ValueError(f"Expected a {self.embedding_model_dims}-dim vector, got {vector.shape[0]}")
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _normalize_rows(self, vectors: Any) -> Any:
+        """把一批向量转换为按行归一化的 float32 矩阵"""
+        matrix = np.array(vectors, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[1] != self.embedding_model_dims:
+            raise ValueError(f"Expected {self.embedding_model_dims}-dim vectors, got shape {matrix.shape}")
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def _matching_rows(self, filters: Optional[Dict[str, Any]]) -> List[int]:
+        """返回payload满足全部等值过滤条件的行号"""
+        conditions = [(key, value) for key, value in (filters or {}).items() if value is not None]
+        if not conditions:
+            return list(range(len(self._ids)))
+        return [
+            row for row, payload in enumerate(self._payloads)
+            if all(payload.get(key) == value for key, value in conditions)
+        ]
+
+    def _output(self, row: int, score: Optional[float] = None) -> OutputData:
+        return OutputData(id=self._ids[row], score=score, payload=dict(self._payloads[row]))
+
+    # -- VectorStoreBase --
+
+    def create_col(self, name: str, vector_size: int, distance: str = "cosine") -> None:
+        """创建（或从磁盘打开）集合"""
+        with self._lock:
+            self.collection_name = name
+            self.embedding_model_dims = vector_size
+            self._ids, self._payloads, self._rows = [], [], {}
+            if self.path:
+                os.makedirs(self.path, exist_ok=True)
+                if os.path.exists(self._file("json")):
+                    self._load()
+                    logger.info(f"已加载进程内向量集合 {name}: {len(self._ids)} 条，文件: {self._file('vectors')}")
+                    return
+                self._matrix = self._open_matrix(INITIAL_CAPACITY)
+                self._compact()
+            else:
+                self._matrix = np.zeros((INITIAL_CAPACITY, vector_size), dtype=np.float32)
+
+    def insert(self, vectors: List[List[float]], payloads: Optional[List[Dict]] = None, ids: Optional[List[str]] = None) -> None:
+        """写入向量，已存在的ID会被覆盖"""
+        payloads = payloads or [{} for _ in vectors]
+        ids = ids or [str(len(self._ids) + index) for index in range(len(vectors))]
+        normalized = self._normalize_rows(vectors) if len(vectors) else []
+        with self._lock:
+            self._reserve(len(normalized))
+            written = []
+            for memory_id, vector, payload in zip(ids, normalized, payloads):
+                row = self._rows.get(str(memory_id))
+                if row is None:
+                    row = len(self._ids)
+                    self._ids.append(str(memory_id))
+                    self._payloads.append({})
+                    self._rows[str(memory_id)] = row
+                self._matrix[row] = vector
+                self._payloads[row] = dict(payload or {})
+                written.append(row)
+            self._persist(written)
+
+    def search(
+        self,
+        query: Any,
+        vectors: Optional[List[float]] = None,
+        limit: int = 5,
+        filters: Optional[Dict] = None,
+    ) -> List[OutputData]:
+        """精确余弦 top-k 搜索
+
+        Args:
+            query: 查询文本（旧版 mem0 直接传入查询向量）
+            vectors: 查询向量
+            limit: 返回条数
+            filters: payload 等值过滤条件
+
+        Returns:
+            List[OutputData]: 按余弦距离升序排列的结果
+        """
+        return self.search_many([query if vectors is None else vectors], [limit], filters)[0]
+
+    def search_many(
+        self,
+        vectors: List[List[float]],
+        limits: List[int],
+        filters: Optional[Dict] = None,
+    ) -> List[List[OutputData]]:
+        """多个查询向量的精确余弦 top-k，一次矩阵乘法计算全部相似度
+
+        Args:
+            vectors: 查询向量
+            limits: 每个查询的返回条数
+            filters: payload 等值过滤条件（所有查询共用）
+
+        Returns:
+            List[List[OutputData]]: 与输入顺序一致、按余弦距离升序排列的结果
+        """
+        queries = self._normalize_rows(vectors)
+        with self._lock:
+            rows = self._matching_rows(filters)
+            if not rows:
+                return [[] for _ in limits]
+            # 没有过滤掉任何行时直接使用矩阵切片，避免复制
+            candidates = self._matrix[:len(rows)] if len(rows) == len(self._ids) else self._matrix[rows]
+            similarities = queries @ candidates.T
+            results = []
+            for scores, limit in zip(similarities, limits):
+                k = min(int(limit), len(rows))
+                if k <= 0:
+                    results.append([])
+                    continue
+                top = np.argpartition(-scores, k - 1)[:k]
+                top = top[np.argsort(-scores[top], kind="stable")]
+                results.append([self._output(rows[index], float(1.0 - scores[index])) for index in top])
+            return results
+
+    def delete(self, vector_id: str) -> None:
+        """删除向量：把最后一行移动到被删除的位置"""
+        with self._lock:
+            row = self._rows.pop(str(vector_id), None)
+            if row is None:
+                return
+            last = len(self._ids) - 1
+            if row != last:
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = self._ids[last]
+                self._payloads[row] = self._payloads[last]
+                self._rows[self._ids[row]] = row
+            self._matrix[last] = 0
+            self._ids.pop()
+            self._payloads.pop()
+            self._persist([row] if row != last else [])
+
+    def update(self, vector_id: str, vector: Optional[List[float]] = None, payload: Optional[Dict] = None) -> None:
+        """更新向量和/或payload"""
+        normalized = self._normalize(vector) if vector is not None else None
+        with self._lock:
+            row = self._rows.get(str(vector_id))
+            if row is None:
+                raise ValueError(f"Vector {vector_id!r} not found")
+            if normalized is not None:
+                self._matrix[row] = normalized
+            if payload is not None:
+                self._payloads[row] = dict(payload)
+            self._persist([row])
+
+    def get(self, vector_id: str) -> Optional[OutputData]:
+        """按ID获取向量的payload"""
+        with self._lock:
+            row = self._rows.get(str(vector_id))
+            return None if row is None else self._output(row)
+
+    def get_vectors(self, vector_ids: List[str]) -> List[Optional[List[float]]]:
+        """按ID获取（归一化后的）向量，不存在的ID为None"""
+        with self._lock:
+            rows = [self._rows.get(str(vector_id)) for vector_id in vector_ids]
+            return [None if row is None else self._matrix[row].tolist() for row in rows]
+
+    def list_cols(self) -> List[str]:
+        return [self.collection_name]
+
+    def delete_col(self) -> None:
+        """删除集合及其磁盘文件"""
+        with self._lock:
+            self._ids, self._payloads, self._rows = [], [], {}
+            self._matrix = np.zeros((INITIAL_CAPACITY, self.embedding_model_dims), dtype=np.float32)
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            if self.path:
+                for suffix in ("vectors", "json", "log"):
+                    if os.path.exists(self._file(suffix)):
+                        os.remove(self._file(suffix))
+
+    def col_info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"name": self.collection_name, "count": len(self._ids), "dimension": self.embedding_model_dims}
+
+    def list(self, filters: Optional[Dict] = None, limit: Optional[int] = None) -> List[List[OutputData]]:
+        """列出满足过滤条件的记忆（与 supabase 存储一样包在一层列表中返回）"""
+        with self._lock:
+            rows = self._matching_rows(filters)
+            if limit is not None:
+                rows = rows[:limit]
+            return [[self._output(row) for row in rows]]
+
+    def reset(self) -> None:
+        """清空并重新创建集合"""
+        self.delete_col()
+        self.create_col(self.collection_name, self.embedding_model_dims)
+
+    # -- 供 memory_store 分页使用 --
+
+    def list_page(
+        self,
+        filters: Dict[str, Any],
+        limit: int,
+        after: Optional[Tuple[str, str]] = None,
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """按 (created_at, id) 排序的键集分页，与 memory_store 的SQL分页顺序一致
+
+        Args:
+            filters: 作用域过滤条件
+            limit: 最多返回的行数
+            after: 上一页最后一条的 (created_at, id)
+
+        Returns:
+            List[Tuple[str, Dict[str, Any]]]: (id, payload) 列表
+        """
+        with self._lock:
+            keyed = [
+                ((self._payloads[row].get("created_at") or "", self._ids[row]), row)
+                for row in self._matching_rows(filters)
+            ]
+            if after is not None:
+                keyed = [item for item in keyed if item[0] > after]
+            keyed.sort()
+            return [(self._ids[row], dict(self._payloads[row])) for _, row in keyed[:limit]]
+
+
+def build_memory_config(config: Dict[str, Any]) -> MemoryConfig:
+    """根据 build_mem0_config 的配置字典构建使用进程内向量存储的 MemoryConfig
+
+    mem0 只接受内置的向量存储提供商，这里注册工厂并跳过 VectorStoreConfig 的提供商校验。
+
+    Args:
+        config: 向量存储提供商为 memory 的配置字典
+
+    Returns:
+        MemoryConfig: 可直接传给 Memory(...) 的配置
+    """
+    VectorStoreFactory.provider_to_class[MEMORY_PROVIDER] = f"{__name__}.NumpyVectorStore"
+    vector_store = VectorStoreConfig.model_construct(
+        provider=MEMORY_PROVIDER,
+        config=NumpyVectorStoreConfig(**config["vector_store"]["config"]),
+    )
+    options = {key: value for key, value in config.items() if key != "vector_store"}
+    # 作为参数传入时 MemoryConfig 会重新校验 VectorStoreConfig，构造后再替换
+    memory_config = MemoryConfig(**options)
+    memory_config.vector_store = vector_store
+    return memory_config
@@ -0,0 +1,76 @@
+"""原文写入模块
+
+save_memory 的 infer=False 模式：不调用LLM做事实抽取和更新决策，把文本原样保存为一条记忆，
+只需要一次嵌入和一次向量写入，适合调用方已经确定要保存内容的机器生成事实。
+- payload 格式与 mem0 写入的一致，之后可以正常搜索、分页和导出
+- MEM0_RAW_DEDUP_THRESHOLD > 0 时先在同一作用域内查找最相似的一条记忆，
+  余弦相似度达到阈值时视为重复、不再写入（只支持余弦距离的向量存储）
+- 各阶段耗时与 Memory.add 一样记录到 stage_timings（embedding / similarity_search / vector_write / total）
+
+不写入 mem0 的历史记录。
+"""
+
+import os
+import uuid
+import logging
+from typing import Any, Dict, Optional
+
+import tracing
+from memory_store import build_payload
+from stage_timing import StageTimer, active_timer
+from vector_index import store_measure
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# 余弦距离的度量取值（进程内存储没有 index_measure，为None）
+COSINE_MEASURES = (None, "cosine_distance")
+
+
+def dedup_threshold_from_env() -> float:
+    """读取近似重复检查的相似度阈值，0 表示关闭"""
+    return float(os.getenv("MEM0_RAW_DEDUP_THRESHOLD") or 0)
+
+
+def store_raw(
+    memory_client: Any,
+    text: str,
+    scope: Dict[str, Any],
+    metadata: Optional[Dict[str, Any]] = None,
+    dedup_threshold: float = 0.0,
+) -> Dict[str, Any]:
+    """不经过LLM，把文本原样保存为一条记忆
+
+    Args:
+        memory_client: Memory 实例
+        text: 记忆文本
+        scope: user_id/agent_id/run_id
+        metadata: 用户元数据（可选）
+        dedup_threshold: 近似重复的余弦相似度阈值，0 表示不检查
+
+    Returns:
+        Dict[str, Any]: 与 mem0 add 一致的结果（event 为 ADD，重复时为 NONE），附带 stage_timings（毫秒）
+    """
+    timer = StageTimer()
+    with tracing.span("mem0.raw_add"), active_timer(timer), timer.measure("total"):
+        vector = memory_client.embedding_model.embed(text, "add")
+        duplicate = find_duplicate(memory_client, text, vector, scope, dedup_threshold) if dedup_threshold > 0 else None
+        if duplicate is not None:
+            event = {"id": str(duplicate.id), "memory": (duplicate.payload or {}).get("data"), "event": "NONE"}
+        else:
+            memory_id = str(uuid.uuid4())
+            memory_client.vector_store.insert(vectors=[vector], payloads=[build_payload(text, scope, metadata)], ids=[memory_id])
+            event = {"id": memory_id, "memory": text, "event": "ADD"}
+    return {"results": [event], "stage_timings": timer.as_dict()}
+
+
+def find_duplicate(memory_client: Any, text: str, vector: Any, scope: Dict[str, Any], threshold: float) -> Optional[Any]:
+    """在作用域内查找余弦相似度达到阈值的已有记忆，没有时返回None"""
+    if store_measure(memory_client) not in COSINE_MEASURES:
+        logger.debug("向量存储不是余弦距离，跳过近似重复检查")
+        return None
+    hits = memory_client.vector_store.search(query=text, vectors=vector, limit=1, filters=scope)
+    if not hits or 1.0 - float(hits[0].score) < threshold:
+        return None
+    logger.debug(f"跳过近似重复的记忆: 与 {hits[0].id} 的相似度 {1.0 - float(hits[0].score):.4f}")
+    return hits[0]
@@ -0,0 +1,176 @@
+"""搜索结果缓存模块
+
+按作用域（user_id 等过滤条件）缓存 search_memories 的结果，键为 (作用域, 查询文本, limit)。
+本服务的写入（包括 Memory.add 在写入时决定的更新和删除）使与写入作用域重叠的缓存失效；
+其它进程或直接通过 mem0 的更新/删除不会通知缓存，只能等TTL过期。条目数有上限。
+缓存在进程内共享（get_search_cache），任何会话的写入都会使其它会话的相关缓存失效。
+"""
+
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Optional, Set, Tuple
+
+from metrics import get_registry
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+SEARCH_CACHE_REQUESTS = get_registry().counter(
+    "mem0_search_cache_requests_total",
+    "search_memories result cache lookups by result (hit, miss)",
+    ["result"],
+)
+
+Scope = FrozenSet[Tuple[str, str]]
+
+
+def make_scope(filters: Dict[str, Any]) -> Scope:
+    """把过滤条件（user_id/agent_id/run_id）转换为作用域，忽略空值"""
+    return frozenset((key, str(value)) for key, value in filters.items() if value is not None)
+
+
+def scopes_overlap(first: Scope, second: Scope) -> bool:
+    """两个作用域是否可能包含同一条记忆：共同的过滤字段取值都相同（子集、超集都算重叠）"""
+    first_values = dict(first)
+    return all(first_values.get(key, value) == value for key, value in second)
+
+
+class SearchResultCache:
+    """带精确失效的搜索结果缓存
+
+    写入某个作用域会使所有与之重叠的缓存失效：写入 user_id=u 时，Memory.add 可能更新或删除
+    同一用户下任何 agent_id/run_id 的记忆，因此 user_id=u 和 user_id=u, agent_id=a 的缓存都会失效；
+    写入 user_id=u, agent_id=a 不影响 user_id=u, agent_id=b 或其他用户的缓存。
+    为避免“先搜索、后写入、再回填”的竞态，回填时会检查搜索开始后是否有重叠的作用域被写入过。
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300):
+        """初始化缓存
+
+        Args:
+            max_entries: 最大缓存条目数
+            ttl: 条目存活时间（秒）
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._entries: "OrderedDict[Tuple[Scope, str, int], Tuple[float, Any]]" = OrderedDict()
+        self._by_scope: Dict[Scope, Set[Tuple[Scope, str, int]]] = {}
+        self._invalidated_at: Dict[Scope, float] = {}
+        self._lock = threading.Lock()
+
+        logger.info(f"搜索结果缓存已启用，最大条目数: {max_entries}，TTL: {ttl}s")
+
+    @classmethod
+    def from_env(cls) -> Optional["SearchResultCache"]:
+        """根据环境变量创建缓存，大小为0时返回None"""
+        max_entries = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+        if max_entries <= 0:
+            return None
+        return cls(max_entries=max_entries, ttl=float(os.getenv("SEARCH_CACHE_TTL", "300")))
+
+    def begin(self) -> float:
+        """在发起搜索前获取回填令牌"""
+        return time.monotonic()
+
+    def get(self, scope: Scope, query: str, limit: int) -> Optional[Any]:
+        """查询缓存
+
+        Args:
+            scope: 搜索作用域
+            query: 查询文本
+            limit: 结果数上限
+
+        Returns:
+            Optional[Any]: 缓存的搜索结果，未命中或已过期时返回None
+        """
+        key = (scope, query, limit)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                SEARCH_CACHE_REQUESTS.inc(result="hit")
+                return entry[1]
+            if entry is not None:
+                self._remove(key)
+        SEARCH_CACHE_REQUESTS.inc(result="miss")
+        return None
+
+    def put(self, scope: Scope, query: str, limit: int, result: Any, token: float) -> None:
+        """回填搜索结果
+
+        Args:
+            scope: 搜索作用域
+            query: 查询文本
+            limit: 结果数上限
+            result: 搜索结果
+            token: 搜索前通过 begin() 获取的令牌
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - token > self.ttl:
+                return
+            for written, at in self._invalidated_at.items():
+                if at >= token and scopes_overlap(scope, written):
+                    # 搜索期间作用域被写入，结果可能已过时
+                    return
+
+            key = (scope, query, limit)
+            self._entries[key] = (now + self.ttl, result)
+            self._entries.move_to_end(key)
+            self._by_scope.setdefault(scope, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, written: Scope) -> None:
+        """作用域内的记忆发生变化后使相关缓存失效
+
+        Args:
+            written: 被写入记忆所属的作用域（记忆上的 user_id/agent_id/run_id）
+        """
+        now = time.monotonic()
+        with self._lock:
+            for scope in [scope for scope in self._by_scope if scopes_overlap(scope, written)]:
+                for key in list(self._by_scope.get(scope, ())):
+                    self._remove(key)
+
+            self._invalidated_at[written] = now
+            # 只需保留可能仍有搜索在进行中的失效记录
+            expired = [scope for scope, at in self._invalidated_at.items() if now - at > self.ttl]
+            for scope in expired:
+                del self._invalidated_at[scope]
+
+    def _remove(self, key: Tuple[Scope, str, int]) -> None:
+        """删除一个条目（调用方需持有锁）"""
+        self._entries.pop(key, None)
+        keys = self._by_scope.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_scope[key[0]]
+
+    def stats(self) -> Dict[str, int]:
+        """获取缓存统计
+
+        Returns:
+            Dict[str, int]: 条目数和作用域数
+        """
+        with self._lock:
+            return {"entries": len(self._entries), "scopes": len(self._by_scope)}
+
+
+_cache: Optional[SearchResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> Optional[SearchResultCache]:
+    """获取进程内共享的搜索结果缓存，未启用时返回None"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SearchResultCache.from_env()
+        return _cache
@@ -0,0 +1,220 @@
+"""写入流水线分阶段计时模块
+
+在 mem0 Memory.add 的各个阶段外层安装计时钩子：
+- fact_extraction: LLM 事实抽取（add 中的第一次 LLM 调用）
+- embedding: 事实嵌入
+- similarity_search: 在 mem0_memories 中查找相似的已有记忆
+- update_decision: LLM 决定 ADD / UPDATE / DELETE（之后的 LLM 调用）
+- vector_write: 向量写入、更新和删除
+- history: 历史记录写入
+
+当前计时器保存在 ContextVar 中。mem0 在内部线程池中执行 _add_to_vector_store / _search_vector_store，
+这里把 mem0 模块使用的线程池替换为提交时复制调用方上下文的版本，计时器和追踪上下文随之进入工作线程。
+"""
+
+import sys
+import time
+import types
+import threading
+import contextvars
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import tracing
+from metrics import get_registry
+from embedding import FactPrefetchingLLM
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+ADD_STAGE_SECONDS = get_registry().histogram(
+    "mem0_add_stage_seconds",
+    "Time spent in each stage of Memory.add (stage=total for the whole call)",
+    ["stage"],
+)
+
+# 需要计时的方法: (客户端属性, 方法名) -> 阶段
+STAGE_METHODS = {
+    ("embedding_model", "embed"): "embedding",
+    ("embedding_model", "prefetch"): "embedding",
+    ("vector_store", "search"): "similarity_search",
+    ("vector_store", "insert"): "vector_write",
+    ("vector_store", "update"): "vector_write",
+    ("vector_store", "delete"): "vector_write",
+    ("db", "add_history"): "history",
+}
+
+# 写入记忆的阶段：失败的 add 中出现过这些阶段，说明可能已经保存了部分记忆
+WRITE_STAGES = ("vector_write", "history")
+
+
+class StageTimer:
+    """一次 Memory.add 调用的分阶段耗时"""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.llm_calls = 0
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        """累加一个阶段的耗时并记录到指标"""
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        ADD_STAGE_SECONDS.observe(seconds, stage=stage)
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        """计时上下文"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def next_llm_stage(self) -> str:
+        """按调用顺序区分LLM阶段：第一次为事实抽取，之后为更新决策"""
+        with self._lock:
+            self.llm_calls += 1
+            return "fact_extraction" if self.llm_calls == 1 else "update_decision"
+
+    def as_dict(self) -> Dict[str, float]:
+        """以毫秒为单位返回各阶段耗时"""
+        with self._lock:
+            return {stage: round(seconds * 1000, 3) for stage, seconds in self.stages.items()}
+
+
+_current_timer: ContextVar[Optional[StageTimer]] = ContextVar("mem0_stage_timer", default=None)
+
+
+def current_timer() -> Optional[StageTimer]:
+    """获取当前上下文中正在执行的 add 的计时器"""
+    return _current_timer.get()
+
+
+@contextmanager
+def active_timer(timer: Optional[StageTimer]) -> Iterator[None]:
+    """在当前上下文中设置当前计时器"""
+    token = _current_timer.set(timer)
+    try:
+        yield
+    finally:
+        _current_timer.reset(token)
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """提交任务时复制调用方上下文（计时器、追踪span）的线程池"""
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def propagate_context(memory_client: Any) -> None:
+    """让客户端所属的 mem0 模块创建的线程池复制调用方上下文
+
+    mem0 以 `concurrent.futures.ThreadPoolExecutor()` 的形式使用线程池，这里只替换该模块中的
+    concurrent 名称，不影响其它模块。
+    """
+    module = sys.modules.get(type(memory_client).__module__)
+    current = getattr(module, "concurrent", None)
+    futures = getattr(current, "futures", None)
+    if futures is None or getattr(current, "propagates_context", False):
+        return
+    patched = types.SimpleNamespace(**vars(futures))
+    patched.ThreadPoolExecutor = ContextThreadPoolExecutor
+    module.concurrent = types.SimpleNamespace(futures=patched, propagates_context=True)
+
+
+def _timed_method(method: Callable[..., Any], stage: Callable[[Optional[StageTimer]], str]) -> Callable[..., Any]:
+    """包装方法：为调用创建span，存在当前计时器时把耗时记到对应阶段"""
+
+    def timed(*args: Any, **kwargs: Any) -> Any:
+        timer = current_timer()
+        stage_name = stage(timer)
+        with tracing.span(f"mem0.{stage_name}"):
+            if timer is None:
+                return method(*args, **kwargs)
+            with timer.measure(stage_name):
+                return method(*args, **kwargs)
+
+    return timed
+
+
+def _llm_stage(timer: Optional[StageTimer]) -> str:
+    """add 之外（没有计时器）的LLM调用统一记为 llm"""
+    return timer.next_llm_stage() if timer is not None else "llm"
+
+
+def install_stage_timers(memory_client: Any) -> Any:
+    """为 Memory 客户端安装分阶段计时钩子
+
+    add 的返回值（字典）中会附带 stage_timings 字段（毫秒）；add 抛出异常时，
+    异常对象上同样附带 stage_timings 属性，供调用方判断失败前是否已经写入（见 may_have_written）。
+
+    Args:
+        memory_client: Memory 实例
+
+    Returns:
+        Any: 传入的客户端
+    """
+    propagate_context(memory_client)
+
+    for (owner_name, method_name), stage in STAGE_METHODS.items():
+        owner = getattr(memory_client, owner_name, None)
+        method = getattr(owner, method_name, None)
+        if callable(method):
+            setattr(owner, method_name, _timed_method(method, lambda timer, stage=stage: stage))
+
+    # 事实预取发生在LLM包装器中，只对内层LLM计时，预取计入 embedding 阶段
+    llm = memory_client.llm
+    if isinstance(llm, FactPrefetchingLLM):
+        llm = llm.llm
+    llm.generate_response = _timed_method(llm.generate_response, _llm_stage)
+
+    add = memory_client.add
+
+    def timed_add(*args: Any, **kwargs: Any) -> Any:
+        timer = StageTimer()
+        try:
+            with tracing.span("mem0.add"), active_timer(timer), timer.measure("total"):
+                result = add(*args, **kwargs)
+        except Exception as e:
+            e.stage_timings = timer.as_dict()
+            raise
+        if isinstance(result, dict):
+            result["stage_timings"] = timer.as_dict()
+        return result
+
+    memory_client.add = timed_add
+    _trace_search(memory_client)
+    return memory_client
+
+
+def may_have_written(error: BaseException) -> bool:
+    """判断失败的 add 是否可能已经写入了记忆
+
+    没有分阶段计时（客户端未安装计时钩子）时无法确定，按可能已写入处理。
+
+    Args:
+        error: add 抛出的异常
+
+    Returns:
+        bool: 是否可能已写入
+    """
+    timings = getattr(error, "stage_timings", None)
+    if timings is None:
+        return True
+    return any(stage in timings for stage in WRITE_STAGES)
+
+
+def _trace_search(memory_client: Any) -> None:
+    """为 search 创建span（内部线程池中的子span通过复制的上下文挂在其下）"""
+    search = memory_client.search
+
+    def traced_search(*args: Any, **kwargs: Any) -> Any:
+        with tracing.span("mem0.search"):
+            return search(*args, **kwargs)
+
+    memory_client.search = traced_search
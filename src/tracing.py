@@ -0,0 +1,150 @@
+"""分布式追踪模块（可选）
+
+基于 OpenTelemetry，为 MCP 工具调用 → mem0 各阶段 → LLM/嵌入HTTP请求 → Postgres SQL 生成链路。
+未安装 opentelemetry-sdk 或未配置 TRACING_EXPORTER 时，所有接口都是空操作。
+
+- TRACING_EXPORTER=otlp: 发送到本地 OTLP collector（地址读取标准的 OTEL_EXPORTER_OTLP_ENDPOINT）
+- TRACING_EXPORTER=file: 每个span一行JSON写入 TRACING_FILE_PATH
+- 若已安装 opentelemetry-instrumentation-httpx / -sqlalchemy，自动追踪出站HTTP请求和SQL查询
+- MCP请求的 _meta 中带有 traceparent/tracestate 时，工具span延续调用方的链路
+"""
+
+import os
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+try:
+    from opentelemetry import propagate, trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+except ImportError:
+    trace = None
+    SpanExporter = object
+
+_tracer = None
+_lock = threading.Lock()
+
+
+class FileSpanExporter(SpanExporter):
+    """把span以JSON行的形式追加写入本地文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: Any) -> "SpanExportResult":
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(span.to_json(indent=None) + "\n")
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+
+def _create_exporter(name: str) -> Any:
+    """根据 TRACING_EXPORTER 创建导出器"""
+    if name == "file":
+        return FileSpanExporter(os.getenv("TRACING_FILE_PATH") or "mem0_traces.jsonl")
+    if name == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()
+    raise ValueError(f"Unsupported TRACING_EXPORTER: {name!r} (expected otlp or file)")
+
+
+def _instrument_libraries() -> None:
+    """启用已安装的 httpx / SQLAlchemy 自动追踪"""
+    try:
+        from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
+        HTTPXClientInstrumentor().instrument()
+        logger.info("已启用 httpx 请求追踪")
+    except ImportError:
+        logger.info("未安装 opentelemetry-instrumentation-httpx，不追踪LLM/嵌入HTTP请求")
+    try:
+        from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+        SQLAlchemyInstrumentor().instrument()
+        logger.info("已启用 SQLAlchemy 查询追踪")
+    except ImportError:
+        logger.info("未安装 opentelemetry-instrumentation-sqlalchemy，不追踪SQL查询")
+
+
+def init_tracing() -> bool:
+    """根据环境变量初始化追踪，需在创建数据库引擎和HTTP客户端之前调用
+
+    Returns:
+        bool: 是否启用了追踪
+    """
+    global _tracer
+    exporter_name = os.getenv("TRACING_EXPORTER", "").strip().lower()
+    if not exporter_name:
+        return False
+    if trace is None:
+        logger.warning("TRACING_EXPORTER 已设置但未安装 opentelemetry-sdk，追踪未启用")
+        return False
+
+    with _lock:
+        if _tracer is not None:
+            return True
+        resource = Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME") or "mcp-mem0"})
+        provider = TracerProvider(resource=resource)
+        provider.add_span_processor(BatchSpanProcessor(_create_exporter(exporter_name)))
+        trace.set_tracer_provider(provider)
+        _instrument_libraries()
+        _tracer = trace.get_tracer("mcp-mem0")
+
+    logger.info(f"追踪已启用，导出器: {exporter_name}")
+    return True
+
+
+def shutdown_tracing() -> None:
+    """刷新并关闭导出器"""
+    if _tracer is not None:
+        provider = trace.get_tracer_provider()
+        if hasattr(provider, "shutdown"):
+            provider.shutdown()
+
+
+@contextmanager
+def span(name: str, attributes: Optional[Dict[str, Any]] = None, parent: Any = None) -> Iterator[Any]:
+    """开始一个span，未启用追踪时为空操作
+
+    Args:
+        name: span名
+        attributes: span属性
+        parent: 父上下文（如 extract_context 的返回值），默认使用当前上下文
+    """
+    if _tracer is None:
+        yield None
+        return
+    with _tracer.start_as_current_span(name, context=parent, attributes=attributes) as current:
+        yield current
+
+
+def extract_context(meta: Any) -> Any:
+    """从MCP请求的 _meta 中提取 W3C trace context
+
+    Args:
+        meta: request_context.meta（可能为None）
+
+    Returns:
+        Any: 父上下文，没有可用的trace context时返回None
+    """
+    if _tracer is None or meta is None:
+        return None
+    carrier = {}
+    for key in ("traceparent", "tracestate"):
+        value = getattr(meta, key, None)
+        if value is None and isinstance(getattr(meta, "model_extra", None), dict):
+            value = meta.model_extra.get(key)
+        if value:
+            carrier[key] = str(value)
+    return propagate.extract(carrier) if carrier else None
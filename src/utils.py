@@ -1,6 +1,12 @@
 from mem0 import Memory
 import os
 
+from embedding import install_embedder_wrappers
+from hot_cache import install_hot_cache
+from fake_providers import FAKE_PROVIDER, install_fake_providers, is_fake_provider
+from numpy_vector_store import MEMORY_PROVIDER, build_memory_config
+from stage_timing import install_stage_timers
+
 # Custom instructions for memory processing
 # These aren't being used right now but Mem0 does support adding custom prompting
 # for handling memory retrieval and processing.
@@ -14,7 +20,8 @@ Extract the Following Information:
 - Source: Record where this information came from when applicable.
 """
 
-def get_mem0_client():
+def build_mem0_config():
+    """根据环境变量构建mem0配置字典"""
     print("Starting Mem0 client configuration...")
     
     # Get LLM provider and configuration
@@ -24,19 +31,21 @@ def get_mem0_client():
     embedding_model = os.getenv('EMBEDDING_MODEL_CHOICE')
     embedding_dims = os.getenv('EMBEDDING_DIMS')
     database_url = os.getenv('DATABASE_URL')
+    vector_store_provider = os.getenv('VECTOR_STORE_PROVIDER') or 'supabase'
     
     print(f"LLM Provider: {llm_provider}")
     print(f"LLM Model: {llm_model}")
     print(f"Embedding Model: {embedding_model}")
     print(f"Embedding Dims: {embedding_dims}")
     print(f"Database URL: {'Configured' if database_url else 'Missing'}")
+    print(f"Vector Store: {vector_store_provider}")
     
     # Validate required environment variables
     if not llm_provider:
         raise ValueError("LLM_PROVIDER environment variable is required")
-    if not llm_api_key:
+    if not llm_api_key and llm_provider != FAKE_PROVIDER:
         raise ValueError("LLM_API_KEY environment variable is required")
-    if not database_url:
+    if not database_url and vector_store_provider != MEMORY_PROVIDER:
         raise ValueError("DATABASE_URL environment variable is required")
     
     # Initialize config dictionary
@@ -83,6 +92,13 @@ def get_mem0_client():
         if llm_base_url:
             config["llm"]["config"]["ollama_base_url"] = llm_base_url
     
+    elif llm_provider == FAKE_PROVIDER:
+        # mem0 只接受内置提供商，先用 openai 配置创建客户端，再由 install_fake_providers 替换
+        config["llm"] = {
+            "provider": "openai",
+            "config": {"model": llm_model or "fake", "api_key": FAKE_PROVIDER}
+        }
+    
     # Configure embedder based on provider
     if llm_provider == 'openai':
         # Default embedding dimensions for different OpenAI models
@@ -132,27 +148,70 @@ def get_mem0_client():
         if embedding_base_url:
             config["embedder"]["config"]["ollama_base_url"] = embedding_base_url
     
-    # Configure Supabase vector store
+    elif llm_provider == FAKE_PROVIDER:
+        config["embedder"] = {
+            "provider": "openai",
+            "config": {
+                "model": embedding_model or "fake",
+                "embedding_dims": int(embedding_dims) if embedding_dims else 1536,
+                "api_key": FAKE_PROVIDER
+            }
+        }
+    
+    # Configure the vector store
     # Get the embedding dimensions from the embedder config
     embedder_dims = config.get("embedder", {}).get("config", {}).get("embedding_dims", 1536)
     
-    config["vector_store"] = {
-        "provider": "supabase",
-        "config": {
-            "connection_string": os.environ.get('DATABASE_URL', ''),
-            "collection_name": "mem0_memories",
-            "embedding_model_dims": embedder_dims
+    if vector_store_provider == MEMORY_PROVIDER:
+        # 进程内 NumPy 向量存储，设置 VECTOR_STORE_PATH 时映射到磁盘
+        config["vector_store"] = {
+            "provider": MEMORY_PROVIDER,
+            "config": {
+                "collection_name": "mem0_memories",
+                "embedding_model_dims": embedder_dims,
+                "path": os.getenv('VECTOR_STORE_PATH') or None
+            }
+        }
+    else:
+        config["vector_store"] = {
+            "provider": "supabase",
+            "config": {
+                "connection_string": os.environ.get('DATABASE_URL', ''),
+                "collection_name": "mem0_memories",
+                "embedding_model_dims": embedder_dims
+            }
         }
-    }
 
     # config["custom_fact_extraction_prompt"] = CUSTOM_INSTRUCTIONS
     
+    return config
+
+def create_memory(memory_class, config):
+    """按配置创建 Memory，进程内向量存储不经过 mem0 的提供商校验"""
+    if config["vector_store"]["provider"] == MEMORY_PROVIDER:
+        return memory_class(build_memory_config(config))
+    return memory_class.from_config(config)
+
+def install_provider_wrappers(memory_client, config):
+    """按配置替换离线替身提供商，并安装嵌入包装器"""
+    provider = config.get("embedder", {}).get("provider", "openai")
+    if is_fake_provider():
+        install_fake_providers(memory_client)
+        provider = FAKE_PROVIDER
+    install_embedder_wrappers(memory_client, provider)
+
+def get_mem0_client():
+    config = build_mem0_config()
+    
     print("Creating Memory client with config...")
     print(f"Final config: {config}")
     
     try:
         # Create and return the Memory client
-        memory_client = Memory.from_config(config)
+        memory_client = create_memory(Memory, config)
+        install_provider_wrappers(memory_client, config)
+        install_hot_cache(memory_client)
+        install_stage_timers(memory_client)
         print("Memory client created successfully")
         return memory_client
     except Exception as e:
@@ -160,4 +219,4 @@ def get_mem0_client():
         print(f"Error type: {type(e).__name__}")
         import traceback
         print(f"Traceback: {traceback.format_exc()}")
-        raise
\ No newline at end of file
+        raise
@@ -0,0 +1,480 @@
+"""向量索引管理模块
+
+为 mem0_memories 集合（vecs."mem0_memories" 表的 vec 列）创建并校验 HNSW / IVFFlat 索引：
+- 按配置的 embedding_model_dims 和距离度量选择操作符类
+- CREATE INDEX CONCURRENTLY 构建，期间轮询 pg_stat_progress_create_index 汇报进度
+- 重建时先以临时名构建新索引，成功后再删除旧索引并改名，构建期间旧索引继续服务查询
+- 启动时的索引构建在专用守护线程中执行（每个进程一次），关闭时取消正在执行的构建语句
+- 运行时参数 hnsw.ef_search / ivfflat.probes
+"""
+
+import os
+import math
+import time
+import threading
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event, text
+
+from memory_store import VECS_SCHEMA, ensure_filter_indexes, get_engine
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# pgvector 的 hnsw / ivfflat 索引最多支持2000维的 vector 列
+MAX_INDEXED_DIMS = 2000
+
+# 距离度量 -> pgvector 操作符类；键同时接受 vecs 的 IndexMeasure 取值
+OPCLASSES = {
+    "cosine": "vector_cosine_ops",
+    "cosine_distance": "vector_cosine_ops",
+    "l2": "vector_l2_ops",
+    "l2_distance": "vector_l2_ops",
+    "ip": "vector_ip_ops",
+    "max_inner_product": "vector_ip_ops",
+}
+
+
+@dataclass
+class IndexSpec:
+    """向量索引配置"""
+    method: str = "hnsw"
+    measure: str = "cosine"
+    m: int = 16
+    ef_construction: int = 64
+    lists: Optional[int] = None
+    ef_search: Optional[int] = None
+    probes: Optional[int] = None
+
+    @classmethod
+    def from_env(cls, measure: Optional[str] = None) -> "IndexSpec":
+        """根据环境变量创建索引配置
+
+        Args:
+            measure: 向量存储实际使用的距离度量，未指定时读取 VECTOR_INDEX_MEASURE
+        """
+        def optional_int(name: str) -> Optional[int]:
+            value = os.getenv(name)
+            return int(value) if value else None
+
+        return cls(
+            method=os.getenv("VECTOR_INDEX_METHOD", "hnsw").lower(),
+            measure=(measure or os.getenv("VECTOR_INDEX_MEASURE", "cosine")).lower(),
+            m=int(os.getenv("VECTOR_HNSW_M", "16")),
+            ef_construction=int(os.getenv("VECTOR_HNSW_EF_CONSTRUCTION", "64")),
+            lists=optional_int("VECTOR_IVFFLAT_LISTS"),
+            ef_search=optional_int("VECTOR_HNSW_EF_SEARCH"),
+            probes=optional_int("VECTOR_IVFFLAT_PROBES"),
+        )
+
+    @property
+    def opclass(self) -> str:
+        """pgvector 操作符类"""
+        if self.measure not in OPCLASSES:
+            raise ValueError(f"Unsupported vector distance measure: {self.measure}")
+        return OPCLASSES[self.measure]
+
+    def index_name(self, collection_name: str) -> str:
+        """索引名"""
+        return f"ix_{collection_name}_vec_{self.method}_{self.opclass}"
+
+
+def store_measure(memory_client: Any) -> Optional[str]:
+    """读取 mem0 supabase 向量存储配置的距离度量（vecs IndexMeasure 取值）"""
+    measure = getattr(memory_client.vector_store, "index_measure", None)
+    return getattr(measure, "value", measure)
+
+
+def column_dims(engine: Any, collection_name: str) -> Optional[int]:
+    """读取 vec 列声明的维度
+
+    Returns:
+        Optional[int]: 维度，表不存在时返回None
+    """
+    sql = text("""
+        SELECT format_type(a.atttypid, a.atttypmod)
+        FROM pg_attribute a
+        JOIN pg_class c ON c.oid = a.attrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = :schema AND c.relname = :table AND a.attname = 'vec' AND NOT a.attisdropped
+    """)
+    with engine.connect() as conn:
+        row = conn.execute(sql, {"schema": VECS_SCHEMA, "table": collection_name}).fetchone()
+    if row is None:
+        return None
+    # 形如 vector(1536)
+    type_name = row[0]
+    return int(type_name[type_name.index("(") + 1:-1]) if "(" in type_name else None
+
+
+def inspect_vector_indexes(engine: Any, collection_name: str) -> list:
+    """列出 vec 列上已有的 ANN 索引
+
+    Returns:
+        list: 每个索引的 name / method / opclass / valid / definition
+    """
+    sql = text("""
+        SELECT i.relname, am.amname, opc.opcname, ix.indisvalid, pg_get_indexdef(i.oid)
+        FROM pg_index ix
+        JOIN pg_class i ON i.oid = ix.indexrelid
+        JOIN pg_class t ON t.oid = ix.indrelid
+        JOIN pg_namespace n ON n.oid = t.relnamespace
+        JOIN pg_am am ON am.oid = i.relam
+        JOIN pg_opclass opc ON opc.oid = ix.indclass[0]
+        WHERE n.nspname = :schema AND t.relname = :table AND am.amname IN ('hnsw', 'ivfflat')
+    """)
+    with engine.connect() as conn:
+        rows = conn.execute(sql, {"schema": VECS_SCHEMA, "table": collection_name}).fetchall()
+    return [
+        {"name": row[0], "method": row[1], "opclass": row[2], "valid": row[3], "definition": row[4]}
+        for row in rows
+    ]
+
+
+def check_vector_index(engine: Any, collection_name: str, dims: int, spec: IndexSpec) -> Dict[str, Any]:
+    """校验向量索引是否存在且与配置一致
+
+    Args:
+        engine: SQLAlchemy 引擎
+        collection_name: 集合名
+        dims: 配置的 embedding_model_dims
+        spec: 索引配置
+
+    Returns:
+        Dict[str, Any]: status 为 ok / missing / mismatch / invalid / unsupported，以及现有索引列表
+    """
+    actual_dims = column_dims(engine, collection_name)
+    if actual_dims is not None and actual_dims != dims:
+        raise ValueError(
+            f"Collection {collection_name} stores vector({actual_dims}) but embedding_model_dims is {dims}"
+        )
+    if dims > MAX_INDEXED_DIMS:
+        return {"status": "unsupported", "indexes": [], "reason": f"pgvector cannot index more than {MAX_INDEXED_DIMS} dims"}
+
+    indexes = inspect_vector_indexes(engine, collection_name)
+    matching = [idx for idx in indexes if idx["method"] == spec.method and idx["opclass"] == spec.opclass]
+    if any(idx["valid"] for idx in matching):
+        status = "ok"
+    elif matching:
+        status = "invalid"
+    elif indexes:
+        status = "mismatch"
+    else:
+        status = "missing"
+    return {"status": status, "indexes": indexes}
+
+
+def _default_lists(engine: Any, collection_name: str) -> int:
+    """按 pgvector 建议计算 IVFFlat 的 lists：100万行以内 rows/1000，以上 sqrt(rows)"""
+    with engine.connect() as conn:
+        rows = conn.execute(text(f'SELECT count(*) FROM {VECS_SCHEMA}."{collection_name}"')).scalar() or 0
+    if rows <= 1_000_000:
+        return max(1, rows // 1000)
+    return int(math.sqrt(rows))
+
+
+def _watch_progress(engine: Any, collection_name: str, done: threading.Event,
+                    report: Callable[[Dict[str, Any]], None], interval: float) -> None:
+    """轮询 pg_stat_progress_create_index 并汇报构建进度"""
+    sql = text("""
+        SELECT p.phase, p.blocks_done, p.blocks_total, p.tuples_done, p.tuples_total
+        FROM pg_stat_progress_create_index p
+        JOIN pg_class t ON t.oid = p.relid
+        JOIN pg_namespace n ON n.oid = t.relnamespace
+        WHERE n.nspname = :schema AND t.relname = :table
+    """)
+    while not done.wait(interval):
+        try:
+            with engine.connect() as conn:
+                row = conn.execute(sql, {"schema": VECS_SCHEMA, "table": collection_name}).fetchone()
+        except Exception as e:
+            logger.debug(f"读取索引构建进度失败: {e}")
+            continue
+        if row is not None:
+            report({
+                "phase": row[0],
+                "blocks_done": row[1],
+                "blocks_total": row[2],
+                "tuples_done": row[3],
+                "tuples_total": row[4],
+            })
+
+
+def _log_progress(progress: Dict[str, Any]) -> None:
+    """默认的进度汇报：写日志"""
+    total = progress["blocks_total"] or progress["tuples_total"]
+    done = progress["blocks_done"] if progress["blocks_total"] else progress["tuples_done"]
+    percent = f"{100.0 * done / total:.1f}%" if total else "n/a"
+    logger.info(f"向量索引构建中: {progress['phase']} ({percent})")
+
+
+def build_vector_index(
+    engine: Any,
+    collection_name: str,
+    spec: IndexSpec,
+    replace: bool = False,
+    report: Callable[[Dict[str, Any]], None] = _log_progress,
+    progress_interval: float = 5.0,
+) -> str:
+    """并发构建向量索引（不阻塞读写）
+
+    replace 时先以临时名构建新索引，成功后才删除 vec 列上的其他 ANN 索引（包括同名的旧索引）
+    并把新索引改为正式名；构建失败时删除临时索引，旧索引保持不变。
+
+    Args:
+        engine: SQLAlchemy 引擎
+        collection_name: 集合名
+        spec: 索引配置
+        replace: 是否替换 vec 列上的现有 ANN 索引
+        report: 构建进度回调
+        progress_interval: 进度轮询间隔（秒）
+
+    Returns:
+        str: 索引名
+    """
+    table = f'{VECS_SCHEMA}."{collection_name}"'
+    name = spec.index_name(collection_name)
+    if spec.method == "hnsw":
+        options = f"WITH (m = {int(spec.m)}, ef_construction = {int(spec.ef_construction)})"
+    elif spec.method == "ivfflat":
+        lists = spec.lists or _default_lists(engine, collection_name)
+        options = f"WITH (lists = {int(lists)})"
+    else:
+        raise ValueError(f"Unsupported vector index method: {spec.method}")
+
+    existing = inspect_vector_indexes(engine, collection_name)
+    build_name = f"{name}_new" if replace else name
+
+    autocommit = engine.execution_options(isolation_level="AUTOCOMMIT")
+    with autocommit.connect() as conn:
+        # 上次被中断的并发构建会留下同名的无效索引，IF NOT EXISTS 会把它当作已存在而跳过
+        for idx in existing:
+            if idx["name"] == build_name and not idx["valid"]:
+                logger.warning(f"删除上次构建失败的无效索引: {build_name}")
+                conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {VECS_SCHEMA}."{build_name}"'))
+
+        done = threading.Event()
+        watcher = threading.Thread(
+            target=_watch_progress,
+            args=(engine, collection_name, done, report, progress_interval),
+            daemon=True,
+        )
+        watcher.start()
+        started = time.time()
+        try:
+            logger.info(f"开始构建向量索引: {build_name} ({spec.method}, {spec.opclass})")
+            conn.execute(text(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{build_name}" ON {table} USING {spec.method} (vec {spec.opclass}) {options}'
+            ))
+        except Exception:
+            # 失败的并发构建会留下无效索引；replace 时旧索引不受影响
+            conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {VECS_SCHEMA}."{build_name}"'))
+            raise
+        finally:
+            done.set()
+            watcher.join(timeout=progress_interval)
+
+        if replace:
+            for idx in existing:
+                if idx["name"] != build_name:
+                    logger.info(f"删除向量索引: {idx['name']}")
+                    conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {VECS_SCHEMA}."{idx["name"]}"'))
+            conn.execute(text(f'ALTER INDEX {VECS_SCHEMA}."{build_name}" RENAME TO "{name}"'))
+
+    logger.info(f"向量索引构建完成: {name}，耗时 {time.time() - started:.1f}s")
+    return name
+
+
+def ensure_vector_index(memory_client: Any, spec: Optional[IndexSpec] = None, rebuild: bool = False) -> Dict[str, Any]:
+    """启动步骤：校验向量索引，缺失时构建
+
+    Args:
+        memory_client: Memory 实例
+        spec: 索引配置，默认根据环境变量和向量存储的距离度量生成
+        rebuild: 现有索引与配置不一致时是否重建（匹配配置的索引无效时总会重建）
+
+    Returns:
+        Dict[str, Any]: 校验结果
+    """
+    engine = get_engine(memory_client)
+    vector_store = memory_client.vector_store
+    spec = spec or IndexSpec.from_env(store_measure(memory_client))
+    collection_name = vector_store.collection_name
+
+    result = check_vector_index(engine, collection_name, vector_store.embedding_model_dims, spec)
+    status = result["status"]
+    if status == "ok":
+        logger.info(f"向量索引已就绪: {collection_name} ({spec.method}, {spec.opclass})")
+    elif status == "unsupported":
+        logger.warning(f"跳过向量索引: {result['reason']}")
+    elif status in ("missing", "invalid") or rebuild:
+        build_vector_index(engine, collection_name, spec, replace=rebuild)
+        result = check_vector_index(engine, collection_name, vector_store.embedding_model_dims, spec)
+    else:
+        logger.warning(
+            f"向量索引与配置不一致 ({status}): {[idx['name'] for idx in result['indexes']]}，"
+            f"使用 scripts/manage_vector_index.py --rebuild 重建"
+        )
+    return result
+
+
+def apply_search_settings(memory_client: Any, spec: Optional[IndexSpec] = None) -> None:
+    """应用运行时搜索参数 hnsw.ef_search / ivfflat.probes
+
+    vecs 在每次查询时用 SET LOCAL 设置这两个参数（未传入时使用其内置默认值），
+    因此同时为集合的 query 注入默认参数，并在新建连接时设置会话级参数供直连SQL使用。
+
+    Args:
+        memory_client: Memory 实例
+        spec: 索引配置，默认根据环境变量生成
+    """
+    spec = spec or IndexSpec.from_env(store_measure(memory_client))
+    if spec.ef_search is None and spec.probes is None:
+        return
+
+    settings = {}
+    if spec.ef_search is not None:
+        settings["ef_search"] = int(spec.ef_search)
+    if spec.probes is not None:
+        settings["probes"] = int(spec.probes)
+
+    collection = getattr(memory_client.vector_store, "collection", None)
+    if collection is not None and not getattr(collection.query, "_search_settings", None):
+        query = collection.query
+
+        def query_with_settings(*args: Any, **kwargs: Any) -> Any:
+            for key, value in settings.items():
+                kwargs.setdefault(key, value)
+            return query(*args, **kwargs)
+
+        query_with_settings._search_settings = settings
+        collection.query = query_with_settings
+
+    engine = get_engine(memory_client)
+    if getattr(engine, "_search_settings", None) == settings:
+        # 共享连接池的引擎已由其它客户端设置过
+        return
+
+    @event.listens_for(engine, "checkout")
+    def set_search_settings(dbapi_connection: Any, connection_record: Any, connection_proxy: Any) -> None:
+        # 每个连接（包括设置前已建立的空闲连接）在首次借出时设置一次会话级参数，无需丢弃共享引擎
+        if connection_record.info.get("search_settings") == settings:
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            if "ef_search" in settings:
+                cursor.execute(f"SET hnsw.ef_search = {settings['ef_search']}")
+            if "probes" in settings:
+                cursor.execute(f"SET ivfflat.probes = {settings['probes']}")
+            # 提交，避免连接归还时回滚撤销会话级参数
+            dbapi_connection.commit()
+        finally:
+            cursor.close()
+        connection_record.info["search_settings"] = settings
+
+    engine._search_settings = settings
+    logger.info(f"向量搜索参数: {settings}")
+
+
+class IndexBuildThread(threading.Thread):
+    """在专用守护线程中依次执行启动时的索引构建步骤
+
+    并发构建可能持续很久，不占用工具线程池，也不阻塞解释器退出。stop() 跳过剩余步骤，
+    并用 pg_cancel_backend 取消本线程正在执行的语句；被中断的构建留下的无效索引在下次启动时删除重建。
+    """
+
+    def __init__(self, engine: Any, steps: List[Tuple[str, Callable[[], Any]]]):
+        """初始化构建线程
+
+        Args:
+            engine: 构建使用的 SQLAlchemy 引擎
+            steps: (步骤名, 构建函数) 列表，按顺序执行（同一张表上的并发构建会互相等待）
+        """
+        super().__init__(name="index-build", daemon=True)
+        self.engine = engine
+        self.steps = steps
+        self._stopping = threading.Event()
+        self._backends: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def run(self) -> None:
+        event.listen(self.engine, "checkout", self._on_checkout)
+        event.listen(self.engine, "checkin", self._on_checkin)
+        try:
+            for name, step in self.steps:
+                if self._stopping.is_set():
+                    return
+                try:
+                    step()
+                except Exception as e:
+                    if self._stopping.is_set():
+                        logger.info(f"索引构建已取消: {name}")
+                        return
+                    logger.error(f"索引构建失败: {name}: {e}")
+        finally:
+            event.remove(self.engine, "checkout", self._on_checkout)
+            event.remove(self.engine, "checkin", self._on_checkin)
+
+    def _on_checkout(self, dbapi_connection: Any, connection_record: Any, connection_proxy: Any) -> None:
+        """记录本线程借出的连接的后端进程号"""
+        get_backend_pid = getattr(dbapi_connection, "get_backend_pid", None)
+        if threading.get_ident() == self.ident and get_backend_pid is not None:
+            connection_record.info["build_backend"] = get_backend_pid()
+            with self._lock:
+                self._backends.add(connection_record.info["build_backend"])
+
+    def _on_checkin(self, dbapi_connection: Any, connection_record: Any) -> None:
+        pid = connection_record.info.pop("build_backend", None)
+        if pid is not None:
+            with self._lock:
+                self._backends.discard(pid)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """停止构建：跳过剩余步骤并取消正在执行的构建语句
+
+        Args:
+            timeout: 等待线程退出的最长时间（秒）
+        """
+        self._stopping.set()
+        with self._lock:
+            backends = list(self._backends)
+        for pid in backends:
+            try:
+                with self.engine.connect() as conn:
+                    conn.execute(text("SELECT pg_cancel_backend(:pid)"), {"pid": pid})
+                logger.info(f"已取消索引构建语句（后端进程 {pid}）")
+            except Exception as e:
+                logger.warning(f"取消索引构建语句失败: {e}")
+        self.join(timeout)
+
+
+_build_thread: Optional[IndexBuildThread] = None
+_build_lock = threading.Lock()
+
+
+def start_index_build(memory_client: Any, filter_indexes: bool = True, vector_index: bool = True) -> Optional[IndexBuildThread]:
+    """在后台线程中构建过滤/分页索引和向量索引，每个进程只启动一次
+
+    Args:
+        memory_client: 使用 supabase（pgvector）向量存储的 Memory 实例
+        filter_indexes: 是否创建过滤和分页索引
+        vector_index: 是否校验（缺失时构建）向量索引
+
+    Returns:
+        Optional[IndexBuildThread]: 构建线程，没有需要执行的步骤时返回None
+    """
+    global _build_thread
+    steps = []
+    if filter_indexes:
+        steps.append(("filter_index", lambda: ensure_filter_indexes(memory_client)))
+    if vector_index:
+        steps.append(("vector_index", lambda: ensure_vector_index(memory_client)))
+    if not steps:
+        return None
+    with _build_lock:
+        if _build_thread is None:
+            _build_thread = IndexBuildThread(get_engine(memory_client), steps)
+            _build_thread.start()
+        return _build_thread
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+批量搜索测试脚本
+
+测试 search_batch：
+- 所有查询在一次 embed_many 请求中嵌入
+- 进程内存储一次矩阵乘法完成全部查询，结果与逐条 search 一致、按查询分组
+- 不支持批量查找的存储回退为逐条 search
+- pgvector 存储通过 search_vectors 在一条 LATERAL SQL 中完成全部查询，结果按查询序号分组
+- 配置了 DATABASE_URL 时，search_vectors 的结果与 vecs 逐条查询一致
+"""
+
+import sys
+import os
+import uuid
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 添加src目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from batch_search import search_batch
+from memory_store import search_vectors
+from numpy_vector_store import NumpyVectorStore
+from testing_support import RecordingEngine, memory_client, sql_client
+
+# 查询文本 -> 查询向量
+QUERY_VECTORS = {
+    "food": [1.0, 0.0, 0.0],
+    "travel": [0.0, 1.0, 0.0],
+    "work": [0.0, 0.0, 1.0],
+}
+
+
+class PlainStore:
+    """只有 search 接口的存储，委托给进程内存储"""
+
+    def __init__(self, store):
+        self.store = store
+        self.searches = 0
+
+    def search(self, query, vectors=None, limit=5, filters=None):
+        self.searches += 1
+        return self.store.search(query, vectors, limit, filters)
+
+
+def make_store():
+    store = NumpyVectorStore("memories", 3)
+    store.insert(
+        vectors=[[1.0, 0.1, 0.0], [0.9, 0.0, 0.2], [0.0, 1.0, 0.1], [0.1, 0.0, 1.0], [1.0, 0.0, 0.0]],
+        payloads=[
+            {"data": "likes ramen", "user_id": "alice"},
+            {"data": "vegetarian", "user_id": "alice"},
+            {"data": "visiting Kyoto", "user_id": "alice"},
+            {"data": "works remotely", "user_id": "alice"},
+            {"data": "bob likes pizza", "user_id": "bob"},
+        ],
+        ids=["m1", "m2", "m3", "m4", "m5"],
+    )
+    return store
+
+
+def test_batch_matches_single_searches():
+    """
+    测试批量结果与逐条搜索一致，且只有一次嵌入请求
+    """
+    print("\n=== 批量搜索一致性测试 ===")
+
+    store = make_store()
+    client = memory_client(store, QUERY_VECTORS)
+    queries, limits = ["food", "travel", "work"], [2, 1, 3]
+    results = search_batch(client, queries, limits, {"user_id": "alice"})
+
+    assert client.embedding_model.requests == [queries], "所有查询应在一次请求中嵌入"
+    assert [len(memories) for memories in results] == [2, 1, 3]
+    for query, limit, memories in zip(queries, limits, results):
+        expected = store.search(query, QUERY_VECTORS[query], limit, {"user_id": "alice"})
+        assert [memory["id"] for memory in memories] == [hit.id for hit in expected]
+        assert all(memory["user_id"] == "alice" and "score" in memory for memory in memories)
+    assert results[0][0]["memory"] == "likes ramen"
+    print("✅ 批量搜索一致性测试通过")
+
+
+def test_fallback_to_single_searches():
+    """
+    测试不支持批量查找的存储逐条搜索
+    """
+    print("\n=== 逐条搜索回退测试 ===")
+
+    plain = PlainStore(make_store())
+    client = memory_client(plain, QUERY_VECTORS)
+    results = search_batch(client, ["food", "travel"], [1, 1], {"user_id": "bob"})
+    assert plain.searches == 2
+    assert [[memory["id"] for memory in memories] for memories in results] == [["m5"], ["m5"]]
+
+    assert search_batch(client, [], [], {}) == []
+    try:
+        search_batch(client, ["food"], [1, 2], {})
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("查询数和limit数不一致时应报错")
+    print("✅ 逐条搜索回退测试通过")
+
+
+def test_search_vectors_sql():
+    """
+    测试 search_vectors 生成的 LATERAL SQL 和绑定参数
+    """
+    print("\n=== LATERAL 批量查询SQL测试 ===")
+
+    rows = [
+        (0, "m1", 0.1, {"data": "likes ramen", "user_id": "alice"}),
+        (0, "m2", 0.3, None),
+        (2, "m4", 0.2, {"data": "works remotely", "user_id": "alice"}),
+    ]
+    engine = RecordingEngine(responses={"CROSS JOIN LATERAL": rows})
+    vectors = [QUERY_VECTORS["food"], QUERY_VECTORS["travel"], QUERY_VECTORS["work"]]
+    results = search_vectors(sql_client(engine), vectors, [2, 1, 3], {"user_id": "alice"})
+
+    assert results == [
+        [("m1", 0.1, {"data": "likes ramen", "user_id": "alice"}), ("m2", 0.3, {})],
+        [],
+        [("m4", 0.2, {"data": "works remotely", "user_id": "alice"})],
+    ], results
+
+    assert len(engine.statements) == 1, "所有查询应在一条SQL中执行"
+    sql, params, _ = engine.statements[0]
+    assert sql.startswith(
+        "WITH queries AS ( SELECT * FROM unnest(CAST(:query_idx AS int[]), CAST(:query_vecs AS text[]), "
+        "CAST(:query_limits AS int[])) AS q(idx, vec, lim))"
+    ), sql
+    assert (
+        "FROM queries CROSS JOIN LATERAL ( SELECT id, metadata, vec <=> CAST(queries.vec AS vector) AS distance "
+        "FROM vecs.\"mem0_memories\" WHERE metadata->>'user_id' = :filter_0 "
+        "ORDER BY vec <=> CAST(queries.vec AS vector) LIMIT queries.lim) AS hits"
+    ) in sql, "每个查询向量应在 LATERAL 子查询中独立排序和截断"
+    assert sql.endswith("ORDER BY queries.idx, hits.distance")
+    assert params == {
+        "filter_0": "alice",
+        "query_idx": [0, 1, 2],
+        "query_vecs": ["[1.0,0.0,0.0]", "[0.0,1.0,0.0]", "[0.0,0.0,1.0]"],
+        "query_limits": [2, 1, 3],
+    }, params
+
+    # 距离运算符取自集合的距离度量
+    engine = RecordingEngine()
+    assert search_vectors(sql_client(engine), vectors[:1], [5], {}, "l2_distance") == [[]]
+    assert "ORDER BY vec <-> CAST(queries.vec AS vector)" in engine.statements[0][0]
+    assert "WHERE TRUE" in engine.statements[0][0]
+    try:
+        search_vectors(sql_client(engine), vectors[:1], [5], {}, "hamming")
+        assert False, "不支持的距离度量应报错"
+    except ValueError:
+        pass
+
+    # search_batch 对 pgvector 存储使用 search_vectors，距离作为 score
+    client = sql_client(RecordingEngine(responses={"CROSS JOIN LATERAL": rows}), vectors=QUERY_VECTORS)
+    memories = search_batch(client, ["food", "travel", "work"], [2, 1, 3], {"user_id": "alice"})
+    assert [[memory["id"] for memory in group] for group in memories] == [["m1", "m2"], [], ["m4"]]
+    assert memories[0][0]["memory"] == "likes ramen" and memories[0][0]["score"] == 0.1
+    print("✅ LATERAL 批量查询SQL测试通过")
+
+
+def test_search_vectors_pgvector():
+    """
+    测试 search_vectors 在真实 pgvector 上的结果与 vecs 逐条查询一致
+    """
+    print("\n=== pgvector 批量查询测试 ===")
+
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        print("   未配置 DATABASE_URL，跳过")
+        return
+
+    import vecs
+
+    db = vecs.create_client(database_url)
+    name = f"test_batch_search_{uuid.uuid4().hex[:8]}"
+    collection = db.get_or_create_collection(name=name, dimension=3)
+    try:
+        collection.upsert(records=[
+            ("m1", [1.0, 0.1, 0.0], {"data": "likes ramen", "user_id": "alice"}),
+            ("m2", [0.9, 0.0, 0.2], {"data": "vegetarian", "user_id": "alice"}),
+            ("m3", [0.0, 1.0, 0.1], {"data": "visiting Kyoto", "user_id": "alice"}),
+            ("m4", [0.1, 0.0, 1.0], {"data": "works remotely", "user_id": "alice"}),
+            ("m5", [1.0, 0.0, 0.0], {"data": "bob likes pizza", "user_id": "bob"}),
+        ])
+        queries, limits = ["food", "travel", "work"], [2, 1, 3]
+        vectors = [QUERY_VECTORS[query] for query in queries]
+        results = search_vectors(sql_client(db.engine, name), vectors, limits, {"user_id": "alice"})
+
+        for vector, limit, hits in zip(vectors, limits, results):
+            expected = collection.query(
+                data=vector, limit=limit, filters={"user_id": {"$eq": "alice"}},
+                measure="cosine_distance", include_value=True,
+            )
+            assert [hit[0] for hit in hits] == [row[0] for row in expected]
+            assert all(abs(hit[1] - row[1]) < 1e-6 for hit, row in zip(hits, expected))
+            assert all(hit[2]["user_id"] == "alice" for hit in hits)
+    finally:
+        db.delete_collection(name)
+        db.disconnect()
+    print("✅ pgvector 批量查询测试通过")
+
+
+def main():
+    """
+    运行所有测试
+    """
+    print("开始批量搜索测试...")
+    print("=" * 50)
+
+    tests = [
+        test_batch_matches_single_searches,
+        test_fallback_to_single_searches,
+        test_search_vectors_sql,
+        test_search_vectors_pgvector,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} 失败: {e}")
+
+    print("\n" + "=" * 50)
+    print(f"测试结果: {passed}/{len(tests)} 通过")
+    return passed == len(tests)
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+写入微批处理测试脚本
+
+测试 AddBatcher：
+- 窗口内的多次提交合并为一次写入，每个调用方只拿到分配给自己的事件
+- 按嵌入相似度（嵌入失败时按字符相似度）把事件分配给来源文本
+- 达到批大小上限时不等窗口到期立即发送
+- 已取消的调用方的文本不再写入
+- 合并写入在写入记忆之前失败时逐条重试；可能已写入时不重试
+- 关闭时发送并等待尚未完成的批次
+"""
+
+import sys
+import os
+import asyncio
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 添加src目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from batching import AddBatcher, attribute_events
+
+
+class RecordingWriter:
+    """记录每次合并写入的替身，文本包含 bad 时整批失败
+
+    failed_stages 为失败前经过的阶段（作为异常的 stage_timings），为None时异常不带分阶段计时。
+    """
+
+    def __init__(self, delay=0.0, failed_stages=("fact_extraction",)):
+        self.calls = []
+        self.delay = delay
+        self.failed_stages = failed_stages
+
+    async def __call__(self, texts, params):
+        self.calls.append(list(texts))
+        await asyncio.sleep(self.delay)
+        if any("bad" in text for text in texts):
+            error = ValueError("bad input")
+            if self.failed_stages is not None:
+                error.stage_timings = {stage: 1.0 for stage in self.failed_stages}
+            raise error
+        return {"results": [{"memory": text, "event": "ADD"} for text in texts], "stage_timings": {"total": 1.0}}
+
+
+def test_coalescing():
+    """
+    测试窗口内的提交合并为一次写入
+    """
+    print("\n=== 合并写入测试 ===")
+
+    async def scenario():
+        writer = RecordingWriter()
+        batcher = AddBatcher(writer, window_ms=20, max_items=16)
+        results = await asyncio.gather(*(batcher.submit(f"fact {i}", {"user_id": "u1"}) for i in range(3)))
+        # 参数不同的文本不合并
+        single = await batcher.submit("other user", {"user_id": "u2"})
+        return writer, results, single
+
+    writer, results, single = asyncio.run(scenario())
+    assert writer.calls == [["fact 0", "fact 1", "fact 2"], ["other user"]]
+    for index, result in enumerate(results):
+        assert result["results"] == [{"memory": f"fact {index}", "event": "ADD"}], "调用方应只拿到自己的事件"
+        assert result["batch_size"] == 3
+        assert result["stage_timings"] == {"total": 1.0}
+    assert single["results"] == [{"memory": "other user", "event": "ADD"}]
+    assert "batch_size" not in single
+    print("✅ 合并写入测试通过")
+
+
+def test_attribution():
+    """
+    测试按嵌入相似度分配事件，嵌入失败时按字符相似度分配
+    """
+    print("\n=== 事件分配测试 ===")
+
+    texts = ["I love hiking in the Alps", "My sister is called Anna", "今天学会了做红烧肉"]
+    events = [
+        {"memory": "Sister's name is Anna", "event": "ADD"},
+        {"memory": "学会了做红烧肉", "event": "ADD"},
+        {"memory": "Loves hiking in the Alps", "event": "UPDATE", "previous_memory": "Likes hiking"},
+        {"memory": "", "previous_memory": "Anna is a friend", "event": "DELETE"},
+    ]
+    owned = attribute_events(texts, events)
+    assert owned == [[events[2]], [events[0], events[3]], [events[1]]]
+
+    # 嵌入向量只看方向，与字面内容无关
+    vectors = [[1, 0], [0, 1], [1, 1], [0.1, 1], [0.9, 0.1], [1, 0.2], [0.2, 1]]
+    assert attribute_events(texts, events, vectors) == [[events[1], events[2]], [events[0], events[3]], []]
+    assert attribute_events(["only"], events) == [events]
+
+    async def scenario(embed):
+        async def writer(batch, params):
+            return {"results": [{"memory": "Enjoys green tea", "event": "ADD"}, {"memory": "Lives in Paris", "event": "ADD"}]}
+
+        batcher = AddBatcher(writer, embed, window_ms=20)
+        return await asyncio.gather(batcher.submit("I live in Paris", {}), batcher.submit("I drink green tea daily", {}))
+
+    async def embed(texts):
+        assert texts == ["I live in Paris", "I drink green tea daily", "Enjoys green tea", "Lives in Paris"]
+        return [[1, 0], [0, 1], [0, 1], [1, 0]]
+
+    async def broken_embed(texts):
+        raise RuntimeError("embedding provider down")
+
+    for embedder in (embed, broken_embed):
+        paris, tea = asyncio.run(scenario(embedder))
+        assert [event["memory"] for event in paris["results"]] == ["Lives in Paris"]
+        assert [event["memory"] for event in tea["results"]] == ["Enjoys green tea"]
+    print("✅ 事件分配测试通过")
+
+
+def test_max_items_flush():
+    """
+    测试达到批大小上限时立即发送
+    """
+    print("\n=== 批大小上限测试 ===")
+
+    async def scenario():
+        writer = RecordingWriter()
+        batcher = AddBatcher(writer, window_ms=60_000, max_items=2)
+        await asyncio.wait_for(
+            asyncio.gather(batcher.submit("a", {}), batcher.submit("b", {})), timeout=5
+        )
+        return writer
+
+    writer = asyncio.run(scenario())
+    assert writer.calls == [["a", "b"]]
+    print("✅ 批大小上限测试通过")
+
+
+def test_cancelled_caller_skipped():
+    """
+    测试调用方在批次发送前取消时，其文本不再写入
+    """
+    print("\n=== 取消调用测试 ===")
+
+    async def scenario():
+        writer = RecordingWriter()
+        batcher = AddBatcher(writer, window_ms=50, max_items=16)
+        kept = asyncio.create_task(batcher.submit("kept", {}))
+        cancelled = asyncio.create_task(batcher.submit("cancelled", {}))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        result = await kept
+        return writer, result, cancelled
+
+    writer, result, cancelled = asyncio.run(scenario())
+    assert cancelled.cancelled()
+    assert writer.calls == [["kept"]]
+    assert result["results"] == [{"memory": "kept", "event": "ADD"}]
+    print("✅ 取消调用测试通过")
+
+
+def test_failure_isolated():
+    """
+    测试合并写入在写入记忆之前失败时逐条重试，只有出错的调用方收到异常
+    """
+    print("\n=== 失败隔离测试 ===")
+
+    async def scenario(writer):
+        batcher = AddBatcher(writer, window_ms=20, max_items=16)
+        return await asyncio.gather(
+            batcher.submit("good 1", {}), batcher.submit("bad", {}), batcher.submit("good 2", {}),
+            return_exceptions=True,
+        )
+
+    writer = RecordingWriter(failed_stages=("fact_extraction", "embedding", "similarity_search"))
+    results = asyncio.run(scenario(writer))
+    assert writer.calls[0] == ["good 1", "bad", "good 2"]
+    assert sorted(writer.calls[1:]) == [["bad"], ["good 1"], ["good 2"]]
+    assert results[0]["results"][0]["memory"] == "good 1"
+    assert isinstance(results[1], ValueError)
+    assert results[2]["results"][0]["memory"] == "good 2"
+    print("✅ 失败隔离测试通过")
+
+
+def test_no_replay_after_write():
+    """
+    测试合并写入可能已经写入记忆时不逐条重试，避免重复写入
+    """
+    print("\n=== 已写入不重试测试 ===")
+
+    async def scenario(writer):
+        batcher = AddBatcher(writer, window_ms=20, max_items=16)
+        return await asyncio.gather(
+            batcher.submit("good", {}), batcher.submit("bad", {}), return_exceptions=True,
+        )
+
+    # 失败前已经有向量写入；没有分阶段计时时无法确定，同样不重试
+    for failed_stages in (("fact_extraction", "vector_write"), None):
+        writer = RecordingWriter(failed_stages=failed_stages)
+        results = asyncio.run(scenario(writer))
+        assert writer.calls == [["good", "bad"]], "可能已写入的批次不应重试"
+        assert all(isinstance(result, ValueError) for result in results)
+    print("✅ 已写入不重试测试通过")
+
+
+def test_drain_on_shutdown():
+    """
+    测试关闭时发送并等待尚未完成的批次
+    """
+    print("\n=== 关闭排空测试 ===")
+
+    async def scenario():
+        writer = RecordingWriter(delay=0.05)
+        batcher = AddBatcher(writer, window_ms=60_000, max_items=16)
+        pending = asyncio.create_task(batcher.submit("pending", {}))
+        await asyncio.sleep(0)
+        await asyncio.wait_for(batcher.drain(), timeout=5)
+        assert writer.calls == [["pending"]], "关闭时没有发送等待中的批次"
+        return writer, await asyncio.wait_for(pending, timeout=1)
+
+    writer, result = asyncio.run(scenario())
+    assert writer.calls == [["pending"]]
+    assert result["results"][0]["memory"] == "pending"
+    print("✅ 关闭排空测试通过")
+
+
+def main():
+    """
+    运行所有测试
+    """
+    print("开始写入微批处理测试...")
+    print("=" * 50)
+
+    tests = [
+        test_coalescing,
+        test_attribution,
+        test_max_items_flush,
+        test_cancelled_caller_skipped,
+        test_failure_isolated,
+        test_no_replay_after_write,
+        test_drain_on_shutdown,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} 失败: {e}")
+
+    print("\n" + "=" * 50)
+    print(f"测试结果: {passed}/{len(tests)} 通过")
+    return passed == len(tests)
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+批量导出测试脚本
+
+测试 export_memories：
+- 分批按 (created_at, id) 顺序导出作用域内的全部记忆，可选导出向量
+- 导出的 JSONL 用导入脚本导回后ID、文本、时间戳和元数据不变
+- 导出失败时不留下目标文件和临时文件
+- pgvector 存储通过服务端游标（stream_results）分批读取，SQL按作用域过滤、按 (created_at, id) 排序
+"""
+
+import sys
+import os
+import json
+import tempfile
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 添加src目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from bulk_export import export_memories
+from bulk_import import BulkImporter
+from memory_store import build_payload, stream_memories
+from testing_support import RecordingEngine, memory_client, sql_client
+
+
+def fill(client):
+    """写入5条记忆：alice 4条（created_at 乱序），bob 1条"""
+    payloads = [
+        build_payload(f"alice fact {index}", {"user_id": "alice"}, {"topic": "food"}, f"2024-05-0{5 - index}T10:00:00-07:00")
+        for index in range(4)
+    ]
+    payloads.append(build_payload("bob fact", {"user_id": "bob"}, None, "2024-05-01T09:00:00-07:00"))
+    payloads[0]["updated_at"] = "2024-06-01T10:00:00-07:00"
+    client.vector_store.insert(
+        vectors=[[1.0, float(index), 0.0] for index in range(5)],
+        payloads=payloads,
+        ids=[f"m{index}" for index in range(5)],
+    )
+
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_export_in_order():
+    """
+    测试分批导出的顺序、作用域和向量
+    """
+    print("\n=== 分批导出测试 ===")
+
+    client = memory_client()
+    fill(client)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "alice.jsonl")
+        report = export_memories(client, path, {"user_id": "alice"}, include_vectors=True, batch_size=3)
+        assert report["exported"] == 4 and report["batches"] == 2
+        records = read_jsonl(path)
+        assert [record["id"] for record in records] == ["m3", "m2", "m1", "m0"], "应按 created_at 升序导出"
+        assert all(record["user_id"] == "alice" and record["metadata"] == {"topic": "food"} for record in records)
+        assert len(records[0]["vector"]) == 3
+        assert not os.path.exists(path + ".tmp")
+
+        everything = os.path.join(tmp, "all.jsonl")
+        assert export_memories(client, everything, {})["exported"] == 5
+        assert all("vector" not in record for record in read_jsonl(everything))
+    print("✅ 分批导出测试通过")
+
+
+def test_round_trip_through_import():
+    """
+    测试导出文件导回后记忆不变
+    """
+    print("\n=== 导出导入往返测试 ===")
+
+    client = memory_client()
+    fill(client)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "backup.jsonl")
+        export_memories(client, path, {})
+
+        restored = memory_client()
+        report = BulkImporter(restored, batch_size=2).run(path)
+        assert report["imported"] == 5 and report["invalid"] == 0
+
+        for hit in client.vector_store.list()[0]:
+            copy = restored.vector_store.get(hit.id)
+            assert copy is not None, f"记忆 {hit.id} 没有导回"
+            for key in ("data", "hash", "created_at", "updated_at", "user_id", "topic"):
+                assert copy.payload.get(key) == hit.payload.get(key), f"{hit.id} 的 {key} 不一致"
+    print("✅ 导出导入往返测试通过")
+
+
+def test_failed_export_leaves_no_file():
+    """
+    测试导出中途失败时不留下文件
+    """
+    print("\n=== 导出失败测试 ===")
+
+    client = memory_client()
+    fill(client)
+
+    def fail(report):
+        raise RuntimeError("disk full")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "broken.jsonl")
+        try:
+            export_memories(client, path, {}, batch_size=2, progress=fail)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("导出错误应抛出")
+        assert os.listdir(tmp) == []
+    print("✅ 导出失败测试通过")
+
+
+def test_stream_with_server_side_cursor():
+    """
+    测试 pgvector 存储的服务端游标读取
+    """
+    print("\n=== 服务端游标测试 ===")
+
+    rows = [
+        (f"m{index}", (1.0, float(index), 0.0), build_payload(f"fact {index}", {"user_id": "alice"}, None, f"2024-05-0{index + 1}"))
+        for index in range(4)
+    ]
+    rows.append(("m4", None, None))
+    engine = RecordingEngine(responses={"ORDER BY coalesce": rows})
+    batches = list(stream_memories(sql_client(engine), {"user_id": "alice"}, include_vectors=True, batch_size=2))
+
+    assert [len(batch) for batch in batches] == [2, 2, 1], "应按 batch_size 分批读取"
+    assert batches[0][1] == ("m1", [1.0, 1.0, 0.0], rows[1][2]), "向量应转换为列表"
+    assert batches[2] == [("m4", None, {})]
+
+    (sql, params, options), = engine.statements
+    assert sql == (
+        'SELECT id, vec::real[], metadata FROM vecs."mem0_memories" WHERE metadata->>\'user_id\' = :filter_0 '
+        "ORDER BY coalesce(metadata->>'created_at', ''), id"
+    ), sql
+    assert params == {"filter_0": "alice"}
+    assert options == {"stream_results": True, "max_row_buffer": 2}, "应使用服务端游标，客户端最多缓冲一个批次"
+
+    engine = RecordingEngine(responses={"ORDER BY coalesce": [("m0", None, rows[0][2])]})
+    assert list(stream_memories(sql_client(engine), {})) == [[("m0", None, rows[0][2])]]
+    assert engine.statements[0][0].startswith('SELECT id, NULL, metadata FROM vecs."mem0_memories" WHERE TRUE ')
+
+    # 导出使用同一条读取路径
+    engine = RecordingEngine(responses={"ORDER BY coalesce": rows[:4]})
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "alice.jsonl")
+        report = export_memories(sql_client(engine), path, {"user_id": "alice"}, batch_size=3)
+        assert report["exported"] == 4 and report["batches"] == 2
+        assert [record["memory"] for record in read_jsonl(path)] == [f"fact {index}" for index in range(4)]
+    assert engine.statements[0][2]["stream_results"] is True
+    print("✅ 服务端游标测试通过")
+
+
+def main():
+    """
+    运行所有测试
+    """
+    print("开始批量导出测试...")
+    print("=" * 50)
+
+    tests = [
+        test_export_in_order,
+        test_round_trip_through_import,
+        test_failed_export_leaves_no_file,
+        test_stream_with_server_side_cursor,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} 失败: {e}")
+
+    print("\n" + "=" * 50)
+    print(f"测试结果: {passed}/{len(tests)} 通过")
+    return passed == len(tests)
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+批量导入测试脚本
+
+测试 bulk_import：
+- 记忆ID由源文件名、行号和内容确定性生成（与所在目录无关），无效记录被跳过
+- 中断后按检查点继续，不重复写入、不遗漏
+- 从头重新导入时ID不变，已存在的记录计为 duplicates，不覆盖、不再请求嵌入
+- insert_memories 的 COPY 和多行 INSERT 写入路径，ON CONFLICT 跳过的行计为 duplicates
+"""
+
+import sys
+import os
+import json
+import tempfile
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 添加src目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from bulk_import import BulkImporter, build_memory, load_checkpoint
+from memory_store import insert_memories
+from testing_support import RecordingEngine, memory_client, sql_client
+
+
+class Interrupted(Exception):
+    pass
+
+
+def write_source(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        for index in range(count):
+            f.write(json.dumps({"text": f"fact number {index}", "user_id": "alice", "topic": "test"}) + "\n")
+        f.write("not json\n")
+
+
+def test_build_memory_ids():
+    """
+    测试记忆ID的确定性和无效记录
+    """
+    print("\n=== 记忆ID测试 ===")
+
+    record = {"text": "likes ramen", "user_id": "alice", "source_app": "notes"}
+    first = build_memory(record, 7, "/data/a.jsonl", {})
+    again = build_memory(dict(record), 7, "/data/a.jsonl", {})
+    assert first[0] == again[0], "相同源文件、行号和内容应生成相同ID"
+    assert build_memory(record, 7, "/mnt/backup/a.jsonl", {})[0] == first[0], "ID不应依赖源文件所在目录"
+    assert build_memory(record, 8, "/data/a.jsonl", {})[0] != first[0]
+    assert build_memory(record, 7, "/data/b.jsonl", {})[0] != first[0]
+    assert build_memory({**record, "text": "likes udon"}, 7, "/data/a.jsonl", {})[0] != first[0]
+    assert build_memory({**record, "id": "fixed-id"}, 7, "/data/a.jsonl", {})[0] == "fixed-id"
+
+    _, text, payload = first
+    assert text == "likes ramen" and payload["user_id"] == "alice" and payload["source_app"] == "notes"
+
+    assert build_memory({"user_id": "alice"}, 0, "s", {}) is None, "没有文本的记录无效"
+    assert build_memory({"text": "x"}, 0, "s", {}) is None, "没有作用域的记录无效"
+    assert build_memory({"text": "x"}, 0, "s", {"user_id": "default"})[2]["user_id"] == "default"
+    assert build_memory({"text": "x", "user_id": "u", "metadata": "{bad"}, 0, "s", {}) is None
+    print("✅ 记忆ID测试通过")
+
+
+def test_resume_from_checkpoint():
+    """
+    测试中断后按检查点继续，以及从头重新导入不产生重复
+    """
+    print("\n=== 断点续传测试 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "memories.jsonl")
+        checkpoint = os.path.join(tmp, "import.checkpoint.json")
+        write_source(source, 10)
+        client = memory_client()
+
+        def interrupt(report):
+            if report["batches"] == 2:
+                raise Interrupted()
+
+        try:
+            BulkImporter(client, batch_size=3, progress=interrupt).run(source, checkpoint_path=checkpoint)
+        except Interrupted:
+            pass
+        assert load_checkpoint(checkpoint, os.path.abspath(source)) == 6
+        assert client.vector_store.col_info()["count"] == 6
+
+        report = BulkImporter(client, batch_size=3).run(source, checkpoint_path=checkpoint)
+        assert report["skipped"] == 6 and report["read"] == 5
+        assert report["imported"] == 4 and report["invalid"] == 1
+        assert client.vector_store.col_info()["count"] == 10
+
+        # 从头重新导入：ID相同，已存在的记录计为重复，不覆盖也不再嵌入
+        created = {hit.id: hit.payload["created_at"] for hit in client.vector_store.list()[0]}
+        embedded = client.embedding_model.embedded
+        report = BulkImporter(client, batch_size=4).run(source, checkpoint_path=checkpoint, resume=False)
+        assert report["skipped"] == 0 and report["imported"] == 0 and report["duplicates"] == 10, report
+        assert client.embedding_model.embedded == embedded, "已存在的记录不应再请求嵌入"
+        assert client.vector_store.col_info()["count"] == 10
+        assert {hit.id: hit.payload["created_at"] for hit in client.vector_store.list()[0]} == created, "已有记忆不应被覆盖"
+        texts = sorted(hit.payload["data"] for hit in client.vector_store.list()[0])
+        assert texts == sorted(f"fact number {index}" for index in range(10))
+    print("✅ 断点续传测试通过")
+
+
+def test_sql_write_paths():
+    """
+    测试 pgvector 存储的 COPY 和多行 INSERT 写入
+    """
+    print("\n=== SQL写入路径测试 ===")
+
+    rows = [
+        ("m1", [1.0, 0.0, 0.5], {"data": "likes ramen", "user_id": "alice"}),
+        ("m2", [0.0, 1.0, 0.0], {"data": 'says "hi", twice', "user_id": "alice"}),
+    ]
+
+    engine = RecordingEngine(rowcount=1)
+    assert insert_memories(sql_client(engine), rows, "copy") == 1
+    assert engine.sql() == [
+        'CREATE TEMP TABLE IF NOT EXISTS "mem0_memories_import_stage" (LIKE vecs."mem0_memories") ON COMMIT DELETE ROWS',
+        'INSERT INTO vecs."mem0_memories" (id, vec, metadata) SELECT id, vec, metadata '
+        'FROM "mem0_memories_import_stage" ON CONFLICT (id) DO NOTHING',
+    ], engine.sql()
+    (copy_sql, data), = engine.copies
+    assert copy_sql == 'COPY "mem0_memories_import_stage" (id, vec, metadata) FROM STDIN WITH (FORMAT csv)'
+    assert data == (
+        'm1,"[1.0,0.0,0.5]","{""data"": ""likes ramen"", ""user_id"": ""alice""}"\r\n'
+        'm2,"[0.0,1.0,0.0]","{""data"": ""says \\""hi\\"", twice"", ""user_id"": ""alice""}"\r\n'
+    ), data
+
+    engine = RecordingEngine(rowcount=2)
+    assert insert_memories(sql_client(engine), rows, "insert") == 2
+    (sql, params, _), = engine.statements
+    assert sql == (
+        'INSERT INTO vecs."mem0_memories" (id, vec, metadata) VALUES '
+        "(:id_0, CAST(:vec_0 AS vector), CAST(:metadata_0 AS jsonb)), "
+        "(:id_1, CAST(:vec_1 AS vector), CAST(:metadata_1 AS jsonb)) ON CONFLICT (id) DO NOTHING"
+    ), sql
+    assert params["id_1"] == "m2" and params["vec_0"] == "[1.0,0.0,0.5]"
+    assert json.loads(params["metadata_1"]) == rows[1][2]
+    assert engine.copies == []
+
+    assert insert_memories(sql_client(RecordingEngine()), [], "copy") == 0
+    try:
+        insert_memories(sql_client(RecordingEngine()), rows, "merge")
+        assert False, "不支持的写入方式应报错"
+    except ValueError:
+        pass
+
+    # 导入时 ON CONFLICT 跳过的行计为重复
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "memories.jsonl")
+        write_source(source, 4)
+        client = sql_client(RecordingEngine(rowcount=3), "memories")
+        report = BulkImporter(client, batch_size=10, write_method="insert").run(source)
+    assert report["imported"] == 3 and report["duplicates"] == 1 and report["invalid"] == 1, report
+    print("✅ SQL写入路径测试通过")
+
+
+def main():
+    """
+    运行所有测试
+    """
+    print("开始批量导入测试...")
+    print("=" * 50)
+
+    tests = [
+        test_build_memory_ids,
+        test_resume_from_checkpoint,
+        test_sql_write_paths,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} 失败: {e}")
+
+    print("\n" + "=" * 50)
+    print(f"测试结果: {passed}/{len(tests)} 通过")
+    return passed == len(tests)
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
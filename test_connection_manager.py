@@ -5,13 +5,19 @@
 测试基本的连接管理功能：
 - 客户端创建和复用
 - 连接池限制
-- 基本清理功能
+- 基本清理功能（使用中的客户端不会被关闭）
+- 并发创建客户端
+- LRU淘汰和容量上限
+- 共享数据库连接池
+- 共享引擎在仍有客户端使用时不会被丢弃
 """
 
 import sys
 import os
 import time
+import threading
 import logging
+from types import SimpleNamespace
 from dotenv import load_dotenv
 
 # 加载环境变量
@@ -20,7 +26,14 @@ load_dotenv()
 # 添加src目录到路径
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from connection_manager import ConnectionManager, managed_mem0_client
+# 未配置提供商时使用离线替身和进程内向量存储，不需要API密钥和数据库
+if not os.getenv("LLM_PROVIDER"):
+    os.environ.update(LLM_PROVIDER="fake", VECTOR_STORE_PROVIDER="memory", EMBEDDING_DIMS="64")
+
+from sqlalchemy import create_engine
+
+from connection_manager import ClientPoolExhausted, ConnectionManager, managed_mem0_client
+from db_pool import DatabasePool
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -31,105 +44,249 @@ def test_basic_connection_management():
     测试基本的连接管理功能
     """
     print("\n=== 基本连接管理测试 ===")
-    
+
     # 创建连接管理器
     manager = ConnectionManager(max_pool_size=3, cleanup_interval=60, idle_timeout=120)
-    
-    try:
-        # 测试客户端创建
-        print("1. 测试客户端创建...")
-        client1 = manager.get_client("test1")
-        client2 = manager.get_client("test2")
-        client3 = manager.get_client("test1")  # 应该复用test1
-        
-        print(f"   创建了 {len(manager._clients)} 个唯一客户端")
-        print(f"   test1 使用次数: {manager._connection_counts.get('test1', 0)}")
-        print(f"   test2 使用次数: {manager._connection_counts.get('test2', 0)}")
-        
-        # 测试连接池限制
-        print("\n2. 测试连接池限制...")
-        try:
-            # 只创建2个额外客户端，避免触发强制清理
-            client4 = manager.get_client("test3")
-            print(f"   连接池中客户端数量: {len(manager._clients)}")
-            print(f"   连接池限制测试完成")
-        except Exception as e:
-            print(f"   连接池限制测试异常: {e}")
-        
-        # 测试手动清理
-        print("\n3. 测试手动清理...")
-        initial_count = len(manager._clients)
-        manager.cleanup_all()
-        final_count = len(manager._clients)
-        print(f"   清理前: {initial_count} 个客户端")
-        print(f"   清理后: {final_count} 个客户端")
-        
-        print("✅ 基本连接管理测试通过")
-        
-    except Exception as e:
-        print(f"❌ 基本连接管理测试失败: {e}")
-        return False
-    
-    return True
+
+    # 测试客户端创建
+    print("1. 测试客户端创建...")
+    client1 = manager.get_client("test1")
+    client2 = manager.get_client("test2")
+    client3 = manager.get_client("test1")  # 应该复用test1
+
+    print(f"   创建了 {len(manager._clients)} 个唯一客户端")
+    assert client3 is client1 and client2 is not client1
+    assert manager._connection_counts == {"test1": 2, "test2": 1}
+
+    # 测试连接池限制
+    print("\n2. 测试连接池限制...")
+    manager.get_client("test3")
+    print(f"   连接池中客户端数量: {len(manager._clients)}")
+    assert len(manager._clients) == 3
+
+    # 测试手动清理：只关闭已释放的客户端
+    print("\n3. 测试手动清理...")
+    manager.release_client("test2")
+    manager.release_client("test3")
+    manager.cleanup_all()
+    print(f"   清理后: {list(manager._clients)}")
+    assert list(manager._clients) == ["test1"], "使用中的客户端不应被关闭"
+
+    manager.release_client("test1")
+    manager.release_client("test1")
+    manager.cleanup_all()
+    assert len(manager._clients) == 0
+
+    print("✅ 基本连接管理测试通过")
 
 def test_context_manager():
     """
     测试上下文管理器功能
     """
     print("\n=== 上下文管理器测试 ===")
-    
-    try:
-        # 测试上下文管理器
-        print("1. 测试上下文管理器...")
-        with managed_mem0_client("context_test") as client:
-            print("   在上下文中使用客户端")
-            # 这里可以添加实际的mem0操作
-            # result = client.add("测试记忆", user_id="test_user")
-        
-        print("   上下文退出，客户端应该被正确管理")
-        print("✅ 上下文管理器测试通过")
-        
-    except Exception as e:
-        print(f"❌ 上下文管理器测试失败: {e}")
-        return False
-    
-    return True
+
+    # 测试上下文管理器
+    print("1. 测试上下文管理器...")
+    with managed_mem0_client("context_test") as client:
+        from connection_manager import get_connection_manager
+        manager = get_connection_manager()
+        assert manager._connection_counts["context_test"] == 1
+
+    print("   上下文退出，客户端引用已释放")
+    assert manager._connection_counts["context_test"] == 0
+    assert manager._clients["context_test"] is client, "释放后的客户端保留在缓存中供复用"
+    print("✅ 上下文管理器测试通过")
 
 def test_periodic_cleanup():
     """
     测试定期清理功能
     """
     print("\n=== 定期清理测试 ===")
-    
+
+    # 创建连接管理器
+    manager = ConnectionManager(max_pool_size=5, cleanup_interval=2, idle_timeout=3)
+
+    print("1. 启动定期清理...")
+    manager.start_periodic_cleanup()
+
     try:
-        # 创建连接管理器
-        manager = ConnectionManager(max_pool_size=5, cleanup_interval=2, idle_timeout=3)
-        
-        print("1. 启动定期清理...")
-        manager.start_periodic_cleanup()
-        
         # 创建一些客户端
         print("2. 创建测试客户端...")
-        client1 = manager.get_client("cleanup_test1")
-        client2 = manager.get_client("cleanup_test2")
-        
-        print(f"   创建了 {len(manager._clients)} 个客户端")
-        
+        manager.get_client("cleanup_test1")
+        manager.get_client("cleanup_test2")
+        manager.get_client("cleanup_in_use")
+        assert len(manager._clients) == 3
+
+        # 只有释放后的空闲客户端会被清理
+        manager.release_client("cleanup_test1")
+        manager.release_client("cleanup_test2")
+
         # 等待清理
         print("3. 等待自动清理（5秒）...")
         time.sleep(5)
-        
-        print(f"   清理后剩余 {len(manager._clients)} 个客户端")
-        
+
+        print(f"   清理后剩余: {list(manager._clients)}")
+        assert list(manager._clients) == ["cleanup_in_use"]
+    finally:
         # 停止清理
         manager.stop_periodic_cleanup()
-        print("✅ 定期清理测试通过")
-        
-    except Exception as e:
-        print(f"❌ 定期清理测试失败: {e}")
-        return False
-    
-    return True
+    print("✅ 定期清理测试通过")
+
+def test_concurrent_creation():
+    """
+    测试并发创建：同一个client_id只创建一次，创建期间不阻塞已有客户端
+    """
+    print("\n=== 并发创建测试 ===")
+
+    class SlowManager(ConnectionManager):
+        created = []
+
+        def _create_client(self):
+            self.created.append(threading.current_thread().name)
+            time.sleep(1)
+            return object()
+
+    manager = SlowManager(max_pool_size=5)
+
+    print("1. 预先创建一个客户端...")
+    existing = manager.get_client("existing")
+
+    print("2. 并发请求同一个新客户端...")
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(manager.get_client("slow")))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+
+    time.sleep(0.2)
+    start = time.time()
+    same = manager.get_client("existing")
+    lookup_time = time.time() - start
+    print(f"   创建期间获取已有客户端耗时: {lookup_time:.3f}s")
+    assert same is existing and lookup_time < 0.5, "获取已有客户端被创建过程阻塞"
+
+    for thread in threads:
+        thread.join()
+
+    print(f"   创建次数: {len(manager.created)}，引用计数: {manager._connection_counts['slow']}")
+    assert len(manager.created) == 2 and len(set(map(id, results))) == 1, "同一个client_id被重复创建"
+    assert manager._connection_counts["slow"] == 4, "引用计数不正确"
+    print("✅ 并发创建测试通过")
+
+def test_lru_eviction():
+    """
+    测试LRU淘汰：缓存已满时淘汰最久未使用的空闲客户端，使用中的客户端不会被淘汰
+    """
+    print("\n=== LRU淘汰测试 ===")
+
+    class FakeManager(ConnectionManager):
+        def _create_client(self):
+            return object()
+
+    manager = FakeManager(max_pool_size=2, acquire_timeout=0.5)
+
+    print("1. 填满缓存...")
+    manager.get_client("a")
+    manager.get_client("b")
+    manager.release_client("a")
+    manager.release_client("b")
+    manager.get_client("a")  # a 变为最近使用
+
+    print("2. 创建新客户端，应淘汰空闲且最久未使用的 b...")
+    manager.get_client("c")
+    print(f"   缓存中的客户端: {list(manager._clients)}")
+    assert set(manager._clients) == {"a", "c"}, "淘汰了错误的客户端"
+
+    print("3. 所有客户端都在使用中时等待超时...")
+    try:
+        manager.get_client("d")
+        assert False, "超过了容量上限"
+    except ClientPoolExhausted as e:
+        print(f"   等待超时: {e}")
+
+    print("4. 释放后可以创建新客户端...")
+    manager.release_client("c")
+    manager.get_client("d")
+    print(f"   缓存统计: {manager.stats()}")
+    assert set(manager._clients) == {"a", "d"}, "释放后没有淘汰空闲客户端"
+    print("✅ LRU淘汰测试通过")
+
+def test_shared_pool():
+    """
+    测试共享连接池：多个客户端共用同一个引擎，连接数不超过上限
+    """
+    print("\n=== 共享连接池测试 ===")
+
+    manager = ConnectionManager(max_pool_size=3)
+    if not manager.db_pool:
+        print("   未配置 DATABASE_URL，跳过")
+        return
+
+    print("1. 创建多个客户端...")
+    client1 = manager.get_client("pool_test1")
+    client2 = manager.get_client("pool_test2")
+
+    engine1 = client1.vector_store.db.engine
+    engine2 = client2.vector_store.db.engine
+    print(f"   共享同一个引擎: {engine1 is engine2}")
+    assert engine1 is engine2, "客户端没有共享连接池"
+
+    print("2. 检查连接数上限...")
+    manager.db_pool.warm_up()
+    stats = manager.db_pool.stats()
+    print(f"   连接池统计: {stats}")
+    assert stats["checked_out"] + stats["idle"] <= manager.db_pool.max_size, "连接数超过上限"
+
+    manager.release_client("pool_test1")
+    manager.release_client("pool_test2")
+    manager.cleanup_all()
+    print("✅ 共享连接池测试通过")
+
+def vecs_client():
+    """带自有引擎的 vecs 客户端替身（引擎不会实际连接数据库）"""
+    return SimpleNamespace(vector_store=SimpleNamespace(db=SimpleNamespace(engine=create_engine("sqlite://"))))
+
+def test_pool_engine_lifetime():
+    """
+    测试共享引擎的生命周期：仍有客户端注入该引擎时 dispose 不丢弃引擎，不会产生第二个引擎
+    """
+    print("\n=== 共享引擎生命周期测试 ===")
+
+    pool = DatabasePool("sqlite://", min_size=1, max_size=2)
+    first = vecs_client()
+    pool.attach(first)
+    engine = first.vector_store.db.engine
+    assert engine is pool.engine
+
+    assert not pool.dispose(), "仍有客户端使用时不应关闭"
+    second = vecs_client()
+    pool.attach(second)
+    assert second.vector_store.db.engine is engine, "dispose 之后不应创建第二个引擎"
+
+    pool.detach(first)
+    assert not pool.dispose()
+    pool.detach(second)
+    assert pool.dispose()
+
+    # 连接管理器关闭客户端时取消登记；使用中的客户端在 cleanup_all 后仍持有引擎
+    class FakeManager(ConnectionManager):
+        def _create_client(self):
+            client = vecs_client()
+            self.attach_pool(client)
+            return client
+
+    manager = FakeManager(max_pool_size=1, db_pool=DatabasePool("sqlite://", min_size=1, max_size=2))
+    client = manager.get_client("a")
+    manager.cleanup_all()
+    assert manager._clients == {"a": client}
+    assert client.vector_store.db.engine is manager.db_pool.engine, "使用中的客户端的引擎不应被丢弃"
+
+    manager.release_client("a")
+    manager.cleanup_all()
+    assert manager._clients == {} and manager.db_pool._engine is None
+    print("✅ 共享引擎生命周期测试通过")
 
 def main():
     """
@@ -137,26 +294,30 @@ def main():
     """
     print("开始连接管理器测试...")
     print("=" * 50)
-    
+
     tests = [
         test_basic_connection_management,
         test_context_manager,
-        test_periodic_cleanup
+        test_periodic_cleanup,
+        test_concurrent_creation,
+        test_lru_eviction,
+        test_shared_pool,
+        test_pool_engine_lifetime
     ]
-    
+
     passed = 0
     total = len(tests)
-    
+
     for test in tests:
         try:
-            if test():
-                passed += 1
+            test()
+            passed += 1
         except Exception as e:
-            print(f"❌ 测试异常: {e}")
-    
+            print(f"❌ {test.__name__} 失败: {e}")
+
     print("\n" + "=" * 50)
     print(f"测试结果: {passed}/{total} 通过")
-    
+
     if passed == total:
         print("🎉 所有测试通过！连接管理器工作正常。")
         return True
@@ -166,4 +327,4 @@ def main():
 
 if __name__ == "__main__":
     success = main()
-    sys.exit(0 if success else 1)
\ No newline at end of file
+    sys.exit(0 if success else 1)
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+嵌入批处理与缓存测试脚本
+
+测试 BatchingEmbedder、FactPrefetchingLLM 和 CachingEmbedder：
+- 请求按条数上限和估算token上限切分，embed_many 返回与输入一致的条数和顺序
+- openai 多输入请求按响应中的 index 还原顺序
+- Ollama 单条和批量嵌入都走 /api/embed
+- 只有事实抽取请求（按system提示词识别）的响应触发预取，其它响应即使包含 facts 也不触发
+- 缓存的LRU淘汰、跨实例的SQLite磁盘层、按提供商/模型/维度/接口区分的缓存键，以及命中/未命中计数
+"""
+
+import sys
+import os
+import json
+import tempfile
+from types import SimpleNamespace
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 添加src目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from mem0.memory.utils import get_fact_retrieval_messages
+
+from embedding import BatchingEmbedder, CachingEmbedder, FactPrefetchingLLM, estimate_tokens
+
+
+def vector_of(text):
+    """测试用的确定性向量"""
+    return [float(len(text)), float(sum(map(ord, text)) % 97)]
+
+
+class RecordingEmbedder:
+    """记录单条嵌入调用的替身"""
+
+    def __init__(self):
+        self.config = SimpleNamespace(model="test-model", embedding_dims=2)
+        self.client = SimpleNamespace()
+        self.calls = []
+
+    def embed(self, text, memory_action=None):
+        self.calls.append(text)
+        return vector_of(text)
+
+
+class ShuffledOpenAIEmbeddings:
+    """按倒序返回结果的 openai embeddings 接口替身"""
+
+    def __init__(self):
+        self.requests = []
+
+    def create(self, input, model, dimensions):
+        self.requests.append(list(input))
+        data = [SimpleNamespace(index=i, embedding=vector_of(text)) for i, text in enumerate(input)]
+        return SimpleNamespace(data=list(reversed(data)))
+
+
+class OllamaClient:
+    """记录 /api/embed 请求的 ollama 客户端替身"""
+
+    def __init__(self):
+        self.requests = []
+
+    def embed(self, model, input):
+        self.requests.append(list(input))
+        return {"embeddings": [vector_of(text) for text in input]}
+
+
+def test_chunks():
+    """
+    测试按条数和估算token数切分请求
+    """
+    print("\n=== 请求切分测试 ===")
+
+    embedder = BatchingEmbedder(RecordingEmbedder(), "other", max_batch_size=3)
+    chunks = list(embedder._chunks([f"text {i}" for i in range(7)]))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1], chunks
+
+    long_text = "x" * 400
+    budget = estimate_tokens(long_text) * 2
+    embedder = BatchingEmbedder(RecordingEmbedder(), "other", max_batch_size=100, max_batch_tokens=budget)
+    chunks = list(embedder._chunks([long_text] * 5))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1], [len(chunk) for chunk in chunks]
+
+    # 单条超过token上限的文本仍单独成批，不会丢失
+    embedder = BatchingEmbedder(RecordingEmbedder(), "other", max_batch_tokens=10)
+    chunks = list(embedder._chunks(["y" * 200, "short"]))
+    assert chunks == [["y" * 200], ["short"]]
+    assert list(embedder._chunks([])) == []
+    print("✅ 请求切分测试通过")
+
+
+def test_openai_order():
+    """
+    测试 openai 路径：按上限拆成多次请求，结果按 index 还原为输入顺序
+    """
+    print("\n=== openai 批量嵌入测试 ===")
+
+    inner = RecordingEmbedder()
+    inner.client.embeddings = ShuffledOpenAIEmbeddings()
+    embedder = BatchingEmbedder(inner, "openai", max_batch_size=4)
+
+    texts = [f"fact number {i}" for i in range(10)]
+    vectors = embedder.embed_many(texts, "add")
+    assert len(vectors) == len(texts)
+    assert vectors == [vector_of(text) for text in texts], "结果顺序应与输入一致"
+    assert [len(request) for request in inner.client.embeddings.requests] == [4, 4, 2]
+    assert inner.calls == [], "多输入请求不应回退到逐条嵌入"
+
+    # 切分后只剩一条时使用原嵌入模型
+    assert embedder.embed_many(["single"]) == [vector_of("single")]
+    assert inner.calls == ["single"]
+    print("✅ openai 批量嵌入测试通过")
+
+
+def test_ollama_endpoint():
+    """
+    测试 Ollama 的单条和批量嵌入都发往 /api/embed
+    """
+    print("\n=== Ollama 嵌入接口测试 ===")
+
+    inner = RecordingEmbedder()
+    inner.client = OllamaClient()
+    embedder = BatchingEmbedder(inner, "ollama", max_batch_size=2)
+    assert embedder.endpoint == "api/embed"
+
+    assert embedder.embed("one") == vector_of("one")
+    assert embedder.embed_many(["a", "b", "c"]) == [vector_of(text) for text in "abc"]
+    assert inner.client.requests == [["one"], ["a", "b"], ["c"]]
+    assert inner.calls == [], "不应调用 mem0 的 /api/embeddings 单条接口"
+
+    # 客户端不支持 embed 时保持 mem0 原来的接口
+    assert BatchingEmbedder(RecordingEmbedder(), "ollama").endpoint == ""
+    print("✅ Ollama 嵌入接口测试通过")
+
+
+class ScriptedLLM:
+    """返回固定响应的LLM替身"""
+
+    def __init__(self, response):
+        self.response = response
+
+    def generate_response(self, messages, response_format=None):
+        return self.response
+
+
+def test_prefetch_on_fact_extraction():
+    """
+    测试只有事实抽取请求触发预取，预取结果被随后的 embed 直接使用
+    """
+    print("\n=== 事实预取测试 ===")
+
+    prompt, user_prompt = get_fact_retrieval_messages("user: I like tea. I live in Paris.")
+    facts = ["Likes tea", "Lives in Paris"]
+    fact_response = "```json\n" + json.dumps({"facts": facts}) + "\n```"
+
+    inner = RecordingEmbedder()
+    inner.client.embeddings = ShuffledOpenAIEmbeddings()
+    embedder = BatchingEmbedder(inner, "openai")
+    llm = FactPrefetchingLLM(ScriptedLLM(fact_response), embedder, [prompt, "custom prompt"])
+
+    messages = [{"role": "system", "content": prompt}, {"role": "user", "content": user_prompt}]
+    assert llm.generate_response(messages=messages, response_format={"type": "json_object"}) == fact_response
+    assert inner.client.embeddings.requests == [facts], "事实应在一次请求中批量嵌入"
+    assert [embedder.embed(fact, "add") for fact in facts] == [vector_of(fact) for fact in facts]
+    assert inner.calls == [], "预取过的事实不应再次请求"
+
+    # 自定义事实抽取提示词同样识别
+    llm.generate_response([{"role": "system", "content": "custom prompt"}, {"role": "user", "content": "x"}])
+    assert len(inner.client.embeddings.requests) == 2, "自定义提示词的请求应触发预取"
+
+    # 更新决策等其它请求的响应即使包含 facts 字段也不预取
+    other = json.dumps({"facts": ["unrelated one", "unrelated two"]})
+    llm = FactPrefetchingLLM(ScriptedLLM(other), embedder, [prompt])
+    llm.generate_response([{"role": "user", "content": "Return JSON with facts"}])
+    llm.generate_response([{"role": "system", "content": "other system"}, {"role": "user", "content": "x"}])
+    assert len(inner.client.embeddings.requests) == 2, "非事实抽取请求不应触发预取"
+
+    # 无法解析的事实抽取响应按 mem0 的方式忽略
+    llm = FactPrefetchingLLM(ScriptedLLM("not json"), embedder, [prompt])
+    assert llm.generate_response(messages) == "not json"
+    print("✅ 事实预取测试通过")
+
+
+def test_cache_lru():
+    """
+    测试进程内LRU：命中不请求提供商，超出上限时淘汰最久未使用的条目
+    """
+    print("\n=== 嵌入缓存LRU测试 ===")
+
+    inner = RecordingEmbedder()
+    cache = CachingEmbedder(inner, "other", max_entries=2)
+
+    assert cache.embed("a") == vector_of("a")
+    assert cache.embed("a") == vector_of("a")
+    assert inner.calls == ["a"], "命中缓存时不应请求提供商"
+
+    # 空白差异规范化后视为同一文本
+    cache.embed("  a ")
+    assert inner.calls == ["a"]
+
+    cache.embed("b")
+    cache.embed("a")  # a 变为最近使用
+    cache.embed("c")  # 淘汰 b
+    assert cache.stats()["entries"] == 2
+    cache.embed("a")
+    cache.embed("b")
+    assert inner.calls == ["a", "b", "c", "b"], inner.calls
+
+    # 同一批次中的重复文本只请求一次，结果按输入顺序返回
+    assert cache.embed_many(["d", "d", "a"]) == [vector_of("d"), vector_of("d"), vector_of("a")]
+    assert inner.calls[-1] == "d" and inner.calls.count("d") == 1
+    print("✅ 嵌入缓存LRU测试通过")
+
+
+def test_cache_disk_tier():
+    """
+    测试SQLite磁盘层：新的缓存实例（模拟进程重启）直接从磁盘命中
+    """
+    print("\n=== 嵌入缓存磁盘层测试 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "embeddings.db")
+        first = RecordingEmbedder()
+        CachingEmbedder(first, "other", db_path=db_path).embed_many(["x", "y"])
+        assert first.calls == ["x", "y"]
+
+        second = RecordingEmbedder()
+        cache = CachingEmbedder(second, "other", db_path=db_path)
+        assert cache.embed_many(["x", "y", "z"]) == [vector_of(text) for text in "xyz"]
+        assert second.calls == ["z"], "磁盘层命中的文本不应请求提供商"
+
+        stats = cache.stats()
+        assert (stats["memory_hit"], stats["disk_hit"], stats["miss"]) == (0, 2, 1), stats
+        assert stats["entries"] == 3, "磁盘命中的向量应回填内存层"
+
+        cache.embed("x")
+        assert cache.stats()["memory_hit"] == 1
+    print("✅ 嵌入缓存磁盘层测试通过")
+
+
+def test_cache_namespace():
+    """
+    测试缓存键包含提供商、模型、维度和嵌入接口，不同配置的向量不会混用
+    """
+    print("\n=== 嵌入缓存键测试 ===")
+
+    base = CachingEmbedder(RecordingEmbedder(), "openai")
+    other_model = RecordingEmbedder()
+    other_model.config = SimpleNamespace(model="other-model", embedding_dims=2)
+    other_dims = RecordingEmbedder()
+    other_dims.config = SimpleNamespace(model="test-model", embedding_dims=3)
+
+    key = base.cache_key("hello")
+    assert key == base.cache_key("hello  ") == CachingEmbedder(RecordingEmbedder(), "openai").cache_key("hello")
+    assert key != base.cache_key("hello world")
+    assert key != CachingEmbedder(RecordingEmbedder(), "ollama").cache_key("hello")
+    assert key != CachingEmbedder(other_model, "openai").cache_key("hello")
+    assert key != CachingEmbedder(other_dims, "openai").cache_key("hello")
+
+    # /api/embed 与 /api/embeddings 的向量尺度不同，缓存键也不同
+    ollama = RecordingEmbedder()
+    ollama.client = OllamaClient()
+    legacy = CachingEmbedder(RecordingEmbedder(), "ollama").cache_key("hello")
+    assert CachingEmbedder(BatchingEmbedder(ollama, "ollama"), "ollama").cache_key("hello") != legacy
+    print("✅ 嵌入缓存键测试通过")
+
+
+def test_cache_counters():
+    """
+    测试命中/未命中计数以及通过缓存批量请求未命中的文本
+    """
+    print("\n=== 嵌入缓存计数测试 ===")
+
+    inner = RecordingEmbedder()
+    inner.client.embeddings = ShuffledOpenAIEmbeddings()
+    cache = CachingEmbedder(BatchingEmbedder(inner, "openai"), "openai")
+
+    cache.embed_many(["p", "q", "r"])
+    assert inner.client.embeddings.requests == [["p", "q", "r"]], "未命中的文本应合并为一次请求"
+    cache.embed_many(["p", "q", "s"])
+    assert inner.calls == ["s"]
+
+    stats = cache.stats()
+    assert stats == {"memory_hit": 2, "disk_hit": 0, "miss": 4, "entries": 4}, stats
+
+    # 预取写入缓存，随后的 embed 全部命中
+    cache.prefetch(["t", "u"])
+    cache.embed("t")
+    cache.embed("u")
+    assert cache.stats()["memory_hit"] == 4
+    print("✅ 嵌入缓存计数测试通过")
+
+
+def main():
+    """
+    运行所有测试
+    """
+    print("开始嵌入批处理与缓存测试...")
+    print("=" * 50)
+
+    tests = [
+        test_chunks,
+        test_openai_order,
+        test_ollama_endpoint,
+        test_prefetch_on_fact_extraction,
+        test_cache_lru,
+        test_cache_disk_tier,
+        test_cache_namespace,
+        test_cache_counters,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} 失败: {e}")
+
+    print("\n" + "=" * 50)
+    print(f"测试结果: {passed}/{len(tests)} 通过")
+    return passed == len(tests)
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+工具执行器测试脚本
+
+测试 ToolExecutor：
+- 调用方在任务开始前取消时，任务被撤销且不会执行
+- 按工具的并发上限，未配置的工具不受影响
+- stats() 的计数和积压深度
+"""
+
+import sys
+import os
+import time
+import asyncio
+import threading
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 添加src目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from executor import ToolExecutor, parse_tool_limits
+
+
+def tool_stats(executor, tool):
+    """获取一个工具的统计计数（尚未调用过时为空）"""
+    return executor.stats()["tools"].get(tool, {})
+
+
+async def wait_until(condition, timeout=5.0):
+    """等待条件成立"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "等待超时"
+        await asyncio.sleep(0.01)
+
+
+def test_cancel_while_queued():
+    """
+    测试排队中的调用被取消后不会执行
+    """
+    print("\n=== 排队取消测试 ===")
+
+    async def scenario():
+        executor = ToolExecutor(max_workers=1)
+        release = threading.Event()
+        ran = []
+        try:
+            busy = asyncio.create_task(executor.run("save_memory", release.wait, 5))
+            await wait_until(lambda: tool_stats(executor, "save_memory").get("running") == 1)
+
+            # 唯一的线程被占用，第二个调用只能排队
+            queued = asyncio.create_task(executor.run("search_memories", ran.append, "queued"))
+            await wait_until(lambda: executor.queue_depth() == 1)
+            queued.cancel()
+            try:
+                await queued
+            except asyncio.CancelledError:
+                pass
+
+            release.set()
+            await busy
+            # 线程空出后被撤销的任务也不会再执行
+            await executor.run("search_memories", ran.append, "after")
+            return executor.stats(), ran
+        finally:
+            release.set()
+            executor.shutdown()
+
+    stats, ran = asyncio.run(scenario())
+    assert ran == ["after"], "被取消的排队任务不应执行"
+    search = stats["tools"]["search_memories"]
+    assert search["cancelled"] == 1 and search["queued"] == 0 and search["completed"] == 1
+    assert stats["queue_depth"] == 0
+    print("✅ 排队取消测试通过")
+
+
+def test_tool_limits():
+    """
+    测试按工具的并发上限
+    """
+    print("\n=== 工具并发限制测试 ===")
+
+    assert parse_tool_limits("save_memory=2, search_memories=8,") == {"save_memory": 2, "search_memories": 8}
+    assert parse_tool_limits(None) == {}
+    try:
+        parse_tool_limits("save_memory")
+        assert False, "缺少并发数时应报错"
+    except ValueError:
+        pass
+
+    async def scenario():
+        executor = ToolExecutor(max_workers=8, tool_limits={"save_memory": 2})
+        release = threading.Event()
+        running = {"now": 0, "peak": 0}
+        lock = threading.Lock()
+
+        def blocking():
+            with lock:
+                running["now"] += 1
+                running["peak"] = max(running["peak"], running["now"])
+            release.wait(5)
+            with lock:
+                running["now"] -= 1
+
+        try:
+            saves = [asyncio.create_task(executor.run("save_memory", blocking)) for _ in range(5)]
+            await wait_until(lambda: tool_stats(executor, "save_memory").get("waiting") == 3)
+            # 未配置限制的工具不受 save_memory 的上限影响
+            assert await asyncio.wait_for(executor.run("search_memories", lambda: "ok"), timeout=5) == "ok"
+            waiting = executor.stats()
+            release.set()
+            await asyncio.gather(*saves)
+            return running["peak"], waiting, executor.stats()
+        finally:
+            release.set()
+            executor.shutdown()
+
+    peak, waiting, stats = asyncio.run(scenario())
+    assert peak == 2, f"save_memory 最多同时执行2个，实际 {peak}"
+    assert waiting["queue_depth"] == 3
+    assert waiting["tools"]["save_memory"]["running"] == 2
+    save = stats["tools"]["save_memory"]
+    assert save["completed"] == 5 and save["waiting"] == 0 and save["limit"] == 2
+    assert stats["tools"]["search_memories"]["limit"] == 0
+    print("✅ 工具并发限制测试通过")
+
+
+def test_stats():
+    """
+    测试完成和失败计数
+    """
+    print("\n=== 统计测试 ===")
+
+    async def scenario():
+        executor = ToolExecutor(max_workers=2)
+        try:
+            assert await executor.run("search_memories", sum, [1, 2, 3]) == 6
+            try:
+                await executor.run("search_memories", int, "not a number")
+            except ValueError:
+                pass
+            return executor.stats()
+        finally:
+            executor.shutdown()
+
+    stats = asyncio.run(scenario())
+    assert stats["max_workers"] == 2 and stats["queue_depth"] == 0
+    search = stats["tools"]["search_memories"]
+    assert (search["completed"], search["failed"], search["running"], search["queued"]) == (1, 1, 0, 0)
+    print("✅ 统计测试通过")
+
+
+def main():
+    """
+    运行所有测试
+    """
+    print("开始工具执行器测试...")
+    print("=" * 50)
+
+    tests = [
+        test_cancel_while_queued,
+        test_tool_limits,
+        test_stats,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} 失败: {e}")
+
+    print("\n" + "=" * 50)
+    print(f"测试结果: {passed}/{len(tests)} 通过")
+    return passed == len(tests)
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
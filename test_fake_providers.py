@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+离线替身提供商测试脚本
+
+测试 fake_providers（使用 mem0 实际的提示词）：
+- FakeLLM 对事实抽取请求按句返回事实，对更新决策请求已有相同文本时为NONE，否则ADD
+- 传入 tools 时返回不含工具调用的字典
+- FakeEmbedder 的向量确定、维度取自配置、为单位向量，包含相同词的文本更相近
+"""
+
+import sys
+import os
+import json
+import math
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 添加src目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from mem0.configs.prompts import get_update_memory_messages
+from mem0.memory.utils import get_fact_retrieval_messages
+
+from fake_providers import MAX_FACTS, FakeEmbedder, FakeLLM
+
+
+def fact_extraction_messages(conversation):
+    """mem0 事实抽取请求的消息"""
+    system_prompt, user_prompt = get_fact_retrieval_messages(conversation)
+    return [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}]
+
+
+def cosine(a, b):
+    """两个向量的点积（单位向量时即余弦相似度）"""
+    return sum(x * y for x, y in zip(a, b))
+
+
+def test_fact_extraction():
+    """
+    测试事实抽取决策
+    """
+    print("\n=== 事实抽取测试 ===")
+
+    llm = FakeLLM()
+    messages = fact_extraction_messages("user: I like green tea. I live in Paris!\nassistant: Noted\n")
+    response = json.loads(llm.generate_response(messages, response_format={"type": "json_object"}))
+    assert response == {"facts": ["I like green tea", "I live in Paris", "Noted"]}, response
+    assert llm.generate_response(messages) == llm.generate_response(messages), "相同输入应返回相同结果"
+
+    long_text = "user: " + " ".join(f"Fact number {i}." for i in range(20))
+    facts = json.loads(llm.generate_response(fact_extraction_messages(long_text)))["facts"]
+    assert len(facts) == MAX_FACTS
+    assert json.loads(llm.generate_response(fact_extraction_messages("user: ok")))["facts"] == []
+    print("✅ 事实抽取测试通过")
+
+
+def test_update_decisions():
+    """
+    测试更新决策：已有相同文本为NONE，新事实为ADD
+    """
+    print("\n=== 更新决策测试 ===")
+
+    llm = FakeLLM()
+    old = [{"id": "0", "text": "I like green tea"}, {"id": "1", "text": "Works at Acme"}]
+    prompt = get_update_memory_messages(old, ["I like green tea", "I live in Paris"])
+    response = json.loads(llm.generate_response([{"role": "user", "content": prompt}]))
+    assert response == {"memory": [
+        {"id": "0", "text": "I like green tea", "event": "NONE"},
+        {"id": "1", "text": "Works at Acme", "event": "NONE"},
+        {"id": "2", "text": "I live in Paris", "event": "ADD"},
+    ]}, response
+
+    prompt = get_update_memory_messages([], ["I live in Paris"])
+    response = json.loads(llm.generate_response([{"role": "user", "content": prompt}]))
+    assert response == {"memory": [{"id": "0", "text": "I live in Paris", "event": "ADD"}]}, response
+
+    result = llm.generate_response([{"role": "user", "content": prompt}], tools=[{"type": "function"}])
+    assert result["tool_calls"] == [] and json.loads(result["content"]) == response
+    print("✅ 更新决策测试通过")
+
+
+def test_embedder():
+    """
+    测试嵌入的确定性和维度
+    """
+    print("\n=== 嵌入替身测试 ===")
+
+    for dims in (8, 64, 1536):
+        embedder = FakeEmbedder(dims=dims)
+        vector = embedder.embed("I like green tea")
+        assert len(vector) == dims, f"维度应为 {dims}"
+        assert math.isclose(math.sqrt(cosine(vector, vector)), 1.0), "应为单位向量"
+
+    embedder = FakeEmbedder(dims=64)
+    vector = embedder.embed("I like green tea")
+    assert FakeEmbedder(dims=64).embed("I like green tea") == vector, "不同实例的嵌入应相同"
+    assert embedder.embed("i LIKE green tea!") == vector, "嵌入按词计算，不区分大小写和标点"
+    assert embedder.embed_batch(["I like green tea", "Lives in Paris"]) == [vector, embedder.embed("Lives in Paris")]
+
+    related = cosine(vector, embedder.embed("green tea every morning"))
+    unrelated = cosine(vector, embedder.embed("Lives in Paris"))
+    assert related > unrelated, "包含相同词的文本应更相近"
+    assert embedder.embed("...") == [0.0] * 64, "没有词时为零向量"
+    print("✅ 嵌入替身测试通过")
+
+
+def main():
+    """
+    运行所有测试
+    """
+    print("开始离线替身提供商测试...")
+    print("=" * 50)
+
+    tests = [
+        test_fact_extraction,
+        test_update_decisions,
+        test_embedder,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} 失败: {e}")
+
+    print("\n" + "=" * 50)
+    print(f"测试结果: {passed}/{len(tests)} 通过")
+    return passed == len(tests)
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
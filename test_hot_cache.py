@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+热向量缓存测试脚本
+
+测试 HotVectorCache 的失效规则：
+- 更新/删除某条记忆只使包含它的用户缓存失效
+- 加载期间发生的更新/删除不会让过时的矩阵进入缓存
+- 记忆数超过上限的用户不缓存
+"""
+
+import sys
+import os
+import threading
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 添加src目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from hot_cache import HotVectorCache
+
+DIMS = 2
+
+
+class CountingLoader:
+    """记录加载次数的 pgvector 读取替身，可以在读取中途阻塞"""
+
+    def __init__(self, rows, gate=None):
+        self.rows = rows
+        self.gate = gate
+        self.started = threading.Event()
+        self.calls = 0
+
+    def __call__(self, limit):
+        self.calls += 1
+        self.started.set()
+        if self.gate is not None:
+            self.gate.wait(timeout=5)
+        return self.rows[:limit]
+
+
+def rows_for(user_id, *ids):
+    return [(memory_id, [1.0, 0.0], {"data": memory_id, "user_id": user_id}) for memory_id in ids]
+
+
+def test_invalidate_vector_cached():
+    """
+    测试更新/删除记忆只使包含它的用户失效
+    """
+    print("\n=== 已缓存用户失效测试 ===")
+
+    cache = HotVectorCache(max_users=10, max_rows=100, ttl=60)
+    alice = CountingLoader(rows_for("alice", "a1", "a2"))
+    bob = CountingLoader(rows_for("bob", "b1"))
+    cache.get_or_load(("memories", "alice"), alice, DIMS)
+    cache.get_or_load(("memories", "bob"), bob, DIMS)
+
+    cache.invalidate_vector("memories", "a2")
+    cache.get_or_load(("memories", "alice"), alice, DIMS)
+    cache.get_or_load(("memories", "bob"), bob, DIMS)
+    assert alice.calls == 2, "包含该记忆的用户应重新加载"
+    assert bob.calls == 1, "其他用户的缓存不应失效"
+    print("✅ 已缓存用户失效测试通过")
+
+
+def test_invalidate_vector_during_load():
+    """
+    测试加载期间删除记忆时，加载结果只用于本次搜索、不进入缓存
+    """
+    print("\n=== 加载期间失效测试 ===")
+
+    cache = HotVectorCache(max_users=10, max_rows=100, ttl=60)
+    gate = threading.Event()
+    loader = CountingLoader(rows_for("alice", "a1", "a2"), gate=gate)
+    loaded = []
+    thread = threading.Thread(target=lambda: loaded.append(cache.get_or_load(("memories", "alice"), loader, DIMS)))
+    thread.start()
+    assert loader.started.wait(timeout=5)
+
+    # 删除时记忆上没有 user_id，只能按记忆ID失效
+    cache.invalidate_vector("memories", "a2")
+    gate.set()
+    thread.join(timeout=5)
+    assert loaded and loaded[0].get("a2") is not None
+
+    cache.get_or_load(("memories", "alice"), loader, DIMS)
+    assert loader.calls == 2, "加载期间被删除的记忆不应留在缓存中"
+    print("✅ 加载期间失效测试通过")
+
+
+def test_oversized_user_bypassed():
+    """
+    测试记忆数超过上限的用户不缓存
+    """
+    print("\n=== 超大用户测试 ===")
+
+    cache = HotVectorCache(max_users=10, max_rows=2, ttl=60)
+    loader = CountingLoader(rows_for("alice", "a1", "a2", "a3"))
+    assert cache.get_or_load(("memories", "alice"), loader, DIMS) is None
+    assert cache.get_or_load(("memories", "alice"), loader, DIMS) is None
+    assert loader.calls == 1, "TTL内不应重复读取超大用户"
+    print("✅ 超大用户测试通过")
+
+
+def main():
+    """
+    运行所有测试
+    """
+    print("开始热向量缓存测试...")
+    print("=" * 50)
+
+    tests = [
+        test_invalidate_vector_cached,
+        test_invalidate_vector_during_load,
+        test_oversized_user_bypassed,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} 失败: {e}")
+
+    print("\n" + "=" * 50)
+    print(f"测试结果: {passed}/{len(tests)} 通过")
+    return passed == len(tests)
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+异步写入队列测试脚本
+
+测试写后模式的持久队列和工作协程：
+- 任务状态流转（pending -> processing -> done / 重试 / failed）
+- 只有租约过期的处理中任务才会重新排队，处理期间工作协程续约
+- 工作协程失败重试，领取期间入队的任务不会等到下一次轮询
+"""
+
+import sys
+import os
+import time
+import asyncio
+import tempfile
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 添加src目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from ingestion import (
+    STATUS_DONE,
+    STATUS_FAILED,
+    STATUS_PENDING,
+    STATUS_PROCESSING,
+    IngestionQueue,
+    IngestionWorkerPool,
+)
+
+
+def test_queue_state_machine():
+    """
+    测试任务状态流转
+    """
+    print("\n=== 队列状态流转测试 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = IngestionQueue(os.path.join(tmp, "queue.db"))
+        first = queue.enqueue("第一条", {"user_id": "u1"})
+        second = queue.enqueue("第二条", {"user_id": "u1"})
+        assert queue.get(first)["status"] == STATUS_PENDING
+
+        # 按创建顺序领取
+        job = queue.claim()
+        assert job.ticket_id == first and job.attempts == 1 and job.params == {"user_id": "u1"}
+        assert queue.get(first)["status"] == STATUS_PROCESSING
+
+        # 重试：延迟期间不能被领取
+        assert queue.retry(first, "TimeoutError: llm", delay=0.2)
+        assert queue.get(first)["last_error"] == "TimeoutError: llm"
+        job = queue.claim()
+        assert job.ticket_id == second
+        assert queue.claim() is None
+
+        queue.complete(second, {"results": [{"event": "ADD"}]})
+        done = queue.get(second)
+        assert done["status"] == STATUS_DONE and done["result"] == {"results": [{"event": "ADD"}]}
+
+        # 到期后再次领取，尝试次数累加；不再持有的任务不能被修改
+        assert not queue.retry(second, "late", delay=0)
+        time.sleep(0.25)
+        job = queue.claim()
+        assert job.ticket_id == first and job.attempts == 2
+        queue.fail(first, "ValueError: bad input")
+        assert queue.get(first)["status"] == STATUS_FAILED
+        assert queue.counts() == {STATUS_DONE: 1, STATUS_FAILED: 1}
+        assert queue.get("missing") is None
+        queue.close()
+    print("✅ 队列状态流转测试通过")
+
+
+def test_lease_recovery():
+    """
+    测试只有租约过期的处理中任务才会重新排队
+    """
+    print("\n=== 租约恢复测试 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "queue.db")
+        first = IngestionQueue(path, lease_seconds=0.2)
+        ticket = first.enqueue("处理中", {})
+        first.claim()
+
+        # 另一个进程打开同一个队列：租约仍有效，任务不被重置也不能被领取
+        second = IngestionQueue(path, lease_seconds=60)
+        assert second.recover() == 0
+        assert second.claim() is None
+        assert first.renew(ticket)
+        assert second.claim() is None
+
+        # 领取者不再续约，租约过期后任务被重新领取，原领取者的结果不再记录
+        time.sleep(0.3)
+        job = second.claim()
+        assert job.ticket_id == ticket and job.attempts == 2
+        assert not first.renew(ticket)
+        assert not first.complete(ticket, {"stale": True})
+        assert second.complete(ticket, {"results": []})
+        assert second.get(ticket)["result"] == {"results": []}
+        first.close()
+        second.close()
+
+        # 进程退出时遗留的处理中任务在租约过期后由 recover 重新排队
+        crashed = IngestionQueue(path, lease_seconds=0.05)
+        interrupted = crashed.enqueue("处理中被中断", {})
+        crashed.claim()
+        crashed.close()
+        time.sleep(0.1)
+        reopened = IngestionQueue(path)
+        assert reopened.recover() == 1
+        job = reopened.claim()
+        assert job.ticket_id == interrupted and job.attempts == 2
+        reopened.close()
+    print("✅ 租约恢复测试通过")
+
+
+def test_worker_retry_and_wakeup():
+    """
+    测试工作协程失败重试，以及入队后立即被唤醒
+    """
+    print("\n=== 工作协程测试 ===")
+
+    async def scenario(path):
+        calls = []
+
+        async def process(job):
+            calls.append(job.text)
+            if job.text == "flaky" and job.attempts == 1:
+                raise RuntimeError("temporary")
+            return {"text": job.text}
+
+        pool = IngestionWorkerPool(
+            IngestionQueue(path), process, asyncio.to_thread,
+            workers=1, max_attempts=3, retry_backoff=0.0, poll_interval=30.0,
+        )
+        pool.start()
+        try:
+            flaky = await pool.submit("flaky", {})
+            await asyncio.sleep(0.2)
+            # 队列已空，工作协程在等待唤醒；轮询间隔很长，新任务只能靠唤醒处理
+            started = time.monotonic()
+            quick = await pool.submit("quick", {})
+            while (await pool.status(quick))["status"] != STATUS_DONE:
+                assert time.monotonic() - started < 5, "入队后工作协程没有被唤醒"
+                await asyncio.sleep(0.02)
+            status = await pool.status(flaky)
+            assert status["status"] == STATUS_DONE and status["attempts"] == 2
+            assert calls == ["flaky", "flaky", "quick"]
+        finally:
+            await pool.stop()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(scenario(os.path.join(tmp, "queue.db")))
+    print("✅ 工作协程测试通过")
+
+
+def test_worker_renews_lease():
+    """
+    测试处理时间超过租约时长时，工作协程续约，任务不会被其他进程重复领取
+    """
+    print("\n=== 租约续约测试 ===")
+
+    async def scenario(path):
+        calls = []
+
+        async def process(job):
+            calls.append(job.text)
+            await asyncio.sleep(0.5)
+            return {"text": job.text}
+
+        pool = IngestionWorkerPool(
+            IngestionQueue(path, lease_seconds=0.15), process, asyncio.to_thread,
+            workers=1, poll_interval=30.0,
+        )
+        other = IngestionQueue(path, lease_seconds=60)
+        pool.start()
+        try:
+            ticket = await pool.submit("slow", {})
+            started = time.monotonic()
+            while (await pool.status(ticket))["status"] != STATUS_DONE:
+                assert other.claim() is None, "处理中的任务被其他进程领取"
+                assert time.monotonic() - started < 5, "任务没有完成"
+                await asyncio.sleep(0.05)
+            assert calls == ["slow"]
+        finally:
+            await pool.stop()
+            other.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(scenario(os.path.join(tmp, "queue.db")))
+    print("✅ 租约续约测试通过")
+
+
+def main():
+    """
+    运行所有测试
+    """
+    print("开始异步写入队列测试...")
+    print("=" * 50)
+
+    tests = [
+        test_queue_state_machine,
+        test_lease_recovery,
+        test_worker_retry_and_wakeup,
+        test_worker_renews_lease,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} 失败: {e}")
+
+    print("\n" + "=" * 50)
+    print(f"测试结果: {passed}/{len(tests)} 通过")
+    return passed == len(tests)
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+指标测试脚本
+
+测试 metrics 和 MCP 服务的工具注册：
+- 导入 main 后注册了全部工具，工具参数来自原函数签名（instrumented 包装后不丢失）
+- MetricsRegistry.render 输出 Prometheus 文本格式：HELP/TYPE、标签转义、直方图累计桶
+- 工具调用（包括以 Error 开头的返回）计入 get_registry() 的请求数、错误数和耗时
+"""
+
+import sys
+import os
+import asyncio
+from types import SimpleNamespace
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 添加src目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from metrics import MetricsRegistry, get_registry
+
+TOOLS = {
+    "save_memory",
+    "get_all_memories",
+    "search_memories",
+    "search_memories_batch",
+    "import_memories",
+    "export_memories",
+    "get_ingestion_status",
+}
+
+
+def test_tool_list():
+    """
+    测试导入 main 后的工具列表和参数
+    """
+    print("\n=== 工具列表测试 ===")
+
+    import main as server
+
+    tools = {tool.name: tool for tool in asyncio.run(server.mcp.list_tools())}
+    print(f"   工具: {sorted(tools)}")
+    assert set(tools) == TOOLS, f"工具列表不一致: {set(tools) ^ TOOLS}"
+
+    save = tools["save_memory"].inputSchema["properties"]
+    assert "text" in save and "ctx" not in save, "工具参数应来自原函数签名"
+    assert tools["save_memory"].description, "工具描述应来自原函数文档"
+    assert set(tools["get_ingestion_status"].inputSchema["required"]) == {"ticket_id"}
+    print("✅ 工具列表测试通过")
+
+
+def test_render():
+    """
+    测试 Prometheus 文本格式输出
+    """
+    print("\n=== 指标渲染测试 ===")
+
+    registry = MetricsRegistry()
+    requests = registry.counter("test_requests_total", "Requests\nby tool", ["tool"])
+    requests.inc(tool="save_memory")
+    requests.inc(2, tool='say "hi"')
+    registry.gauge("test_in_flight", "In flight").set(3)
+    latency = registry.histogram("test_seconds", "Latency", ["tool"], buckets=(0.1, 1.0))
+    latency.observe(0.05, tool="search")
+    latency.observe(0.5, tool="search")
+    latency.observe(5, tool="search")
+    registry.add_collector(lambda: registry.gauge("test_collected", "Collected").set(1.5))
+
+    def broken_collector():
+        raise RuntimeError("pool unavailable")
+
+    registry.add_collector(broken_collector)
+
+    assert registry.counter("test_requests_total", "Requests") is requests, "同名指标应复用"
+    try:
+        registry.gauge("test_requests_total", "Requests")
+        assert False, "同名不同类型的指标应报错"
+    except ValueError:
+        pass
+
+    assert registry.render() == "\n".join([
+        "# HELP test_collected Collected",
+        "# TYPE test_collected gauge",
+        "test_collected 1.5",
+        "# HELP test_in_flight In flight",
+        "# TYPE test_in_flight gauge",
+        "test_in_flight 3",
+        "# HELP test_requests_total Requests\\nby tool",
+        "# TYPE test_requests_total counter",
+        'test_requests_total{tool="save_memory"} 1',
+        'test_requests_total{tool="say \\"hi\\""} 2',
+        "# HELP test_seconds Latency",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{tool="search",le="0.1"} 1',
+        'test_seconds_bucket{tool="search",le="1"} 2',
+        'test_seconds_bucket{tool="search",le="+Inf"} 3',
+        'test_seconds_sum{tool="search"} 5.55',
+        'test_seconds_count{tool="search"} 3',
+    ]) + "\n"
+    print("✅ 指标渲染测试通过")
+
+
+def test_tool_metrics():
+    """
+    测试工具调用计入全局注册表，并通过指标端点输出
+    """
+    print("\n=== 工具指标测试 ===")
+
+    import main as server
+
+    ctx = SimpleNamespace(request_context=SimpleNamespace(lifespan_context=SimpleNamespace(ingestion=None), meta=None))
+    before = dict(server.TOOL_ERRORS.samples()).get(("get_ingestion_status",), 0)
+    result = asyncio.run(server.get_ingestion_status(ctx, "ticket-1"))
+    assert result.startswith("Error"), result
+
+    samples = dict(server.TOOL_ERRORS.samples())
+    assert samples[("get_ingestion_status",)] == before + 1, "以 Error 开头的返回应计为错误"
+    assert dict(server.TOOL_IN_FLIGHT.samples())[("get_ingestion_status",)] == 0
+
+    response = asyncio.run(server.metrics_endpoint(None))
+    body = response.body.decode("utf-8")
+    assert response.media_type.startswith("text/plain")
+    assert 'mem0_tool_requests_total{tool="get_ingestion_status"}' in get_registry().render()
+    assert 'mem0_tool_errors_total{tool="get_ingestion_status"}' in body
+    assert 'mem0_tool_duration_seconds_count{tool="get_ingestion_status"}' in body
+    assert "# TYPE mem0_executor_queue_depth gauge" in body
+    print("✅ 工具指标测试通过")
+
+
+def main():
+    """
+    运行所有测试
+    """
+    print("开始指标测试...")
+    print("=" * 50)
+
+    tests = [
+        test_tool_list,
+        test_render,
+        test_tool_metrics,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} 失败: {e}")
+
+    print("\n" + "=" * 50)
+    print(f"测试结果: {passed}/{len(tests)} 通过")
+    return passed == len(tests)
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+进程内向量存储测试脚本
+
+测试 NumpyVectorStore（VECTOR_STORE_PROVIDER=memory）：
+- 写入、搜索、过滤、更新和删除
+- 设置 path 时重启后从快照和追加日志恢复
+- 追加日志压缩、日志末尾不完整记录的处理
+"""
+
+import sys
+import os
+import json
+import tempfile
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 添加src目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+import numpy_vector_store
+from numpy_vector_store import NumpyVectorStore
+
+DIMS = 4
+
+
+def unit(index):
+    """第 index 个坐标轴方向的向量"""
+    vector = [0.0] * DIMS
+    vector[index] = 1.0
+    return vector
+
+
+def fill(store):
+    """写入三条记忆：a、b 属于 alice，c 属于 bob"""
+    store.insert(
+        vectors=[unit(0), [0.9, 0.1, 0.0, 0.0], unit(1)],
+        payloads=[
+            {"data": "a", "user_id": "alice"},
+            {"data": "b", "user_id": "alice"},
+            {"data": "c", "user_id": "bob"},
+        ],
+        ids=["a", "b", "c"],
+    )
+
+
+def test_insert_search_update_delete():
+    """
+    测试写入、搜索、更新和删除
+    """
+    print("\n=== 基本操作测试 ===")
+
+    store = NumpyVectorStore("memories", DIMS)
+    fill(store)
+
+    hits = store.search("q", vectors=unit(0), limit=2)
+    assert [hit.id for hit in hits] == ["a", "b"]
+    assert abs(hits[0].score) < 1e-6, "相同方向的余弦距离应为0"
+    assert [hit.id for hit in store.search("q", vectors=unit(0), limit=5, filters={"user_id": "bob"})] == ["c"]
+
+    store.update("b", vector=unit(2), payload={"data": "b2", "user_id": "alice"})
+    assert store.get("b").payload["data"] == "b2"
+    assert store.search("q", vectors=unit(2), limit=1)[0].id == "b"
+
+    store.delete("a")
+    assert store.get("a") is None
+    assert store.col_info()["count"] == 2
+    # 删除时最后一行移动到被删除的位置，其余记忆仍可按ID和向量找到
+    assert store.search("q", vectors=unit(1), limit=1)[0].id == "c"
+    assert store.get_vectors(["c", "a"]) == [unit(1), None]
+    print("✅ 基本操作测试通过")
+
+
+def test_reload_from_path():
+    """
+    测试重启后从快照和追加日志恢复
+    """
+    print("\n=== 磁盘恢复测试 ===")
+
+    with tempfile.TemporaryDirectory() as path:
+        store = NumpyVectorStore("memories", DIMS, path=path)
+        fill(store)
+        store.update("b", payload={"data": "b2", "user_id": "alice"})
+        store.delete("a")
+        store.insert(vectors=[unit(3)], payloads=[{"data": "d", "user_id": "bob"}], ids=["d"])
+        # 不调用 close：模拟进程直接退出，写入只在追加日志中
+        with open(os.path.join(path, "memories.json"), encoding="utf-8") as f:
+            assert json.load(f)["ids"] == [], "写入不应重写快照"
+
+        reopened = NumpyVectorStore("memories", DIMS, path=path)
+        assert sorted(hit.id for hit in reopened.list()[0]) == ["b", "c", "d"]
+        assert reopened.get("b").payload["data"] == "b2"
+        assert reopened.search("q", vectors=unit(3), limit=1)[0].id == "d"
+        assert reopened.search("q", vectors=unit(1), limit=1, filters={"user_id": "bob"})[0].id == "c"
+        reopened.close()
+    print("✅ 磁盘恢复测试通过")
+
+
+def test_log_compaction():
+    """
+    测试追加日志超过阈值后压缩为快照，以及忽略日志末尾不完整的记录
+    """
+    print("\n=== 日志压缩测试 ===")
+
+    original = numpy_vector_store.COMPACT_MIN_ENTRIES
+    numpy_vector_store.COMPACT_MIN_ENTRIES = 4
+    try:
+        with tempfile.TemporaryDirectory() as path:
+            store = NumpyVectorStore("memories", DIMS, path=path)
+            store.insert(vectors=[unit(0), unit(1)], payloads=[{"data": "0"}, {"data": "1"}], ids=["m0", "m1"])
+            # 反复更新同一条记忆，日志条数超过阈值后压缩
+            for version in range(5):
+                store.update("m0", payload={"data": f"0.{version}"})
+            with open(os.path.join(path, "memories.json"), encoding="utf-8") as f:
+                state = json.load(f)
+            assert state["ids"] == ["m0", "m1"], "日志超过阈值后应压缩为快照"
+            with open(os.path.join(path, "memories.log"), encoding="utf-8") as f:
+                assert len(f.readlines()) < 4
+
+            # 进程在写日志时退出，留下不完整的最后一行
+            with open(os.path.join(path, "memories.log"), "a", encoding="utf-8") as f:
+                f.write('{"row": 2, "id": "torn"')
+            reopened = NumpyVectorStore("memories", DIMS, path=path)
+            assert reopened.col_info()["count"] == 2
+            assert reopened.get("m0").payload["data"] == "0.4"
+            assert reopened.get("torn") is None
+            reopened.close()
+    finally:
+        numpy_vector_store.COMPACT_MIN_ENTRIES = original
+    print("✅ 日志压缩测试通过")
+
+
+def main():
+    """
+    运行所有测试
+    """
+    print("开始进程内向量存储测试...")
+    print("=" * 50)
+
+    tests = [
+        test_insert_search_update_delete,
+        test_reload_from_path,
+        test_log_compaction,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} 失败: {e}")
+
+    print("\n" + "=" * 50)
+    print(f"测试结果: {passed}/{len(tests)} 通过")
+    return passed == len(tests)
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+记忆分页测试脚本
+
+测试 get_all_memories 的键集分页：
+- 游标编码/解码往返一致，非法游标报错
+- 逐页读取覆盖全部记忆，created_at 相同时也不重复、不遗漏
+"""
+
+import sys
+import os
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 添加src目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from memory_store import decode_cursor, encode_cursor, list_memories_page
+
+
+class PagedStore:
+    """按 (created_at, id) 键集分页的向量存储替身"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def list_page(self, filters, limit, after=None):
+        keyed = sorted(
+            ((payload.get("created_at") or "", memory_id), memory_id, payload)
+            for memory_id, payload in self.rows
+            if all(payload.get(key) == value for key, value in filters.items())
+        )
+        return [(memory_id, payload) for key, memory_id, payload in keyed if after is None or key > after][:limit]
+
+
+class PagedClient:
+    def __init__(self, rows):
+        self.vector_store = PagedStore(rows)
+
+
+def test_cursor_round_trip():
+    """
+    测试游标编码/解码往返
+    """
+    print("\n=== 游标往返测试 ===")
+
+    for created_at, memory_id in [
+        ("2024-05-01T10:00:00.123456-07:00", "5f0c7c1e-1b7a-4c55-9a55-0e6f1c3f8a11"),
+        ("", "id-without-timestamp"),
+        ("2024-05-01T10:00:00-07:00", "含有/特殊+字符=的id"),
+    ]:
+        cursor = encode_cursor(created_at, memory_id)
+        assert "=" not in cursor and "/" not in cursor and "+" not in cursor
+        assert decode_cursor(cursor) == (created_at, memory_id)
+
+    for invalid in ["not-a-cursor", encode_cursor("a", "b")[:-3], "W10"]:
+        try:
+            decode_cursor(invalid)
+        except ValueError:
+            continue
+        raise AssertionError(f"非法游标没有报错: {invalid!r}")
+    print("✅ 游标往返测试通过")
+
+
+def test_pages_cover_all_memories():
+    """
+    测试逐页读取不重复、不遗漏（包括 created_at 相同的记忆）
+    """
+    print("\n=== 逐页读取测试 ===")
+
+    rows = [
+        (f"m{i:02d}", {"data": f"fact {i}", "user_id": "alice", "created_at": f"2024-05-01T10:00:0{i % 3}-07:00"})
+        for i in range(11)
+    ]
+    rows.append(("other", {"data": "bob's fact", "user_id": "bob", "created_at": "2024-05-01T10:00:00-07:00"}))
+    client = PagedClient(rows)
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        memories, cursor = list_memories_page(client, {"user_id": "alice"}, page_size=4, cursor=cursor)
+        seen.extend(memory["id"] for memory in memories)
+        pages += 1
+        if cursor is None:
+            break
+    assert pages == 3
+    assert sorted(seen) == sorted(f"m{i:02d}" for i in range(11))
+    assert len(seen) == len(set(seen))
+    print("✅ 逐页读取测试通过")
+
+
+def main():
+    """
+    运行所有测试
+    """
+    print("开始记忆分页测试...")
+    print("=" * 50)
+
+    tests = [
+        test_cursor_round_trip,
+        test_pages_cover_all_memories,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} 失败: {e}")
+
+    print("\n" + "=" * 50)
+    print(f"测试结果: {passed}/{len(tests)} 通过")
+    return passed == len(tests)
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+原文写入测试脚本
+
+测试 save_memory(infer=False) 使用的 store_raw：
+- 文本原样保存为一条记忆，payload 与 mem0 写入的一致
+- 开启近似重复检查时，同一作用域内足够相似的文本返回 NONE 且不再写入
+- 其它作用域或关闭检查时照常写入
+"""
+
+import sys
+import os
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 添加src目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from raw_store import store_raw
+from testing_support import memory_client
+
+# 文本 -> 向量；前两条几乎相同方向
+VECTORS = {
+    "User prefers dark mode": [1.0, 0.0, 0.0],
+    "User prefers dark mode.": [0.999, 0.02, 0.0],
+    "User lives in Paris": [0.0, 1.0, 0.0],
+}
+
+
+def test_raw_add():
+    """
+    测试原文写入一条记忆
+    """
+    print("\n=== 原文写入测试 ===")
+
+    client = memory_client(vectors=VECTORS)
+    result = store_raw(client, "User prefers dark mode", {"user_id": "alice"}, {"source": "settings"})
+    event = result["results"][0]
+    assert event["event"] == "ADD" and event["memory"] == "User prefers dark mode"
+    stored = client.vector_store.get(event["id"])
+    assert stored.payload["data"] == "User prefers dark mode"
+    assert stored.payload["user_id"] == "alice" and stored.payload["source"] == "settings"
+    assert stored.payload["hash"] and stored.payload["created_at"]
+    assert "total" in result["stage_timings"]
+    assert client.embedding_model.calls == 1
+    print("✅ 原文写入测试通过")
+
+
+def test_dedup_returns_none():
+    """
+    测试同一作用域内的近似重复返回 NONE 且不写入
+    """
+    print("\n=== 近似重复测试 ===")
+
+    client = memory_client(vectors=VECTORS)
+    first = store_raw(client, "User prefers dark mode", {"user_id": "alice"}, None, dedup_threshold=0.95)
+    duplicate = store_raw(client, "User prefers dark mode.", {"user_id": "alice"}, None, dedup_threshold=0.95)
+    event = duplicate["results"][0]
+    assert event["event"] == "NONE"
+    assert event["id"] == first["results"][0]["id"] and event["memory"] == "User prefers dark mode"
+    assert "total" in duplicate["stage_timings"]
+    assert client.vector_store.col_info()["count"] == 1
+
+    # 不相似的文本、其它作用域、关闭检查时照常写入
+    assert store_raw(client, "User lives in Paris", {"user_id": "alice"}, None, 0.95)["results"][0]["event"] == "ADD"
+    assert store_raw(client, "User prefers dark mode.", {"user_id": "bob"}, None, 0.95)["results"][0]["event"] == "ADD"
+    assert store_raw(client, "User prefers dark mode.", {"user_id": "alice"}, None, 0.0)["results"][0]["event"] == "ADD"
+    assert client.vector_store.col_info()["count"] == 4
+    print("✅ 近似重复测试通过")
+
+
+def main():
+    """
+    运行所有测试
+    """
+    print("开始原文写入测试...")
+    print("=" * 50)
+
+    tests = [
+        test_raw_add,
+        test_dedup_returns_none,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} 失败: {e}")
+
+    print("\n" + "=" * 50)
+    print(f"测试结果: {passed}/{len(tests)} 通过")
+    return passed == len(tests)
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+租户作用域测试脚本
+
+测试 user_id/agent_id/run_id 作用域：
+- resolve_scope 未传 user_id 时使用默认用户，忽略空值
+- filter_clause 生成命中表达式索引的等值条件，拒绝非法字段名
+- ensure_filter_indexes 并发创建过滤/分页索引，先删除上次失败留下的无效索引，构建失败时立即删除
+"""
+
+import sys
+import os
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 添加src目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from memory_store import ensure_filter_indexes, filter_clause
+from testing_support import RecordingEngine, sql_client
+
+
+def test_resolve_scope():
+    """
+    测试工具调用的作用域解析
+    """
+    print("\n=== 作用域解析测试 ===")
+
+    import main as server
+
+    assert server.resolve_scope() == {"user_id": server.DEFAULT_USER_ID}
+    assert server.resolve_scope(run_id="r1") == {"user_id": server.DEFAULT_USER_ID, "run_id": "r1"}
+    assert server.resolve_scope("alice", "planner") == {"user_id": "alice", "agent_id": "planner"}
+    assert server.resolve_scope("", "", "") == {"user_id": server.DEFAULT_USER_ID}, "空字符串按未传处理"
+    print("✅ 作用域解析测试通过")
+
+
+def test_filter_clause():
+    """
+    测试过滤条件的SQL和绑定参数
+    """
+    print("\n=== 过滤条件SQL测试 ===")
+
+    where, params = filter_clause({"user_id": "alice", "agent_id": None, "run_id": 7})
+    assert where == "metadata->>'run_id' = :filter_1 AND metadata->>'user_id' = :filter_2", where
+    assert params == {"filter_1": "7", "filter_2": "alice"}, "取值按字符串绑定，不拼接进SQL"
+
+    assert filter_clause({}) == ("TRUE", {})
+    assert filter_clause({"user_id": None}) == ("TRUE", {})
+
+    for key in ["user_id' OR '1'='1", "user id", "1user"]:
+        try:
+            filter_clause({key: "x"})
+            assert False, f"非法字段名应被拒绝: {key}"
+        except ValueError:
+            pass
+    print("✅ 过滤条件SQL测试通过")
+
+
+def test_ensure_filter_indexes():
+    """
+    测试索引创建：无效索引先删除，构建失败的索引删除后不计入已就绪
+    """
+    print("\n=== 过滤索引创建测试 ===")
+
+    engine = RecordingEngine(
+        responses={"NOT ix.indisvalid": [("ix_mem0_memories_agent_id_created",)]},
+        failures={
+            'IF NOT EXISTS "ix_mem0_memories_run_id_created"': RuntimeError("canceling statement due to lock timeout"),
+        },
+    )
+    ready = ensure_filter_indexes(sql_client(engine))
+    assert ready == [
+        "ix_mem0_memories_metadata",
+        "ix_mem0_memories_user_id_created",
+        "ix_mem0_memories_agent_id_created",
+    ], ready
+
+    creates = engine.sql("CREATE INDEX")
+    assert len(creates) == 4 and all("CREATE INDEX CONCURRENTLY IF NOT EXISTS" in sql for sql in creates)
+    assert 'ON vecs."mem0_memories" USING gin (metadata jsonb_path_ops)' in creates[0]
+    assert "((metadata->>'user_id'), (coalesce(metadata->>'created_at', '')), id)" in creates[1]
+
+    executed = [sql for sql, _, _ in engine.statements]
+    drop_agent = 'DROP INDEX CONCURRENTLY IF EXISTS vecs."ix_mem0_memories_agent_id_created"'
+    assert executed.index(drop_agent) < executed.index(creates[2]), "无效索引应在重建前删除"
+    assert executed[-1] == 'DROP INDEX CONCURRENTLY IF EXISTS vecs."ix_mem0_memories_run_id_created"'
+
+    # CONCURRENTLY 不能在事务中执行
+    for sql, _, options in engine.statements:
+        if "CONCURRENTLY" in sql:
+            assert options.get("isolation_level") == "AUTOCOMMIT", sql
+    print("✅ 过滤索引创建测试通过")
+
+
+def main():
+    """
+    运行所有测试
+    """
+    print("开始租户作用域测试...")
+    print("=" * 50)
+
+    tests = [
+        test_resolve_scope,
+        test_filter_clause,
+        test_ensure_filter_indexes,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} 失败: {e}")
+
+    print("\n" + "=" * 50)
+    print(f"测试结果: {passed}/{len(tests)} 通过")
+    return passed == len(tests)
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
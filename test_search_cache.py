@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+搜索结果缓存测试脚本
+
+测试 SearchResultCache 的失效规则：
+- 写入范围更大的作用域会使范围更小（过滤条件更多）的缓存失效
+- 写入范围更小的作用域会使范围更大的缓存失效
+- 不重叠的作用域互不影响
+- 搜索期间发生重叠写入时不回填结果
+- 缓存在进程内共享，一个会话的写入使其它会话的缓存失效
+"""
+
+import sys
+import os
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 添加src目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from search_cache import SearchResultCache, get_search_cache, make_scope, scopes_overlap
+
+
+def cached(cache, filters, query="饮食习惯", limit=5):
+    """在给定作用域下回填一次搜索结果"""
+    scope = make_scope(filters)
+    cache.put(scope, query, limit, {"results": [query]}, cache.begin())
+    return scope
+
+
+def test_broad_write_invalidates_narrow_scope():
+    """
+    测试在较窄作用域缓存、在较宽作用域写入后未命中
+    """
+    print("\n=== 宽作用域写入失效测试 ===")
+
+    cache = SearchResultCache(max_entries=16, ttl=60)
+    narrow = cached(cache, {"user_id": "alice", "agent_id": "planner"})
+    assert cache.get(narrow, "饮食习惯", 5) is not None
+
+    cache.invalidate(make_scope({"user_id": "alice"}))
+    assert cache.get(narrow, "饮食习惯", 5) is None
+    print("✅ 宽作用域写入失效测试通过")
+
+
+def test_narrow_write_invalidates_broad_scope():
+    """
+    测试在较宽作用域缓存、在较窄作用域写入后未命中
+    """
+    print("\n=== 窄作用域写入失效测试 ===")
+
+    cache = SearchResultCache(max_entries=16, ttl=60)
+    broad = cached(cache, {"user_id": "alice"})
+    cache.invalidate(make_scope({"user_id": "alice", "agent_id": "planner"}))
+    assert cache.get(broad, "饮食习惯", 5) is None
+    print("✅ 窄作用域写入失效测试通过")
+
+
+def test_disjoint_scopes_kept():
+    """
+    测试不重叠的作用域不受影响
+    """
+    print("\n=== 不重叠作用域测试 ===")
+
+    cache = SearchResultCache(max_entries=16, ttl=60)
+    other_agent = cached(cache, {"user_id": "alice", "agent_id": "writer"})
+    other_user = cached(cache, {"user_id": "bob"})
+    cache.invalidate(make_scope({"user_id": "alice", "agent_id": "planner"}))
+    assert cache.get(other_agent, "饮食习惯", 5) is not None
+    assert cache.get(other_user, "饮食习惯", 5) is not None
+
+    assert scopes_overlap(make_scope({"user_id": "alice", "agent_id": "a"}), make_scope({"user_id": "alice", "run_id": "r"}))
+    assert not scopes_overlap(make_scope({"user_id": "alice"}), make_scope({"user_id": "bob"}))
+    print("✅ 不重叠作用域测试通过")
+
+
+def test_write_during_search_not_cached():
+    """
+    测试搜索进行中发生重叠写入时不回填
+    """
+    print("\n=== 搜索期间写入测试 ===")
+
+    cache = SearchResultCache(max_entries=16, ttl=60)
+    narrow = make_scope({"user_id": "alice", "agent_id": "planner"})
+    token = cache.begin()
+    cache.invalidate(make_scope({"user_id": "alice"}))
+    cache.put(narrow, "饮食习惯", 5, {"results": []}, token)
+    assert cache.get(narrow, "饮食习惯", 5) is None
+
+    # 写入之后开始的搜索可以正常回填
+    cache.put(narrow, "饮食习惯", 5, {"results": []}, cache.begin())
+    assert cache.get(narrow, "饮食习惯", 5) is not None
+    print("✅ 搜索期间写入测试通过")
+
+
+def test_shared_across_sessions():
+    """
+    测试各会话共用进程内的缓存：一个会话的写入使另一个会话缓存的结果失效
+    """
+    print("\n=== 跨会话失效测试 ===")
+
+    os.environ.setdefault("SEARCH_CACHE_SIZE", "64")
+    import main as server
+
+    first = server.Mem0Context(mem0_client=None, executor=None, search_cache=get_search_cache())
+    second = server.Mem0Context(mem0_client=None, executor=None, search_cache=get_search_cache())
+    assert first.search_cache is not None and first.search_cache is second.search_cache
+
+    scope = cached(second.search_cache, {"user_id": "session_b"})
+    assert second.search_cache.get(scope, "饮食习惯", 5) is not None
+    server.invalidate_scope(first, {"user_id": "session_b"})
+    assert second.search_cache.get(scope, "饮食习惯", 5) is None, "其它会话的写入应使缓存失效"
+    print("✅ 跨会话失效测试通过")
+
+
+def main():
+    """
+    运行所有测试
+    """
+    print("开始搜索结果缓存测试...")
+    print("=" * 50)
+
+    tests = [
+        test_broad_write_invalidates_narrow_scope,
+        test_narrow_write_invalidates_broad_scope,
+        test_disjoint_scopes_kept,
+        test_write_during_search_not_cached,
+        test_shared_across_sessions,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} 失败: {e}")
+
+    print("\n" + "=" * 50)
+    print(f"测试结果: {passed}/{len(tests)} 通过")
+    return passed == len(tests)
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+向量索引管理测试脚本
+
+测试 vector_index：
+- IndexSpec.from_env 的默认值、环境变量和向量存储距离度量的优先级
+- check_vector_index 对缺失、一致、无效、不一致、超出维度上限和维度不符的判断
+- 重建时先以临时名构建新索引，成功后才删除旧索引并改名；构建失败时旧索引保留
+- 启动时的构建线程：步骤失败不影响后续步骤，stop 跳过剩余步骤
+"""
+
+import sys
+import os
+import threading
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 添加src目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from sqlalchemy import create_engine
+
+from vector_index import IndexBuildThread, IndexSpec, build_vector_index, check_vector_index
+from testing_support import RecordingEngine
+
+INDEX_ENV = [
+    "VECTOR_INDEX_METHOD", "VECTOR_INDEX_MEASURE", "VECTOR_HNSW_M", "VECTOR_HNSW_EF_CONSTRUCTION",
+    "VECTOR_IVFFLAT_LISTS", "VECTOR_HNSW_EF_SEARCH", "VECTOR_IVFFLAT_PROBES",
+]
+
+HNSW_COSINE = "ix_mem0_memories_vec_hnsw_vector_cosine_ops"
+
+
+def index_row(name, method="hnsw", opclass="vector_cosine_ops", valid=True):
+    """inspect_vector_indexes 查询返回的一行"""
+    return (name, method, opclass, valid, f"CREATE INDEX {name} USING {method} (vec {opclass})")
+
+
+def index_engine(indexes, column_type="vector(64)", **kwargs):
+    """返回给定列类型和现有索引的记录引擎"""
+    responses = {"pg_get_indexdef": indexes}
+    if column_type:
+        responses["format_type"] = [(column_type,)]
+    return RecordingEngine(responses=responses, **kwargs)
+
+
+def test_index_spec_from_env():
+    """
+    测试索引配置的环境变量解析
+    """
+    print("\n=== 索引配置测试 ===")
+
+    saved = {name: os.environ.pop(name, None) for name in INDEX_ENV}
+    try:
+        spec = IndexSpec.from_env()
+        assert (spec.method, spec.measure, spec.m, spec.ef_construction) == ("hnsw", "cosine", 16, 64)
+        assert spec.lists is None and spec.ef_search is None and spec.probes is None
+        assert spec.opclass == "vector_cosine_ops"
+        assert spec.index_name("mem0_memories") == HNSW_COSINE
+
+        os.environ.update(
+            VECTOR_INDEX_METHOD="IVFFlat", VECTOR_INDEX_MEASURE="l2", VECTOR_IVFFLAT_LISTS="100",
+            VECTOR_IVFFLAT_PROBES="10", VECTOR_HNSW_EF_SEARCH="",
+        )
+        spec = IndexSpec.from_env()
+        assert (spec.method, spec.measure, spec.lists, spec.probes) == ("ivfflat", "l2", 100, 10)
+        assert spec.ef_search is None, "空值按未设置处理"
+        assert spec.opclass == "vector_l2_ops"
+
+        # 向量存储实际使用的度量优先于环境变量（接受 vecs 的 IndexMeasure 取值）
+        assert IndexSpec.from_env("max_inner_product").opclass == "vector_ip_ops"
+
+        try:
+            IndexSpec(measure="hamming").opclass
+            assert False, "不支持的距离度量应报错"
+        except ValueError:
+            pass
+    finally:
+        for name, value in saved.items():
+            os.environ.pop(name, None)
+            if value is not None:
+                os.environ[name] = value
+    print("✅ 索引配置测试通过")
+
+
+def test_check_vector_index():
+    """
+    测试索引校验的各种状态
+    """
+    print("\n=== 索引校验测试 ===")
+
+    spec = IndexSpec()
+    cases = [
+        ([], "missing"),
+        ([index_row(HNSW_COSINE)], "ok"),
+        ([index_row(HNSW_COSINE, valid=False)], "invalid"),
+        ([index_row(HNSW_COSINE, valid=False), index_row("ix_manual", valid=True)], "ok"),
+        ([index_row("ix_old", method="ivfflat")], "mismatch"),
+        ([index_row("ix_l2", opclass="vector_l2_ops")], "mismatch"),
+    ]
+    for indexes, expected in cases:
+        result = check_vector_index(index_engine(indexes), "mem0_memories", 64, spec)
+        assert result["status"] == expected, (indexes, result["status"])
+        assert [idx["name"] for idx in result["indexes"]] == [row[0] for row in indexes]
+
+    # 集合表尚未创建
+    assert check_vector_index(index_engine([], column_type=None), "mem0_memories", 64, spec)["status"] == "missing"
+
+    result = check_vector_index(index_engine([], column_type="vector(3072)"), "mem0_memories", 3072, spec)
+    assert result["status"] == "unsupported" and "2000" in result["reason"]
+
+    try:
+        check_vector_index(index_engine([]), "mem0_memories", 1536, spec)
+        assert False, "列维度与 embedding_model_dims 不符时应报错"
+    except ValueError as e:
+        assert "vector(64)" in str(e)
+    print("✅ 索引校验测试通过")
+
+
+def test_rebuild_by_rename():
+    """
+    测试重建：新索引构建成功后才删除旧索引并改名
+    """
+    print("\n=== 索引重建测试 ===")
+
+    old = "ix_mem0_memories_vec_ivfflat_vector_cosine_ops"
+    engine = index_engine([index_row(old, method="ivfflat"), index_row(HNSW_COSINE)])
+    name = build_vector_index(engine, "mem0_memories", IndexSpec(), replace=True, progress_interval=0.01)
+    assert name == HNSW_COSINE
+
+    ddl = [sql for sql, _, _ in engine.statements if "INDEX" in sql and "pg_" not in sql]
+    assert ddl == [
+        f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{HNSW_COSINE}_new" ON vecs."mem0_memories" '
+        f"USING hnsw (vec vector_cosine_ops) WITH (m = 16, ef_construction = 64)",
+        f'DROP INDEX CONCURRENTLY IF EXISTS vecs."{old}"',
+        f'DROP INDEX CONCURRENTLY IF EXISTS vecs."{HNSW_COSINE}"',
+        f'ALTER INDEX vecs."{HNSW_COSINE}_new" RENAME TO "{HNSW_COSINE}"',
+    ], ddl
+
+    # 构建失败：删除未完成的临时索引，旧索引保持不变
+    engine = index_engine([index_row(old, method="ivfflat")], failures={"CREATE INDEX": RuntimeError("out of memory")})
+    try:
+        build_vector_index(engine, "mem0_memories", IndexSpec(), replace=True, progress_interval=0.01)
+        assert False, "构建失败应抛出异常"
+    except RuntimeError:
+        pass
+    assert engine.sql("DROP INDEX") == [f'DROP INDEX CONCURRENTLY IF EXISTS vecs."{HNSW_COSINE}_new"']
+    assert engine.sql("ALTER INDEX") == []
+
+    # 不替换时先删除上次中断留下的同名无效索引再构建
+    engine = index_engine([index_row(HNSW_COSINE, valid=False)])
+    build_vector_index(engine, "mem0_memories", IndexSpec(), progress_interval=0.01)
+    ddl = [sql for sql, _, _ in engine.statements if "INDEX" in sql and "pg_" not in sql]
+    assert ddl[0] == f'DROP INDEX CONCURRENTLY IF EXISTS vecs."{HNSW_COSINE}"'
+    assert ddl[1].startswith(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{HNSW_COSINE}" ')
+    print("✅ 索引重建测试通过")
+
+
+def test_index_build_thread():
+    """
+    测试后台构建线程：失败的步骤不影响后续步骤，stop 后不再执行剩余步骤
+    """
+    print("\n=== 后台构建线程测试 ===")
+
+    engine = create_engine("sqlite://")
+    ran = []
+
+    def failing():
+        ran.append("filter_index")
+        raise RuntimeError("lock timeout")
+
+    thread = IndexBuildThread(engine, [("filter_index", failing), ("vector_index", lambda: ran.append("vector_index"))])
+    assert thread.daemon, "构建线程不应阻塞解释器退出"
+    thread.start()
+    thread.join(5)
+    assert ran == ["filter_index", "vector_index"]
+
+    started, release = threading.Event(), threading.Event()
+    ran.clear()
+
+    def blocking():
+        started.set()
+        release.wait(5)
+        ran.append("first")
+
+    thread = IndexBuildThread(engine, [("first", blocking), ("second", lambda: ran.append("second"))])
+    thread.start()
+    assert started.wait(5)
+    stopper = threading.Thread(target=thread.stop, kwargs={"timeout": 5})
+    stopper.start()
+    while not thread._stopping.is_set():
+        stopper.join(0.01)
+    release.set()
+    stopper.join(5)
+    assert not thread.is_alive()
+    assert ran == ["first"], "stop 之后不应执行剩余步骤"
+    print("✅ 后台构建线程测试通过")
+
+
+def main():
+    """
+    运行所有测试
+    """
+    print("开始向量索引管理测试...")
+    print("=" * 50)
+
+    tests = [
+        test_index_spec_from_env,
+        test_check_vector_index,
+        test_rebuild_by_rename,
+        test_index_build_thread,
+    ]
+
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} 失败: {e}")
+
+    print("\n" + "=" * 50)
+    print(f"测试结果: {passed}/{len(tests)} 通过")
+    return passed == len(tests)
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,156 @@
+"""
+测试共用的替身
+
+- RecordingEngine: 记录执行的SQL和绑定参数的 SQLAlchemy 引擎替身，用于没有数据库时检查生成的SQL
+- TableEmbedder: 查表或按词哈希生成确定向量的嵌入模型替身，记录每次嵌入请求
+- memory_client: 使用进程内向量存储和 TableEmbedder 的 mem0 客户端替身
+- sql_client: 使用 RecordingEngine 的 supabase（pgvector）存储客户端替身
+
+使用前需先把 src 目录加入 sys.path。
+"""
+
+from types import SimpleNamespace
+
+from fake_providers import hash_embedding
+from numpy_vector_store import NumpyVectorStore
+
+
+class RecordingResult:
+    """执行结果替身"""
+
+    def __init__(self, rows, rowcount):
+        self.rows = rows
+        self.rowcount = rowcount
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def scalar(self):
+        return self.rows[0][0] if self.rows else None
+
+    def partitions(self, size):
+        for start in range(0, len(self.rows), size):
+            yield self.rows[start:start + size]
+
+
+class RecordingCursor:
+    """DBAPI游标替身，记录 COPY 的语句和数据"""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def copy_expert(self, sql, buffer):
+        self.engine.copies.append((sql, buffer.read()))
+
+    def close(self):
+        pass
+
+
+class RecordingConnection:
+    """连接替身：执行的语句都记录到所属引擎"""
+
+    def __init__(self, engine, options=None):
+        self.engine = engine
+        self.options = dict(options or {})
+        self.connection = SimpleNamespace(cursor=lambda: RecordingCursor(engine))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execution_options(self, **options):
+        return RecordingConnection(self.engine, dict(self.options, **options))
+
+    def execute(self, statement, params=None):
+        sql = " ".join(str(statement).split())
+        self.engine.statements.append((sql, dict(params or {}), self.options))
+        for fragment, error in self.engine.failures.items():
+            if fragment in sql:
+                raise error
+        for fragment, rows in self.engine.responses.items():
+            if fragment in sql:
+                return RecordingResult(rows, len(rows))
+        return RecordingResult([], self.engine.rowcount)
+
+
+class RecordingEngine:
+    """记录SQL的引擎替身
+
+    responses: SQL包含某个片段时返回的行；failures: SQL包含某个片段时抛出的异常；
+    rowcount: 没有匹配的返回行时语句的 rowcount。
+    """
+
+    def __init__(self, responses=None, failures=None, rowcount=0):
+        self.responses = dict(responses or {})
+        self.failures = dict(failures or {})
+        self.rowcount = rowcount
+        self.statements = []
+        self.copies = []
+
+    def connect(self):
+        return RecordingConnection(self)
+
+    def begin(self):
+        return RecordingConnection(self)
+
+    def execution_options(self, **options):
+        return SimpleNamespace(connect=lambda: RecordingConnection(self, options))
+
+    def sql(self, fragment=""):
+        """返回包含片段的已执行SQL"""
+        return [sql for sql, _, _ in self.statements if fragment in sql]
+
+
+class TableEmbedder:
+    """嵌入模型替身
+
+    vectors 中登记过的文本返回表中的向量，其余文本按词哈希生成确定的单位向量；
+    requests 按顺序记录每次请求的文本列表（embed 为单条列表）。
+    """
+
+    def __init__(self, vectors=None, dims=3):
+        self.vectors = dict(vectors or {})
+        self.dims = dims
+        self.requests = []
+
+    @property
+    def calls(self):
+        """嵌入请求次数"""
+        return len(self.requests)
+
+    @property
+    def embedded(self):
+        """嵌入过的文本条数"""
+        return sum(len(texts) for texts in self.requests)
+
+    def vector(self, text):
+        if text in self.vectors:
+            return list(self.vectors[text])
+        return hash_embedding(text, self.dims)
+
+    def embed(self, text, memory_action=None):
+        self.requests.append([text])
+        return self.vector(text)
+
+    def embed_many(self, texts, memory_action=None):
+        self.requests.append(list(texts))
+        return [self.vector(text) for text in texts]
+
+
+def memory_client(vector_store=None, vectors=None, dims=3):
+    """使用进程内向量存储（或给定存储）和 TableEmbedder 的 mem0 客户端替身"""
+    return SimpleNamespace(
+        embedding_model=TableEmbedder(vectors, dims),
+        vector_store=vector_store if vector_store is not None else NumpyVectorStore("memories", dims),
+    )
+
+
+def sql_client(engine, collection_name="mem0_memories", vectors=None):
+    """使用记录引擎的 pgvector 存储和 TableEmbedder 的客户端替身"""
+    vector_store = SimpleNamespace(collection_name=collection_name, db=SimpleNamespace(engine=engine))
+    return SimpleNamespace(embedding_model=TableEmbedder(vectors), vector_store=vector_store)